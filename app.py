@@ -1,7 +1,10 @@
 import streamlit as st
+import json
 import logging
+import os
 import sys
-from flow import cold_outreach_flow
+from flow import create_cold_outreach_flow
+from utils.jobs import JobRunner
 
 # Configure logging
 logging.basicConfig(
@@ -13,6 +16,27 @@ logging.basicConfig(
 )
 logger = logging.getLogger("streamlit_app")
 
+# Seconds between progress updates while a job runs
+POLL_SECONDS = float(os.getenv("APP_POLL_SECONDS", "1"))
+
+@st.cache_resource
+def get_job_runner():
+    # One runner per server process, shared by all sessions, so repeat queries hit its result cache
+    return JobRunner(
+        max_workers=int(os.getenv("APP_JOB_WORKERS", "4")),
+        cache_size=int(os.getenv("APP_RESULT_CACHE_SIZE", "128"))
+    )
+
+def result_key(first_name, last_name, keywords, personalization_factors, style):
+    # Identical inputs give identical openers, so they share one cached result
+    return (first_name.strip(), last_name.strip(), keywords.strip(),
+            json.dumps(personalization_factors, sort_keys=True), style.strip())
+
+def generate_opening(shared):
+    # Runs on a job thread, with its own flow so concurrent sessions don't share node state
+    create_cold_outreach_flow().run(shared)
+    return {"output": shared.get("output", {}), "personalization": shared.get("personalization", {})}
+
 # Function to validate minimum length
 def validate_min_length(text, min_length, field_name):
     if text and len(text) < min_length:
@@ -181,6 +205,7 @@ def main():
         generate_disabled = bool(errors)
     
     # Generate button
+    runner = get_job_runner()
     if st.button("Generate Opening", type="primary", use_container_width=True, disabled=generate_disabled):
         if not first_name or not last_name:
             st.error("Please provide at least the person's first and last name.")
@@ -192,58 +217,66 @@ def main():
                 "first_name": first_name,
                 "last_name": last_name,
                 "keywords": keywords,
-                "personalization_factors": st.session_state.personalization_factors,
+                "personalization_factors": [dict(factor) for factor in st.session_state.personalization_factors],
                 "style": style
             }
         }
         
-        # Show progress
-        with st.spinner("Searching the web for information about the target person..."):
-            # Create a status area
-            status_area = st.empty()
-            log_area = st.empty()
-            
-            # Create a custom log handler to display logs in Streamlit
-            log_messages = []
-            class StreamlitLogHandler(logging.Handler):
-                def emit(self, record):
-                    log_messages.append(self.format(record))
-                    log_text = "\n".join(log_messages[-10:])  # Show last 10 messages
-                    log_area.code(log_text, language="bash")
-            
-            # Add the custom handler to the logger
-            streamlit_handler = StreamlitLogHandler()
-            streamlit_handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
-            logging.getLogger().addHandler(streamlit_handler)
-            
-            try:
-                # Run the flow
-                cold_outreach_flow.run(shared)
-                
-                # Remove the custom handler
-                logging.getLogger().removeHandler(streamlit_handler)
-                
-            except Exception as e:
-                status_area.error(f"An error occurred: {str(e)}")
-                logging.getLogger().removeHandler(streamlit_handler)
-                st.error(f"Failed to generate opening message: {str(e)}")
-                return
+        # Run in the background; the page polls the job instead of blocking this script run
+        key = result_key(first_name, last_name, keywords, st.session_state.personalization_factors, style)
+        job = runner.submit(key, lambda: generate_opening(shared))
+        st.session_state.job_id = job.id
+        st.query_params["job"] = job.id  # A page reload picks the job up again
+    
+    job_id = st.session_state.get("job_id") or st.query_params.get("job")
+    job = runner.get(job_id) if job_id else None
+    if job is None:
+        return
+    st.session_state.job_id = job.id
+    
+    if not job.done:
+        show_progress(job.id)
+    elif job.status == "failed":
+        st.error(f"Failed to generate opening message: {job.error}")
+    else:
+        show_result(job)
+
+@st.fragment(run_every=POLL_SECONDS)
+def show_progress(job_id):
+    """
+    Re-runs on its own every POLL_SECONDS while the job runs, so the log is rendered
+    at most once per interval rather than once per log record.
+    """
+    job = get_job_runner().get(job_id)
+    if job is None or job.done:
+        st.rerun()  # Render the result with the rest of the page
+    
+    status = "Waiting for a free worker..." if job.status == "queued" else "Searching the web and analyzing pages..."
+    st.info(f"{status} ({job.elapsed():.0f}s)")
+    if job.logs:
+        st.code("\n".join(list(job.logs)[-10:]), language="bash")  # Show last 10 messages
+
+def show_result(job):
+    # Display results
+    result = job.result
+    if result["output"].get("opening_message"):
+        st.success(result["output"]["opening_message"])
+        if job.cached:
+            st.caption("Returned from the result cache.")
+        elif job.summary:
+            st.caption(f"Generated in {job.elapsed():.1f}s: {job.summary}")
         
-        # Display results
-        if "output" in shared and "opening_message" in shared["output"]:
-            st.success(shared["output"]["opening_message"])
-            
-            # Display personalization details
-            if "personalization" in shared and shared["personalization"]:
-                st.subheader("Personalization Details Found")
-                for factor_name, details in shared["personalization"].items():
-                    with st.expander(f"Factor: {factor_name}"):
-                        st.write(f"**Details:** {details['details']}")
-                        st.write(f"**Action:** {details['action']}")
-            else:
-                st.info("No personalization factors were found for this person.")
+        # Display personalization details
+        if result["personalization"]:
+            st.subheader("Personalization Details Found")
+            for factor_name, details in result["personalization"].items():
+                with st.expander(f"Factor: {factor_name}"):
+                    st.write(f"**Details:** {details['details']}")
+                    st.write(f"**Action:** {details['action']}")
         else:
-            st.warning("No opening message was generated. Check the logs for details.")
+            st.info("No personalization factors were found for this person.")
+    else:
+        st.warning("No opening message was generated. Check the logs for details.")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""
+Benchmark: end-to-end batch throughput with local stand-ins for search, web and LLM.
+
+- search_web: a fixture search index, 10 results per person pointing at the local page server
+- get_html_content: the real fetcher, against a local HTTP server that serves the HTML
+  fixtures (with the person's name substituted) with configurable latency, jitter and errors
+- call_llm: utils.fake_llm.FakeLLM with a fixed latency plus a latency per output token
+
+main_batch.py runs once per --workers setting, each in a fresh subprocess with all caches
+off, so runs don't share warm caches and peak memory is per setting. Reports people/minute,
+p50/p95 per step and peak RSS. With --fail-below, exits non-zero if any setting is slower
+than that many people/minute, for CI.
+
+Usage: python -m bench.bench_batch [--people 40] [--workers 1,4,8] [--fail-below 20]
+                                   [-- extra main_batch.py flags, e.g. --pipeline]
+"""
+import argparse
+import csv
+import functools
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "html")
+FIXTURE_NAMES = ("Ada Lovelace", "Jane Doe")  # Names in the fixtures, replaced by the person's name
+FIRST_NAMES = ["Ada", "Grace", "Alan", "Katherine", "Linus", "Barbara", "Dennis", "Margaret"]
+LAST_NAMES = ["Hopper", "Turing", "Johnson", "Torvalds", "Liskov", "Ritchie", "Hamilton", "Knuth"]
+REPORTED_STEPS = ["SearchPersonNode.exec", "ContentRetrievalNode.exec", "DeduplicateContentNode.exec",
+                  "StreamingResearchNode.exec", "AnalyzeResultsBatchNode.exec", "DraftOpeningNode.exec",
+                  "get_html_content", "call_llm"]
+
+def make_people(count):
+    return [
+        {"first_name": FIRST_NAMES[i % len(FIRST_NAMES)],
+         "last_name": f"{LAST_NAMES[i // len(FIRST_NAMES) % len(LAST_NAMES)]}{i // 64 or ''}",
+         "keywords": "engineer keynote"}
+        for i in range(count)
+    ]
+
+class PageHandler(BaseHTTPRequestHandler):
+    """
+    GET /p/<First>-<Last>/<n> serves fixture n % 3 about that person,
+    after `latency` + up to `jitter` seconds, or a 503 with probability `error_rate`.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency, jitter, error_rate = 0.2, 0.1, 0.05
+    pages = []
+
+    def do_GET(self):
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 3 or parts[0] != "p" or random.random() < self.error_rate:
+            self.send_error(503 if len(parts) == 3 else 404)
+            return
+        name = parts[1].replace("-", " ")
+        body = self.pages[int(parts[2]) % len(self.pages)]
+        for fixture_name in FIXTURE_NAMES:
+            body = body.replace(fixture_name, name)
+        body = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def fixture_search(base_url, latency, query, num_results=10, **kwargs):
+    # Half the hits mention the person in the title, like a real result page
+    time.sleep(latency)
+    first_name, last_name = query.split()[:2]
+    return [
+        {"link": f"{base_url}/p/{first_name}-{last_name}/{i}",
+         "title": f"{first_name} {last_name} - profile {i}" if i % 2 == 0 else f"Company news {i}",
+         "snippet": f"{first_name} {last_name} spoke about engineering." if i < 5 else "Quarterly results."}
+        for i in range(num_results)
+    ]
+
+def run_child(config):
+    """
+    One benchmark run: stand-ins in place, main_batch.main() on a generated input.
+    """
+    # Caches would turn repeat runs into no-ops; set before the utilities read their settings
+    os.environ.update({"PAGE_CACHE": "0", "LLM_CACHE": "0", "SEARCH_CACHE": "0"})
+    PageHandler.latency, PageHandler.jitter, PageHandler.error_rate = (
+        config["page_latency"], config["page_jitter"], config["error_rate"])
+    PageHandler.pages = [open(os.path.join(FIXTURES, name), encoding="utf-8").read()
+                         for name in sorted(os.listdir(FIXTURES))]
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Keep per-person output off the terminal (the flow logger writes to the original stdout)
+    saved_stdout = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+
+    import flow
+    import main_batch
+    from utils.fake_llm import FakeLLM
+    from utils.metrics import metrics
+
+    fake_llm = FakeLLM(latency=config["llm_latency"], token_latency=config["llm_token_latency"], seed=1)
+
+    def call_llm(prompt, **kwargs):
+        with metrics.span("call_llm"):
+            return fake_llm(prompt, **kwargs)
+
+    flow.call_llm = call_llm
+    flow.search_web = functools.partial(fixture_search, f"http://127.0.0.1:{server.server_port}", config["search_latency"])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "people.csv")
+        with open(input_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["first_name", "last_name", "keywords"])
+            writer.writeheader()
+            writer.writerows(make_people(config["people"]))
+        sys.argv = ["main_batch.py", "--input", input_path, "--output", os.path.join(tmp, "out.csv"),
+                    "--workers", str(config["workers"])] + config["extra_args"]
+
+        try:
+            start = time.perf_counter()
+            main_batch.main()
+            elapsed = time.perf_counter() - start
+        finally:
+            sys.stdout.flush()
+            os.dup2(saved_stdout, 1)
+
+    summary = metrics.summary()
+    return {
+        "workers": config["workers"],
+        "people": config["people"],
+        "seconds": elapsed,
+        "people_per_minute": config["people"] / elapsed * 60,
+        "llm_calls": fake_llm.calls,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # KB on Linux
+        "steps": {name: {"p50": summary[name]["p50"], "p95": summary[name]["p95"]}
+                  for name in REPORTED_STEPS if name in summary}
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark main_batch.py offline against local stand-ins.")
+    parser.add_argument("--people", type=int, default=40)
+    parser.add_argument("--workers", default="1,4,8", help="Comma-separated --workers settings to compare")
+    parser.add_argument("--page-latency", type=float, default=0.2, help="Seconds per page response")
+    parser.add_argument("--page-jitter", type=float, default=0.1, help="Extra random seconds per page response, up to")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="Share of page requests answered with a 503")
+    parser.add_argument("--search-latency", type=float, default=0.1)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Seconds per LLM call before the first token")
+    parser.add_argument("--llm-token-latency", type=float, default=0.002, help="Seconds per output token")
+    parser.add_argument("--json", default=None, help="Also write the results to this JSON file")
+    parser.add_argument("--fail-below", type=float, default=None, help="Exit 1 if any run is below this many people/minute")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args, extra_args = parser.parse_known_args()
+
+    if args.child:
+        with open(args.child, encoding="utf-8") as f:
+            config = json.load(f)
+        result = run_child(config)
+        with open(args.child, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    extra_args = [arg for arg in extra_args if arg != "--"]
+    results = []
+    print(f"{args.people} people, pages {args.page_latency}s + up to {args.page_jitter}s ({args.error_rate:.0%} errors), "
+          f"LLM {args.llm_latency}s + {args.llm_token_latency * 1000:.1f}ms/token {' '.join(extra_args)}")
+    print(f"{'workers':>7} {'seconds':>8} {'people/min':>10} {'LLM calls':>9} {'peak MB':>8}  p50 / p95 per step")
+    for workers in (int(w) for w in args.workers.split(",")):
+        config = {
+            "people": args.people, "workers": workers, "extra_args": extra_args,
+            "page_latency": args.page_latency, "page_jitter": args.page_jitter, "error_rate": args.error_rate,
+            "search_latency": args.search_latency, "llm_latency": args.llm_latency,
+            "llm_token_latency": args.llm_token_latency
+        }
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump(config, f)
+        try:
+            subprocess.run([sys.executable, "-m", "bench.bench_batch", "--child", f.name], check=True)
+            with open(f.name, encoding="utf-8") as result_file:
+                result = json.load(result_file)
+        finally:
+            os.unlink(f.name)
+        results.append(result)
+        steps = ", ".join(f"{name} {stats['p50']:.2f}/{stats['p95']:.2f}s" for name, stats in result["steps"].items())
+        print(f"{workers:>7} {result['seconds']:>8.1f} {result['people_per_minute']:>10.1f} "
+              f"{result['llm_calls']:>9} {result['peak_rss_mb']:>8.0f}  {steps}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.fail_below is not None:
+        slow = [r for r in results if r["people_per_minute"] < args.fail_below]
+        if slow:
+            print(f"FAIL: {len(slow)} run(s) below {args.fail_below} people/minute")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
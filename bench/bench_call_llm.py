@@ -0,0 +1,85 @@
+"""
+Micro-benchmark: per-call overhead of call_llm with a fresh client per call
+(the old behaviour) vs the pooled process-wide client.
+
+Runs against a local stub of the Vertex Messages endpoint, so it measures
+client construction and connection setup, not model latency.
+
+Usage: python -m bench.bench_call_llm [--calls 200]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_RESPONSE = json.dumps({
+    "id": "msg_stub",
+    "type": "message",
+    "role": "assistant",
+    "model": "stub",
+    "content": [{"type": "text", "text": "ok"}],
+    "stop_reason": "end_turn",
+    "stop_sequence": None,
+    "usage": {"input_tokens": 5, "output_tokens": 1}
+}).encode()
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Allow keep-alive
+    disable_nagle_algorithm = True
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        StubHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(STUB_RESPONSE)))
+        self.end_headers()
+        self.wfile.write(STUB_RESPONSE)
+
+    def log_message(self, format, *args):
+        pass
+
+def run(label, fn, calls):
+    StubHandler.connections = 0
+    fn("warm up")
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn("Hello")
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed / calls * 1000:8.2f} ms/call   {StubHandler.connections:4d} connections")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark call_llm client reuse against a local stub server.")
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["ANTHROPIC_VERTEX_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ["ANTHROPIC_ACCESS_TOKEN"] = "stub-token"
+
+    from anthropic import AnthropicVertex
+    from utils.call_llm import call_llm, _client_options, DEFAULT_MODEL
+
+    def call_llm_fresh_client(prompt):
+        client = AnthropicVertex(**_client_options())
+        response = client.messages.create(
+            max_tokens=1024,
+            messages=[{"role": "user", "content": prompt}],
+            model=DEFAULT_MODEL
+        )
+        return response.content[0].text
+
+    print(f"{args.calls} sequential calls against {os.environ['ANTHROPIC_VERTEX_BASE_URL']}")
+    run("before: new client per call", call_llm_fresh_client, args.calls)
+    run("after: pooled client", call_llm, args.calls)
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
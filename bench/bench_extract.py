@@ -0,0 +1,53 @@
+"""
+Benchmark: HTML-to-text extraction backends over the HTML fixtures
+(regenerate them with python -m bench.html_fixtures).
+
+For every installed backend, reports throughput and checks that the
+extracted text stays equivalent to the html.parser fallback (same title,
+word-set Jaccard similarity at or above --min-similarity).
+
+Usage: python -m bench.bench_extract [--repeat 20] [--fixtures bench/fixtures/html]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from utils.html_extract import EXTRACTORS, extract_html_parser
+
+def similarity(a, b):
+    a, b = set(a.split()), set(b.split())
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML extraction backends.")
+    parser.add_argument("--fixtures", default=os.path.join(os.path.dirname(__file__), "fixtures", "html"))
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--min-similarity", type=float, default=0.98)
+    args = parser.parse_args()
+
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(args.fixtures, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages[os.path.basename(path)] = f.read()
+    total_mb = sum(len(html.encode("utf-8")) for html in pages.values()) / 1e6
+    print(f"{len(pages)} fixtures, {total_mb:.2f} MB, {args.repeat} repeats")
+
+    baseline = {name: extract_html_parser(html) for name, html in pages.items()}
+    failures = 0
+    for backend, extract in EXTRACTORS.items():
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            results = {name: extract(html) for name, html in pages.items()}
+        elapsed = time.perf_counter() - start
+        print(f"\n{backend:<12} {len(pages) * args.repeat / elapsed:8.1f} pages/s  {total_mb * args.repeat / elapsed:7.2f} MB/s")
+        for name, (title, text) in results.items():
+            base_title, base_text = baseline[name]
+            score = similarity(text, base_text)
+            ok = title == base_title and score >= args.min_similarity
+            failures += not ok
+            print(f"  {'ok  ' if ok else 'DIFF'} {name:<24} similarity {score:.3f}  {len(text):7d} chars")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
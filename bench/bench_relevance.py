@@ -0,0 +1,40 @@
+"""
+Benchmark: precision and recall of the relevance pre-filter against labeled pages.
+
+Each fixture is a search hit (title, snippet, page text) labeled with whether it
+is actually about the target person. A page "passes" the gate when its score is
+at or above the threshold.
+
+Usage: python -m bench.bench_relevance [--labels bench/fixtures/relevance_labels.json]
+"""
+import argparse
+import json
+import os
+from utils.relevance import relevance_score
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure relevance gate precision on labeled pages.")
+    parser.add_argument("--labels", default=os.path.join(os.path.dirname(__file__), "fixtures", "relevance_labels.json"))
+    parser.add_argument("--thresholds", default="0.1,0.2,0.3,0.4,0.5")
+    args = parser.parse_args()
+
+    with open(args.labels, encoding="utf-8") as f:
+        labeled = json.load(f)
+    scores = [
+        (relevance_score(item["first_name"], item["last_name"], item["text"],
+                         title=item["title"], snippet=item["snippet"], keywords=item["keywords"]),
+         item["relevant"])
+        for item in labeled
+    ]
+    relevant_total = sum(relevant for _, relevant in scores)
+    print(f"{len(scores)} labeled pages, {relevant_total} relevant")
+    print(f"{'threshold':>9} {'passed':>7} {'precision':>10} {'recall':>7} {'calls saved':>12}")
+    for threshold in (float(t) for t in args.thresholds.split(",")):
+        passed = [relevant for score, relevant in scores if score >= threshold]
+        true_positives = sum(passed)
+        precision = true_positives / len(passed) if passed else 1.0
+        recall = true_positives / relevant_total if relevant_total else 1.0
+        print(f"{threshold:>9.2f} {len(passed):>7} {precision:>10.2f} {recall:>7.2f} {len(scores) - len(passed):>12}")
+
+if __name__ == "__main__":
+    main()
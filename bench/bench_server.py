@@ -0,0 +1,117 @@
+"""
+Benchmark: load test of server.py with local stand-ins for search, web and LLM
+(the same ones as bench_batch.py), so no API keys or network access are needed.
+
+`--concurrency` clients send `--requests` requests to POST /openers in total, each client
+one request after another. A share of requests (`--duplicates`) repeats a person asked
+about shortly before, so coalescing shows up. Reports throughput, latency percentiles for
+served requests, 429s and coalesced requests, plus the server's p95 queue wait and run time.
+
+Usage: python -m bench.bench_server [--requests 200] [--concurrency 32] [--duplicates 0.3]
+                                    [--max-concurrent 8] [--max-queue 16]
+"""
+import argparse
+import asyncio
+import functools
+import os
+import random
+import socket
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from bench.bench_batch import FIXTURES, PageHandler, fixture_search, make_people
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def load(base_url, people, requests, concurrency, duplicates):
+    import httpx
+    results = []
+    recent = []
+    sent = iter(range(requests))
+
+    async def client(http):
+        for i in sent:
+            if recent and random.random() < duplicates:
+                person = random.choice(recent[-concurrency:])
+            else:
+                person = people[i % len(people)]
+                recent.append(person)
+            start = time.perf_counter()
+            response = await http.post(f"{base_url}/openers", json=person)
+            results.append((response.status_code, time.perf_counter() - start,
+                            response.json().get("timing") if response.status_code == 200 else None))
+
+    async with httpx.AsyncClient(timeout=300, limits=httpx.Limits(max_connections=concurrency)) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        return results, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test server.py offline against local stand-ins.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32, help="Clients sending requests at the same time")
+    parser.add_argument("--duplicates", type=float, default=0.3, help="Share of requests repeating a recent person")
+    parser.add_argument("--max-concurrent", type=int, default=8, help="SERVER_MAX_CONCURRENT")
+    parser.add_argument("--max-queue", type=int, default=16, help="SERVER_MAX_QUEUE")
+    parser.add_argument("--page-latency", type=float, default=0.2, help="Seconds per page response")
+    parser.add_argument("--search-latency", type=float, default=0.1)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Seconds per LLM call before the first token")
+    parser.add_argument("--llm-token-latency", type=float, default=0.002, help="Seconds per output token")
+    args = parser.parse_args()
+
+    # Settings are read when the modules are imported; caches would turn repeats into no-ops
+    os.environ.update({"PAGE_CACHE": "0", "LLM_CACHE": "0", "SEARCH_CACHE": "0",
+                       "SERVER_MAX_CONCURRENT": str(args.max_concurrent), "SERVER_MAX_QUEUE": str(args.max_queue)})
+    import logging
+    import uvicorn
+    import flow
+    import server
+    from utils.fake_llm import FakeLLM
+    from utils.metrics import metrics, percentile
+    logging.getLogger("personalization_flow").setLevel(logging.WARNING)
+
+    PageHandler.latency, PageHandler.jitter, PageHandler.error_rate = args.page_latency, 0.1, 0.0
+    PageHandler.pages = [open(os.path.join(FIXTURES, name), encoding="utf-8").read()
+                         for name in sorted(os.listdir(FIXTURES))]
+    pages = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    threading.Thread(target=pages.serve_forever, daemon=True).start()
+
+    fake_llm = FakeLLM(latency=args.llm_latency, token_latency=args.llm_token_latency, seed=1)
+
+    def call_llm(prompt, **kwargs):
+        with metrics.span("call_llm"):
+            return fake_llm(prompt, **kwargs)
+
+    flow.call_llm = call_llm
+    flow.search_web = functools.partial(fixture_search, f"http://127.0.0.1:{pages.server_port}", args.search_latency)
+
+    port = free_port()
+    api = uvicorn.Server(uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=api.run, daemon=True).start()
+    while not api.started:
+        time.sleep(0.05)
+
+    people = make_people(args.requests)
+    results, elapsed = asyncio.run(load(f"http://127.0.0.1:{port}", people, args.requests, args.concurrency,
+                                        args.duplicates))
+    api.should_exit = True
+
+    served = [(seconds, timing) for status, seconds, timing in results if status == 200]
+    latencies = [seconds for seconds, _ in served]
+    led = [timing for _, timing in served if not timing["coalesced"]]
+    statuses = {}
+    for status, _, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(f"{args.requests} requests, {args.concurrency} clients, {args.duplicates:.0%} repeats; "
+          f"server: {args.max_concurrent} concurrent + {args.max_queue} queued")
+    print(f"  {len(served) / elapsed:.1f} served/s over {elapsed:.1f}s; status codes: {statuses}")
+    print(f"  latency of served requests p50 {percentile(latencies, 50):.2f}s, p95 {percentile(latencies, 95):.2f}s, "
+          f"p99 {percentile(latencies, 99):.2f}s")
+    print(f"  {len(served) - len(led)} coalesced, {fake_llm.calls} LLM calls; flows: queue wait p95 "
+          f"{percentile([t['queue_seconds'] for t in led], 95):.2f}s, run p50 {percentile([t['run_seconds'] for t in led], 50):.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Generates the HTML fixtures used by bench_extract and the extraction tests.
+
+Real pages mix markup that the extraction backends parse differently: named and
+numeric entities, inline tags nested inside links, comments (including IE
+conditional comments), tables with omitted end tags, scripts holding markup in
+strings, XHTML declarations and plain malformed HTML (unclosed paragraphs and
+list items, stray end tags, unquoted attributes, no closing </body>). Each page
+is built from a seeded random mix of those pieces, so the files are reproducible.
+
+Each page is about one of the names bench_batch substitutes (Ada Lovelace, Jane Doe)
+and opens with LEAD, whose entities decode to LEAD_TEXT. Text that must never be
+extracted (scripts, comments, navigation, footers) carries the phrases in
+BOILERPLATE_PHRASES, so tests can check it was dropped.
+
+Usage: python -m bench.html_fixtures [--out bench/fixtures/html] [--seed 7]
+"""
+import argparse
+import os
+import random
+
+LEAD = "<p class=lead><b>{subject}</b> (born 1815 in Z&uuml;rich) leads R&amp;D at <a href=/acme><i>Acme&nbsp;&amp;&nbsp;Sons</i></a>&nbsp;&mdash; &ldquo;caf&eacute; &#8364;5&rdquo;.</p>"
+LEAD_TEXT = "leads R&D at Acme & Sons — “café €5”."
+BOILERPLATE_PHRASES = ["trackingId", "editor note", "Skip to content", "All rights reserved", "enable JavaScript"]
+
+NAMES = ["Jos&eacute; Mar&iacute;a Fern&aacute;ndez", "Zo&euml; O&#8217;Brien", "Bj&ouml;rn &Aring;kesson",
+         "Ada Lovelace", "Tim D. Cook", "&#26446;&#26126; (Li Ming)"]
+ORGS = ["Acme &amp; Sons", "M&uuml;ller GmbH", "Northwind&nbsp;Traders", "Contoso Ltd.", "Fabrikam, Inc."]
+VERBS = ["founded", "led", "joined", "advised", "expanded", "rebuilt", "acquired", "spoke about"]
+OBJECTS = ["the European sales team", "a &euro;40&nbsp;million expansion", "its first data center",
+           "the company&#x2019;s AI strategy", "a 3&ndash;year turnaround plan", "open-source tooling",
+           "the &ldquo;Future of Work&rdquo; keynote", "R&amp;D in Z&uuml;rich"]
+YEARS = [str(year) for year in range(1998, 2025)]
+
+def _inline(rng, text):
+    # Wrap a phrase in one to three nested inline tags
+    for _ in range(rng.randint(1, 3)):
+        tag = rng.choice(["strong", "em", "b", "i", "span class=hl", "a href=/wiki/x", "abbr title='x'"])
+        text = f"<{tag}>{text}</{tag.split()[0]}>"
+    return text
+
+def _sentence(rng, subject):
+    name = subject if rng.random() < 0.6 else rng.choice(NAMES)
+    org = _inline(rng, rng.choice(ORGS)) if rng.random() < 0.6 else rng.choice(ORGS)
+    sentence = f"In {rng.choice(YEARS)}, {name} {rng.choice(VERBS)} {rng.choice(OBJECTS)} at {org}"
+    if rng.random() < 0.3:
+        sentence += f"<sup class=reference><a href=#cite-{rng.randint(1, 99)}>[{rng.randint(1, 99)}]</a></sup>"
+    if rng.random() < 0.2:
+        sentence += " &mdash; a move analysts called &lsquo;bold&rsquo;&hellip;"
+    return sentence + "."
+
+def _paragraph(rng, subject):
+    body = " ".join(_sentence(rng, subject) for _ in range(rng.randint(2, 6)))
+    if rng.random() < 0.15:
+        body = body.replace(". ", ".<br>", 1)
+    # Malformed: roughly one paragraph in four is never closed
+    return f"<p>{body}" if rng.random() < 0.25 else f"<p>{body}</p>"
+
+def _table(rng, subject):
+    rows = []
+    for _ in range(rng.randint(3, 8)):
+        cells = [rng.choice(YEARS), rng.choice(ORGS), rng.choice(OBJECTS)]
+        if rng.random() < 0.5:
+            # Omitted </td> and </tr>, as allowed by HTML and common in older pages
+            rows.append("<tr>" + "".join(f"<td>{cell}" for cell in cells))
+        else:
+            rows.append("<tr>" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>")
+    head = "<thead><tr><th>Year</th><th>Organization</th><th>Role</th></tr></thead>" if rng.random() < 0.5 else ""
+    return f"<table class=wikitable border=1>{head}<tbody>{''.join(rows)}</tbody></table>"
+
+def _list(rng, subject):
+    items = "".join(f"<li>{_sentence(rng, subject)}" + ("</li>" if rng.random() < 0.5 else "") for _ in range(rng.randint(2, 6)))
+    # Ordered lists get a mismatched </ul>, as hand-edited pages sometimes do
+    return f"<{rng.choice(['ul', 'ol'])}>{items}</ul>"
+
+def _noise(rng, subject):
+    return rng.choice([
+        "<!-- editor note: verify the figures below before publishing -->",
+        "<!--[if lt IE 9]><script src=/js/html5shiv.js></script><![endif]-->",
+        "<script>var trackingId = 'UA-0000-1'; document.write('<div class=\"ad\">' + trackingId + '<\\/div>');</script>",
+        "<noscript>Please enable JavaScript to view the comments.</noscript>",
+        "<template><p>editor note: template row</p></template>",
+        "<svg width=10 height=10><text x=0 y=10>trackingId</text></svg>",
+        "</span></div>",  # Stray end tags
+        "<img src=/portrait.jpg alt='Portrait photo'>",
+        "<pre>$ pip install acme-sdk\n&gt; 3 packages installed</pre>",
+        "<blockquote>&ldquo;We ship when it&#39;s ready,&rdquo; " + subject + " said.</blockquote>",
+    ])
+
+def _section(rng, subject):
+    parts = [f"<h2 id=s{rng.randint(1, 999)}>{rng.choice(['Career', 'Early life', 'Leadership', 'Awards', 'Recognition'])}</h2>"]
+    for _ in range(rng.randint(2, 6)):
+        parts.append(rng.choices([_paragraph, _table, _list, _noise], weights=[6, 1, 1, 2])[0](rng, subject))
+    return "\n".join(parts)
+
+def make_page(rng, title, subject, sections, xhtml=False, close_body=True):
+    """
+    Returns one page about `subject` with `sections` body sections, page chrome and boilerplate around them.
+    """
+    head = (f"<head><meta charset=utf-8><title>{title}</title>"
+            "<style>body { font: 14px/1.4 sans-serif } .hl:after { content: 'editor note' }</style>"
+            "<script type='application/ld+json'>{\"@type\": \"Person\", \"trackingId\": \"x\"}</script></head>")
+    nav = ("<nav class=top><a href=#main>Skip to content</a><ul><li><a href=/>Home<li><a href=/about>About"
+           "<li><a href=/news>News</ul></nav>")
+    footer = "<footer><p>&copy; 2024 Example Media. All rights reserved.</p></footer>"
+    aside = "<aside><h3>Related</h3><ul><li>Skip to content</li><li>All rights reserved</li></ul></aside>"
+    body = "\n".join(_section(rng, subject) for _ in range(sections))
+    page = f"{head}\n<body class=article>{nav}\n<main id=main><h1>{title}</h1>\n{LEAD.format(subject=subject)}\n{body}\n</main>{aside}{footer}"
+    if close_body:
+        page += "</body></html>"
+    if xhtml:
+        return ('<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Strict//EN" '
+                '"http://www.w3.org/TR/xhtml1/DTD/xhtml1-strict.dtd">\n'
+                f'<html xmlns="http://www.w3.org/1999/xhtml">{page}')
+    return f"<!DOCTYPE html>\n<html lang=en>{page}"
+
+# name: (title, subject, sections, options); the biography is large enough for throughput numbers
+PAGES = {
+    "wiki_biography.html": ("Ada Lovelace &ndash; Wikipedia", "Ada Lovelace", 130, {}),
+    "news_article.html": ("Acme &amp; Sons CEO Ada Lovelace gives keynote at annual conference", "Ada Lovelace", 8, {}),
+    "company_about.html": ("About us | M&uuml;ller GmbH", "Jane Doe", 10, {"close_body": False}),
+    "xhtml_profile.html": ("Jane Doe &middot; Speaker profile", "Jane Doe", 5, {"xhtml": True}),
+    "malformed_forum.html": ("Re: Who runs Fabrikam now? &raquo; Forum", "Jane Doe", 6, {"close_body": False}),
+}
+
+def write_fixtures(out, seed=7):
+    rng = random.Random(seed)
+    os.makedirs(out, exist_ok=True)
+    for name, (title, subject, sections, options) in PAGES.items():
+        with open(os.path.join(out, name), "w", encoding="utf-8") as f:
+            f.write(make_page(rng, title, subject, sections, **options))
+    return list(PAGES)
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the HTML extraction fixtures.")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(__file__), "fixtures", "html"))
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    for name in write_fixtures(args.out, args.seed):
+        print(f"Wrote {os.path.join(args.out, name)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,18 @@
 from pocketflow import Node, BatchNode, Flow
-from utils.call_llm import call_llm
+from utils.call_llm import call_llm, forget_cached_llm_response
 from utils.search_web import search_web
 from utils.content_retrieval import get_html_content
+from utils.rate_limiter import llm_rate_limiter, backoff_delay
+from utils.text_budget import fit_text_to_budget
+from utils.dedupe import dedupe_pages, PageDeduplicator
+from utils.relevance import filter_relevant, relevance_score
+from utils.metrics import metrics, run_in_context
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import logging
+import queue
 import sys
+import threading
+import time
 
 # Configure logging
 logging.basicConfig(
@@ -17,7 +26,114 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 logger = logging.getLogger("personalization_flow")
 
 
-class SearchPersonNode(Node):
+class AnalysisParseError(ValueError):
+    """
+    The LLM answered, but the answer can't be parsed or lacks the expected structure.
+    """
+
+
+class InstrumentedNode(Node):
+    """
+    Node whose prep, exec and post are timed in utils.metrics, as "<NodeClass>.prep" etc.
+    Utility calls made inside (search, fetches, LLM calls) are recorded as their own spans.
+    Failed execs are retried after a jittered exponential backoff based on `wait`.
+    """
+    def _exec(self, prep_res):
+        for self.cur_retry in range(self.max_retries):
+            try:
+                return self.exec(prep_res)
+            except Exception as e:
+                if self.cur_retry == self.max_retries - 1:
+                    return self.exec_fallback(prep_res, e)
+                if self.wait > 0:
+                    time.sleep(backoff_delay(self.cur_retry, base=self.wait))
+    
+    def _run(self, shared):
+        name = type(self).__name__
+        with metrics.span(f"{name}.prep"):
+            prep_res = self.prep(shared)
+        with metrics.span(f"{name}.exec"):
+            exec_res = self._exec(prep_res)
+            metrics.add(retries=getattr(self, "cur_retry", 0))  # Set by Node._exec
+        with metrics.span(f"{name}.post"):
+            return self.post(shared, prep_res, exec_res)
+
+
+class ParallelBatchNode(InstrumentedNode, BatchNode):
+    """
+    BatchNode that runs exec for its items on a thread pool.
+    Results keep the item order. Items not finished before `deadline` seconds
+    get exec_fallback(item, TimeoutError) instead of a result.
+    Subclasses can stop the batch early by passing on_result to _exec.
+    A failing item is retried after a jittered exponential backoff based on `wait`,
+    without holding up the other items.
+    """
+    def __init__(self, max_retries=1, wait=0, max_workers=8, deadline=None):
+        super().__init__(max_retries=max_retries, wait=wait)
+        self.max_workers = max_workers
+        self.deadline = deadline
+    
+    def _exec_item(self, item):
+        # Same retry loop as Node._exec, but without sharing retry state on self across threads
+        for retry in range(self.max_retries):
+            try:
+                return self.exec(item)
+            except Exception as e:
+                if retry == self.max_retries - 1:
+                    return self.exec_fallback(item, e)
+                metrics.add(retries=1)
+                if self.wait > 0:
+                    time.sleep(backoff_delay(retry, base=self.wait))
+    
+    def _exec(self, items, on_result=None, window=None):
+        """
+        on_result(item, result), if given, is called in completion order as results arrive;
+        returning True stops early: items not started yet are skipped and left out of the results.
+        window, if given, caps how many items are submitted at a time; the next items are
+        submitted in order only after on_result has seen a finished one, so an early stop
+        actually saves the work that free workers would otherwise have picked up.
+        """
+        items = items or []
+        if not items:
+            return []
+        
+        window = window or len(items)
+        executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, window, len(items))))
+        deadline = None if self.deadline is None else time.monotonic() + self.deadline
+        pending = {}
+        results = {}
+        submitted = 0
+        stopped = False
+        while not stopped:
+            while submitted < len(items) and len(pending) < window:
+                # Items run in the caller's metrics context, so their spans count towards the same run
+                pending[executor.submit(run_in_context(self._exec_item), items[submitted])] = submitted
+                submitted += 1
+            if not pending:
+                break
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                logger.warning(f"{len(items) - len(results)}/{len(items)} items did not finish within the {self.deadline}s deadline")
+                break
+            for future in done:
+                i = pending.pop(future)
+                results[i] = future.result()
+                if on_result and on_result(items[i], results[i]):
+                    stopped = True
+                    break
+        # Don't block on stragglers past the deadline or the early stop; their results are dropped
+        executor.shutdown(wait=False, cancel_futures=True)
+        
+        if stopped:
+            return [results[i] for i in sorted(results)]
+        return [
+            results[i] if i in results else self.exec_fallback(item, TimeoutError(f"Deadline of {self.deadline}s exceeded"))
+            for i, item in enumerate(items)
+        ]
+
+
+class SearchPersonNode(InstrumentedNode):
     def prep(self, shared):
         # Read target person info from shared store
         first_name = shared["input"]["first_name"]
@@ -43,7 +159,30 @@ class SearchPersonNode(Node):
         return "default"
 
 
-class ContentRetrievalNode(BatchNode):
+class CompanySearchNode(InstrumentedNode):
+    """
+    Searches for an organization's keywords (e.g. "Google CEO tech") once for everyone
+    who shares them, rather than once per person.
+    """
+    def prep(self, shared):
+        return shared["company"]["keywords"]
+    
+    def exec(self, keywords):
+        logger.info(f"Executing company search with query: '{keywords}'")
+        return search_web(keywords)
+    
+    def post(self, shared, prep_res, exec_res):
+        shared["search_results"] = exec_res
+        logger.info(f"Stored {len(exec_res)} company search results in shared store")
+        return "default"
+
+
+class ContentRetrievalNode(ParallelBatchNode):
+    def __init__(self, max_workers=10, deadline=30, **kwargs):
+        # max_workers=1 fetches the URLs one after another. Parallel fetches to one host are
+        # limited process-wide by domain_concurrency (utils/rate_limiter.py) in get_html_content.
+        super().__init__(max_workers=max_workers, deadline=deadline, **kwargs)
+    
     def prep(self, shared):
         # Get list of URLs from search results
         search_results = shared["search_results"]
@@ -55,48 +194,303 @@ class ContentRetrievalNode(BatchNode):
         # Retrieve content from URL
         logger.debug(f"Retrieving content from URL: {url}")
         content = get_html_content(url)
+        if content.get("error"):
+            return {"url": url, "content": None}  # Dropped in post, like pages that failed all retries
         return {"url": url, "content": content}
     
     def exec_fallback(self, prep_res, exc):
-        # This is called after all retries are exhausted
-        url = prep_res["url"]  # Extract URL from the prep_res input pair
+        # This is called after all retries are exhausted, or when the stage deadline passes
+        url = prep_res  # Batch items of this node are plain URLs
         logger.error(f"Failed to retrieve content from {url} after all retries: {exc}")
         return {"url": url, "content": None}
     
+    @staticmethod
+    def covered_by_company(page, person, search_results=()):
+        """
+        True for a page the organization summary (company_context) already covers and
+        that never names the person, so analyzing it again would add nothing about them.
+        """
+        if page["url"] not in set(person.get("company_urls", [])):
+            return False
+        result = next((item for item in search_results if item.get("link") == page["url"]), {})
+        return relevance_score(person["first_name"], person["last_name"], page["content"]["text"],
+                               title=result.get("title") or page["content"].get("title") or "",
+                               snippet=result.get("snippet", "")) == 0
+    
     def post(self, shared, prep_res, exec_res_list):
         # Store only non-empty webpage contents
         valid_contents = [res for res in exec_res_list if res["content"]]
-        shared["web_contents"] = valid_contents
         logger.info(f"Retrieved content from {len(valid_contents)}/{len(exec_res_list)} URLs successfully")
+        person = shared.get("input", {})
+        if person.get("company_urls"):
+            covered = [res for res in valid_contents if self.covered_by_company(res, person, shared["search_results"])]
+            if covered:
+                valid_contents = [res for res in valid_contents if res not in covered]
+                logger.info(f"Skipping {len(covered)} pages covered by the organization summary that don't name the person")
+        shared["web_contents"] = valid_contents
+        return "default"
+
+
+class DeduplicateContentNode(InstrumentedNode):
+    def __init__(self, max_distance=3, **kwargs):
+        # max_distance: SimHash bits two pages may differ by and still count as the same text
+        super().__init__(**kwargs)
+        self.max_distance = max_distance
+    
+    def prep(self, shared):
+        return shared["web_contents"]
+    
+    def exec(self, web_contents):
+        # Same URL after canonicalization or redirects, or near-identical text (mirrors, syndicated copies)
+        return dedupe_pages(web_contents, max_distance=self.max_distance)
+    
+    def post(self, shared, prep_res, exec_res):
+        kept, duplicates = exec_res
+        for duplicate_url, kept_url in duplicates:
+            logger.debug(f"Skipping {duplicate_url}: duplicate of {kept_url}")
+        shared["web_contents"] = kept
+        logger.info(f"Kept {len(kept)}/{len(prep_res)} pages after de-duplication, avoiding {len(duplicates)} LLM analysis calls")
         return "default"
 
 
-class AnalyzeResultsBatchNode(BatchNode):
+class RelevanceFilterNode(InstrumentedNode):
+    def __init__(self, threshold=0.3, max_pages=6, **kwargs):
+        super().__init__(**kwargs)
+        self.threshold = threshold
+        self.max_pages = max_pages
+    
     def prep(self, shared):
-        # Store first_name, last_name, and personalization_factors for exec
-        self.first_name = shared["input"]["first_name"]
-        self.last_name = shared["input"]["last_name"]
-        self.personalization_factors = shared["input"]["personalization_factors"]
+        return shared["input"], shared["web_contents"], shared.get("search_results", [])
+    
+    def exec(self, prep_data):
+        # Score pages locally by name mentions and search title/snippet, before paying for LLM analysis
+        person, web_contents, search_results = prep_data
+        return filter_relevant(
+            web_contents, person["first_name"], person["last_name"], keywords=person.get("keywords", ""),
+            search_results=search_results, threshold=self.threshold, max_pages=self.max_pages
+        )
+    
+    def post(self, shared, prep_res, exec_res):
+        kept, skipped = exec_res
+        for url, score in skipped:
+            logger.debug(f"Skipping {url}: relevance {score}")
+        # Pages are now ordered most relevant first
+        shared["web_contents"] = kept
+        logger.info(f"Kept {len(kept)}/{len(prep_res[1])} pages about the target person, avoiding {len(skipped)} LLM analysis calls")
+        return "default"
+
+
+class FactorEvidence:
+    """
+    Accumulates page analyses as they complete and merges actionable details per factor.
+    Details are merged in page order rather than completion order, so the merged text
+    (and therefore the drafting prompt) doesn't depend on timing.
+    """
+    def __init__(self):
+        self.results = {}  # page position -> analysis result
+        self.sources = {}  # factor name -> pages with actionable details for it
+    
+    @staticmethod
+    def _factors(result):
+        analysis = result.get("analysis") or {}
+        return analysis.get("factors") or []
+    
+    def add(self, position, result):
+        self.results[position] = result
+        for factor in self._factors(result):
+            if factor.get("actionable", False) and factor.get("details"):
+                self.sources[factor["name"]] = self.sources.get(factor["name"], 0) + 1
+    
+    def satisfied(self, factor_names, min_sources):
+        return all(self.sources.get(name, 0) >= min_sources for name in factor_names)
+    
+    def merge(self, input_factors):
+        """
+        Returns (personalization dict, actionable factor count, total factor count).
+        """
+        found_factors = 0
+        total_factors = 0
+        
+        # Dictionary to temporarily store details for each factor across sources
+        factor_details = {}
+        for position in sorted(self.results):
+            for factor in self._factors(self.results[position]):
+                total_factors += 1
+                if factor.get("actionable", False):
+                    found_factors += 1
+                    factor_details.setdefault(factor["name"], []).append(factor.get("details", ""))
         
-        # Return list of (url, content) pairs
-        url_content_pairs = list(shared["web_contents"])
+        # Create final personalization entries for the requested factors, with their action
+        personalization = {}
+        actions = {factor["name"]: factor["action"] for factor in input_factors}
+        for factor_name, details_list in factor_details.items():
+            if factor_name in actions:
+                personalization[factor_name] = {
+                    "actionable": True,
+                    "details": " | ".join(details_list),  # Merge all details for this factor
+                    "action": actions[factor_name]
+                }
+        return personalization, found_factors, total_factors
+
+
+class AnalyzeResultsBatchNode(ParallelBatchNode):
+    """
+    Analyzes page contents for personalization factors.
+    
+    analysis_mode:
+        "per_page": one LLM call per page
+        "batched": several pages per call, packed up to batch_token_budget tokens and
+                   max_batch_pages pages; falls back to per-page calls if the answer can't be parsed
+        "auto": batched when there are at least min_batch_pages pages, per-page otherwise
+    
+    With min_sources set, pages are dispatched in relevance order (search order without the
+    relevance filter), at most early_exit_window calls at a time (default: min_sources + 1),
+    and no more calls are started once every factor has actionable details from min_sources
+    pages. Early exit skips whole calls, so it mainly saves calls with "per_page": batched
+    groups of up to max_batch_pages pages leave little to skip (with the defaults, "auto"
+    packs 6 pages into 2 calls).
+    """
+    def __init__(self, max_workers=5, rate_limiter=None, max_tokens=512, model=None, use_cache=True,
+                 max_page_tokens=1500, analysis_mode="auto", batch_token_budget=6000, max_batch_pages=5,
+                 min_batch_pages=3, min_sources=None, early_exit_window=None, **kwargs):
+        # Page analyses run concurrently, each waiting for room in the shared LLM rate limits.
+        # The YAML answer is short, so don't reserve a full 1024 output tokens per call.
+        super().__init__(max_workers=max_workers, **kwargs)
+        self.rate_limiter = rate_limiter or llm_rate_limiter
+        self.max_tokens = max_tokens
+        self.model = model
+        self.use_cache = use_cache
+        self.max_page_tokens = max_page_tokens
+        self.analysis_mode = analysis_mode
+        self.batch_token_budget = batch_token_budget
+        self.max_batch_pages = max_batch_pages
+        self.min_batch_pages = min_batch_pages
+        self.min_sources = min_sources
+        self.early_exit_window = early_exit_window
+    
+    def prep(self, shared):
+        # Carry first_name, last_name, and personalization_factors inside each item
+        # (not on self) so the node holds no per-person state between calls
+        factor_query = self.factor_query(shared["input"]["personalization_factors"])
+        url_content_pairs = [
+            self.page_item(position, item, shared["input"], factor_query)
+            for position, item in enumerate(shared["web_contents"])
+        ]
         logger.info(f"Analyzing content from {len(url_content_pairs)} web pages")
         return url_content_pairs
     
-    def exec(self, url_content_pair):
+    @staticmethod
+    def factor_query(personalization_factors):
+        return " ".join(f"{factor['name'].replace('_', ' ')} {factor['description']}" for factor in personalization_factors)
+    
+    def page_item(self, position, page, person, factor_query):
+        # Keep only the parts of the page most relevant to the person and factors that fit the budget
+        text, tokens_before, tokens_after = fit_text_to_budget(
+            page["content"]["text"], factor_query, max_tokens=self.max_page_tokens,
+            name_terms=[person["first_name"], person["last_name"]]
+        )
+        return {
+            "position": position,
+            "url": page["url"],
+            "content": page["content"],
+            "text": text,
+            "tokens": tokens_after,
+            "tokens_saved": tokens_before - tokens_after,
+            "first_name": person["first_name"],
+            "last_name": person["last_name"],
+            "personalization_factors": person["personalization_factors"],
+            "company_context": person.get("company_context", "")
+        }
+    
+    def _group_pages(self, pages):
+        # Pack pages into groups analyzed by one LLM call each; a group of one is a per-page call
+        batched = self.analysis_mode == "batched" or (
+            self.analysis_mode == "auto" and len(pages) >= self.min_batch_pages
+        )
+        if not batched:
+            return [[page] for page in pages]
+        
+        groups, current, tokens = [], [], 0
+        for page in pages:
+            if current and (tokens + page["tokens"] > self.batch_token_budget or len(current) >= self.max_batch_pages):
+                groups.append(current)
+                current, tokens = [], 0
+            current.append(page)
+            tokens += page["tokens"]
+        if current:
+            groups.append(current)
+        return groups
+    
+    def _exec(self, items):
+        items = items or []
+        groups = self._group_pages(items)
+        if len(groups) < len(items):
+            logger.info(f"Packed {len(items)} pages into {len(groups)} analysis calls")
+        
+        # Analyze groups in parallel, accumulating evidence as each one completes
+        evidence = FactorEvidence()
+        factor_names = [factor["name"] for factor in items[0]["personalization_factors"]] if items else []
+        
+        def on_result(group, group_results):
+            for page, result in zip(group, group_results):
+                evidence.add(page["position"], result)
+            return self.min_sources is not None and evidence.satisfied(factor_names, self.min_sources)
+        
+        # Without early exit every group is submitted at once; with it, a small window keeps
+        # calls from starting before the results so far have been checked
+        window = None
+        if self.min_sources is not None:
+            window = min(self.max_workers, self.early_exit_window or self.min_sources + 1)
+        super()._exec(groups, on_result=on_result, window=window)
+        if len(evidence.results) < len(items):
+            logger.info(f"Every factor has {self.min_sources}+ sources after {len(evidence.results)}/{len(items)} pages; "
+                        f"skipped the rest")
+        return evidence
+    
+    def exec(self, pages):
+        if len(pages) == 1:
+            return [self._analyze_page(pages[0])]
+        try:
+            return self._analyze_pages(pages)
+        except AnalysisParseError as e:
+            # Only an unusable answer falls back; rate limits and transport errors are raised
+            # to _exec_item's backoff instead of multiplying the load by the page count
+            logger.warning(f"Batched analysis of {len(pages)} pages failed ({e}); falling back to per-page calls")
+            return [result for page in pages for result in self._exec_item([page])]
+    
+    def _call_llm_yaml(self, prompt, max_tokens, parse=None):
+        # Call LLM and extract the YAML portion from the response; parse(analysis), if given,
+        # checks its structure and returns the result, raising if the answer is unusable
+        # The prompt holds the person, the factor set and the page text (but not the style),
+        # so a cached analysis is reused until one of those changes
+        response = call_llm(prompt, max_tokens=max_tokens, model=self.model, use_cache=self.use_cache,
+                            rate_limiter=self.rate_limiter)
+        import yaml
+        try:
+            yaml_part = response.split("```yaml")[1].split("```")[0].strip()
+            analysis = yaml.safe_load(yaml_part)
+            return parse(analysis) if parse else analysis
+        except Exception as e:
+            # Don't keep an unusable answer cached, or the retry (and later runs) would get it back
+            if self.use_cache:
+                forget_cached_llm_response(prompt, max_tokens=max_tokens, model=self.model)
+            raise AnalysisParseError(f"Unusable analysis answer: {e!r}") from e
+    
+    def _analyze_page(self, url_content_pair):
         url, content = url_content_pair["url"], url_content_pair["content"]
+        first_name, last_name = url_content_pair["first_name"], url_content_pair["last_name"]
         logger.debug(f"Analyzing content from: {url}")
         
         # Prepare prompt for LLM analysis
-        prompt = f"""Analyze the following webpage content about {self.first_name} {self.last_name}.
+        prompt = f"""Analyze the following webpage content about {first_name} {last_name}.
 Look for the following personalization factors:
-{self._format_personalization_factors(self.personalization_factors)}
-
+{self._format_personalization_factors(url_content_pair["personalization_factors"])}
+{self._format_company_context(url_content_pair)}
 Content from {url}:
 Title: {content["title"]}
 
 Text:
-{content["text"]}  # Limit text to avoid overly large prompts
+{url_content_pair["text"]}
 
 For each factor, return if you found relevant information and details.
 Format your response as YAML:
@@ -112,22 +506,62 @@ factors:
     details: "supporting details if actionable"
 ```"""
         
-        # Call LLM to analyze the content
         logger.debug(f"Calling LLM to analyze content from {url}")
-        response = call_llm(prompt)
-        
-        # Extract YAML portion from the response
-        import yaml
-        yaml_part = response.split("```yaml")[1].split("```")[0].strip()
-        analysis = yaml.safe_load(yaml_part)
+        analysis = self._call_llm_yaml(prompt, self.max_tokens)
         logger.debug(f"Successfully parsed YAML from LLM response for {url}")
-        return {"url": url, "analysis": analysis}
+        return {"url": url, "analysis": analysis, "tokens_saved": url_content_pair["tokens_saved"]}
+    
+    def _analyze_pages(self, pages):
+        first_name, last_name = pages[0]["first_name"], pages[0]["last_name"]
+        logger.debug(f"Analyzing {len(pages)} pages in one call")
+        
+        page_sections = "\n\n".join(
+            f"""Page {i+1} - {page["url"]}
+Title: {page["content"]["title"]}
+
+Text:
+{page["text"]}"""
+            for i, page in enumerate(pages)
+        )
+        prompt = f"""Analyze the following {len(pages)} webpages about {first_name} {last_name}.
+Look for the following personalization factors:
+{self._format_personalization_factors(pages[0]["personalization_factors"])}
+{self._format_company_context(pages[0])}
+{page_sections}
+
+For each page, and each factor, return if you found relevant information and details.
+Format your response as YAML, with one entry per page in the same order as above:
+```yaml
+pages:
+    - url: "page url"
+    factors:
+        - name: "factor_name"
+        action: "action to take"
+        actionable: true/false
+        details: "supporting details if actionable"
+```"""
+        
+        max_tokens = min(4096, self.max_tokens * len(pages))
+        return self._call_llm_yaml(prompt, max_tokens, parse=lambda analysis: self._match_pages(pages, analysis))
+    
+    @staticmethod
+    def _match_pages(pages, analysis):
+        # Match answers to pages by URL, or by position; anything missing is a parse failure
+        entries = analysis["pages"]
+        by_url = {entry.get("url"): entry for entry in entries}
+        results = []
+        for i, page in enumerate(pages):
+            entry = by_url.get(page["url"]) or (entries[i] if len(entries) == len(pages) else None)
+            if entry is None or not isinstance(entry.get("factors"), list):
+                raise ValueError(f"No analysis returned for {page['url']}")
+            results.append({"url": page["url"], "analysis": {"factors": entry["factors"]}, "tokens_saved": page["tokens_saved"]})
+        return results
     
     def exec_fallback(self, prep_res, exc):
-        # This is called after all retries are exhausted
-        url = prep_res["url"]  # Extract URL from the prep_res input pair
-        logger.error(f"Failed to analyze content from {url} after all retries: {exc}")
-        return {"url": url, "analysis": {"factors": []}}
+        # This is called after all retries are exhausted; prep_res is a group of pages
+        for page in prep_res:
+            logger.error(f"Failed to analyze content from {page['url']} after all retries: {exc}")
+        return [{"url": page["url"], "analysis": {"factors": []}} for page in prep_res]
     
     def _format_personalization_factors(self, factors):
         formatted = ""
@@ -135,53 +569,149 @@ factors:
             formatted += f"{i+1}. {factor['name']}: {factor['description']}\n   Action: {factor['action']}\n"
         return formatted
     
-    def post(self, shared, prep_res, exec_res_list):
-        # Initialize personalization in shared store
-        shared["personalization"] = {}
+    def _format_company_context(self, page):
+        # Empty unless the batch researched the person's organization; prompts stay unchanged then
+        if not page.get("company_context"):
+            return ""
+        return f"""Background on their organization, researched once for everyone who works there (use it to
+interpret the page; only report details the page supports about this person):
+{page["company_context"]}
+"""
+    
+    def post(self, shared, prep_res, exec_res):
+        # exec_res is the FactorEvidence accumulated while analyses completed
+        evidence = exec_res
+        personalization, found_factors, total_factors = evidence.merge(shared["input"]["personalization_factors"])
+        shared["personalization"] = personalization
+        for factor_name in personalization:
+            logger.debug(f"Found information for factor: {factor_name}")
         
-        # Process all analysis results
-        found_factors = 0
-        total_factors = 0
+        tokens_saved = sum(result.get("tokens_saved", 0) for result in evidence.results.values())
+        logger.info(f"Analysis complete: Found information for {found_factors}/{total_factors} factors across {len(evidence.results)} sources")
+        logger.info(f"Trimmed {tokens_saved} page tokens from analysis prompts")
+        return "default"
+
+
+class StreamingResearchNode(InstrumentedNode):
+    """
+    Retrieval, de-duplication, relevance filtering and analysis as one pipelined stage:
+    each page is filtered and sent to analysis as soon as it is fetched, so fetch and LLM
+    latency overlap. At most queue_size pages wait for an analysis worker and queue_size
+    more for the filters; when analysis falls behind, fetching waits instead of piling up
+    (the fetcher's deadline keeps running while it waits).
+    
+    Pages are analyzed one per call, in the order they arrive, so max_pages keeps the first
+    relevant pages to arrive rather than the most relevant ones. Analyses are still merged
+    in search result order.
+    """
+    def __init__(self, fetcher, analyzer, dedupe=True, relevance_threshold=0.3, max_pages=6, queue_size=4, **kwargs):
+        # fetcher (ContentRetrievalNode) and analyzer (AnalyzeResultsBatchNode) do the per-page work
+        super().__init__(**kwargs)
+        self.fetcher = fetcher
+        self.analyzer = analyzer
+        self.dedupe = dedupe
+        self.relevance_threshold = relevance_threshold
+        self.max_pages = max_pages
+        self.queue_size = queue_size
+    
+    def prep(self, shared):
+        urls = [result["link"] for result in shared["search_results"] if "link" in result]
+        logger.info(f"Streaming {len(urls)} URLs through retrieval and analysis")
+        return shared["input"], shared["search_results"], urls
+    
+    def exec(self, prep_data):
+        person, search_results, urls = prep_data
+        positions = {}
+        for position, url in enumerate(urls):
+            positions.setdefault(url, position)
         
-        # Dictionary to temporarily store details for each factor across sources
-        factor_details = {}
+        pages = queue.Queue(maxsize=self.queue_size)
+        enough_pages = threading.Event()
+        satisfied = threading.Event()
         
-        for result in exec_res_list:
-            if "analysis" in result and "factors" in result["analysis"]:
-                for factor in result["analysis"]["factors"]:
-                    total_factors += 1
-                    if factor.get("actionable", False):
-                        found_factors += 1
-                        factor_name = factor["name"]
-                        
-                        # Initialize if first time seeing this factor
-                        if factor_name not in factor_details:
-                            factor_details[factor_name] = []
-                        
-                        # Add details from this source
-                        factor_details[factor_name].append(factor["details"])
-        
-        # Process collected details and create final personalization entries
-        for factor_name, details_list in factor_details.items():
-            # Find the matching factor from input to get the action
-            for input_factor in shared["input"]["personalization_factors"]:
-                if input_factor["name"] == factor_name:
-                    # Merge all details for this factor
-                    merged_details = " | ".join(details_list)
-                    
-                    shared["personalization"][factor_name] = {
-                        "actionable": True,
-                        "details": merged_details,
-                        "action": input_factor["action"]
-                    }
-                    logger.debug(f"Found information for factor: {factor_name}")
-                    break
+        def fetch():
+            # Hand each page over as it arrives; stop fetching once nothing more would be analyzed.
+            # The window keeps new fetches from starting while put() waits for room in the queue.
+            try:
+                self.fetcher._exec(list(positions), on_result=lambda url, page: (
+                    pages.put(page) or enough_pages.is_set() or satisfied.is_set()
+                ), window=self.fetcher.max_workers)
+            finally:
+                pages.put(None)
+        threading.Thread(target=run_in_context(fetch), daemon=True).start()
         
-        logger.info(f"Analysis complete: Found information for {found_factors}/{total_factors} factors across {len(exec_res_list)} sources")
-        return "default"
+        factors = person["personalization_factors"]
+        factor_names = [factor["name"] for factor in factors]
+        factor_query = self.analyzer.factor_query(factors)
+        evidence, evidence_lock = FactorEvidence(), threading.Lock()
+        deduplicator = PageDeduplicator()
+        kept, counts = [], {"fetched": 0, "duplicates": 0, "skipped": 0}
+        
+        # Pages submitted but not analyzed yet: waiting ones plus one per analysis worker
+        in_flight = threading.Semaphore(self.queue_size + max(1, self.analyzer.max_workers))
+        
+        def analyzed(position, future):
+            in_flight.release()
+            if future.cancelled():
+                return
+            with evidence_lock:
+                evidence.add(position, future.result()[0])
+                if self.analyzer.min_sources is not None and evidence.satisfied(factor_names, self.analyzer.min_sources):
+                    satisfied.set()
+        
+        analysis_pool = ThreadPoolExecutor(max_workers=max(1, self.analyzer.max_workers))
+        while True:
+            page = pages.get()
+            if page is None:
+                break
+            if not page["content"] or enough_pages.is_set() or satisfied.is_set():
+                continue
+            counts["fetched"] += 1
+            if self.fetcher.covered_by_company(page, person, search_results):
+                counts["skipped"] += 1
+                continue
+            if self.dedupe and deduplicator.check(page):
+                counts["duplicates"] += 1
+                continue
+            if self.relevance_threshold is not None:
+                relevant, _ = filter_relevant(
+                    [page], person["first_name"], person["last_name"], keywords=person.get("keywords", ""),
+                    search_results=search_results, threshold=self.relevance_threshold, max_pages=1
+                )
+                if not relevant:
+                    counts["skipped"] += 1
+                    continue
+                page = relevant[0]
+            if len(kept) + 1 >= self.max_pages:
+                enough_pages.set()
+            
+            position = positions[page["url"]]
+            kept.append((position, page))
+            item = self.analyzer.page_item(position, page, person, factor_query)
+            in_flight.acquire()  # Blocks while analysis is behind, so the fetch queue fills and fetching waits
+            future = analysis_pool.submit(run_in_context(self.analyzer._exec_item), [item])
+            future.add_done_callback(lambda future, position=position: analyzed(position, future))
+        
+        # With enough evidence, analyses that haven't started are cancelled
+        analysis_pool.shutdown(wait=True, cancel_futures=satisfied.is_set())
+        return [page for _, page in sorted(kept, key=lambda pair: pair[0])], evidence, counts
+    
+    def post(self, shared, prep_res, exec_res):
+        kept, evidence, counts = exec_res
+        shared["web_contents"] = kept
+        logger.info(f"Streamed {counts['fetched']}/{len(prep_res[2])} pages: {counts['duplicates']} duplicates, "
+                    f"{counts['skipped']} not about the target person, {len(evidence.results)} analyzed")
+        return self.analyzer.post(shared, kept, evidence)
 
 
-class DraftOpeningNode(Node):
+class DraftOpeningNode(InstrumentedNode):
+    def __init__(self, rate_limiter=None, max_tokens=300, model=None, use_cache=True, **kwargs):
+        super().__init__(**kwargs)
+        self.rate_limiter = rate_limiter or llm_rate_limiter
+        self.max_tokens = max_tokens
+        self.model = model
+        self.use_cache = use_cache
+    
     def prep(self, shared):
         # Gather all necessary information
         person_info = {
@@ -217,7 +747,8 @@ Only return the opening message, nothing else."""
         
         # Call LLM to draft the opening
         logger.debug("Calling LLM to draft personalized opening message")
-        return call_llm(prompt)
+        return call_llm(prompt, max_tokens=self.max_tokens, model=self.model, use_cache=self.use_cache,
+                        rate_limiter=self.rate_limiter)
     
     def _format_personalization_details(self, personalization):
         if not personalization:
@@ -237,17 +768,145 @@ Only return the opening message, nothing else."""
         return "default"
 
 
-# Create nodes
-logger.info("Initializing flow nodes")
-search_node = SearchPersonNode()
-content_node = ContentRetrievalNode()
-analyze_node = AnalyzeResultsBatchNode(max_retries=2, wait=10)  # Retry up to 3 times before using fallback
-draft_node = DraftOpeningNode(max_retries=3, wait=10)
+class SummarizeCompanyNode(InstrumentedNode):
+    """
+    Summarizes the top company search pages into a short background text, which
+    main_batch.py passes to the analysis of everyone who shares the company's keywords.
+    """
+    def __init__(self, rate_limiter=None, max_tokens=400, model=None, use_cache=True, max_pages=5,
+                 max_page_tokens=800, **kwargs):
+        super().__init__(**kwargs)
+        self.rate_limiter = rate_limiter or llm_rate_limiter
+        self.max_tokens = max_tokens
+        self.model = model
+        self.use_cache = use_cache
+        self.max_pages = max_pages
+        self.max_page_tokens = max_page_tokens
+    
+    def prep(self, shared):
+        keywords = shared["company"]["keywords"]
+        pages = [
+            {"url": page["url"], "title": page["content"]["title"],
+             "text": fit_text_to_budget(page["content"]["text"], keywords, max_tokens=self.max_page_tokens)[0]}
+            for page in shared["web_contents"][:self.max_pages]
+        ]
+        logger.info(f"Summarizing {len(pages)} company pages for '{keywords}'")
+        return keywords, pages
+    
+    def exec(self, prep_data):
+        keywords, pages = prep_data
+        if not pages:
+            return ""
+        page_sections = "\n\n".join(
+            f"Page {i+1} - {page['url']}\nTitle: {page['title']}\n\nText:\n{page['text']}" for i, page in enumerate(pages)
+        )
+        prompt = f"""The following webpages are about the organization described by "{keywords}".
+
+{page_sections}
+
+Summarize what they say about the organization in at most 150 words: recent news, products,
+events, announcements and leadership changes that would be useful background when writing to
+someone who works there. Only return the summary, nothing else."""
+        
+        return call_llm(prompt, max_tokens=self.max_tokens, model=self.model, use_cache=self.use_cache,
+                        rate_limiter=self.rate_limiter).strip()
+    
+    def exec_fallback(self, prep_res, exc):
+        # Without a summary, people are researched as if there were no company context
+        logger.error(f"Failed to summarize company pages for '{prep_res[0]}': {exc}")
+        return ""
+    
+    def post(self, shared, prep_res, exec_res):
+        _, pages = prep_res
+        shared["company"]["context"] = exec_res
+        shared["company"]["urls"] = [page["url"] for page in pages] if exec_res else []
+        logger.info(f"Stored company context for '{shared['company']['keywords']}' ({len(exec_res)} chars)")
+        return "default"
+
+
+def create_company_research_flow(fetch_workers=10, fetch_deadline=30, model=None,
+                                 cache_summary=True, max_pages=5, **options):
+    """
+    Build a flow that researches an organization once: search its keywords, fetch the
+    results and summarize the top `max_pages` pages. Run it on {"company": {"keywords": ...}};
+    it sets shared["company"]["context"] (the summary) and ["urls"] (the summarized pages).
+    
+    Pass the results to a person's flow as shared["input"]["company_context"] and
+    ["company_urls"]: the person's analysis prompts include the context, and pages it
+    already covers are analyzed for the person only if they name them. Other options are ignored, so the
+    options of create_cold_outreach_stages can be passed as they are.
+    """
+    search_node = CompanySearchNode()
+    content_node = ContentRetrievalNode(max_workers=fetch_workers, deadline=fetch_deadline)
+    summarize_node = SummarizeCompanyNode(model=model, use_cache=cache_summary, max_pages=max_pages, max_retries=3, wait=2)
+    search_node >> content_node >> summarize_node
+    return Flow(start=search_node)
+
+
+def create_cold_outreach_stages(fetch_workers=10, fetch_deadline=30, analyze_workers=5, model=None,
+                                cache_analysis=True, cache_draft=True, max_page_tokens=1500,
+                                analysis_mode="auto", dedupe=True, relevance_threshold=0.3, max_pages=6,
+                                early_exit_sources=None, pipeline=False, queue_size=4):
+    """
+    Build the three stages of the cold outreach flow as separate flows: search, research
+    (retrieval, filtering and analysis) and drafting. Each runs on the same shared store.
+    A stage flow holds no per-person state, so it can run for several people at once.
+    
+    Args:
+        fetch_workers (int): URLs fetched in parallel per person (1 = one at a time)
+        fetch_deadline (float): Seconds allowed for the whole retrieval stage (None = no limit)
+        analyze_workers (int): Pages analyzed by the LLM in parallel per person
+        model (str, optional): LLM model for analysis and drafting (default: ANTHROPIC_MODEL)
+        cache_analysis (bool): Reuse cached LLM responses for page analyses
+        cache_draft (bool): Reuse cached LLM responses for the opening message
+        max_page_tokens (int): Token budget for one page's text in an analysis prompt
+        analysis_mode (str): "per_page", "batched" or "auto" (see AnalyzeResultsBatchNode)
+        dedupe (bool): Drop duplicate and near-duplicate pages before analysis
+        relevance_threshold (float): Minimum relevance score (0-1) for a page to be analyzed (None = no filter)
+        max_pages (int): Most relevant pages analyzed per person
+        early_exit_sources (int, optional): Stop analyzing once every factor has this many supporting pages
+        pipeline (bool): Analyze each page as soon as it is fetched (see StreamingResearchNode);
+                         analysis_mode is not used then
+        queue_size (int): Fetched pages waiting for analysis in pipeline mode
+    
+    LLM request/token budgets come from LLM_REQUESTS_PER_MINUTE and LLM_TOKENS_PER_MINUTE.
+    """
+    search_node = SearchPersonNode()
+    content_node = ContentRetrievalNode(max_workers=fetch_workers, deadline=fetch_deadline)
+    analyze_node = AnalyzeResultsBatchNode(max_workers=analyze_workers, model=model, use_cache=cache_analysis,
+                                           max_page_tokens=max_page_tokens, analysis_mode=analysis_mode,
+                                           min_sources=early_exit_sources, max_retries=3, wait=2)  # Back off ~2s, ~4s before using fallback
+    draft_node = DraftOpeningNode(model=model, use_cache=cache_draft, max_retries=3, wait=2)  # Overload also lowers llm_concurrency
+    
+    if pipeline:
+        research = [StreamingResearchNode(content_node, analyze_node, dedupe=dedupe, relevance_threshold=relevance_threshold,
+                                          max_pages=max_pages, queue_size=queue_size)]
+    else:
+        # Retrieval, then the optional filtering stages, then analysis
+        research = [content_node]
+        if dedupe:
+            research.append(DeduplicateContentNode())
+        if relevance_threshold is not None:
+            research.append(RelevanceFilterNode(threshold=relevance_threshold, max_pages=max_pages))
+        research.append(analyze_node)
+    for current, following in zip(research, research[1:]):
+        current >> following
+    
+    return Flow(start=search_node), Flow(start=research[0]), Flow(start=draft_node)
+
+
+def create_cold_outreach_flow(**options):
+    """
+    Build a fresh cold outreach flow with its own node instances.
+    Use one flow per concurrently processed person.
+    Options are those of create_cold_outreach_stages.
+    """
+    search_flow, research_flow, draft_flow = create_cold_outreach_stages(**options)
+    search_flow >> research_flow >> draft_flow
+    return Flow(start=search_flow)
 
-# Connect nodes in the flow
-logger.info("Connecting nodes in personalization flow")
-search_node >> content_node >> analyze_node >> draft_node
 
-# Create the flow
-cold_outreach_flow = Flow(start=search_node)
-logger.info("Personalization flow initialized successfully")
\ No newline at end of file
+# Default flow instance for single-person use (main.py, app.py)
+logger.info("Initializing personalization flow")
+cold_outreach_flow = create_cold_outreach_flow()
+logger.info("Personalization flow initialized successfully")
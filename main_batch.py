@@ -1,8 +1,300 @@
-import csv
 import argparse
 import os
-import json
-from flow import cold_outreach_flow
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from contextlib import nullcontext
+import flow
+from flow import create_cold_outreach_stages, create_company_research_flow
+from utils.call_llm import get_llm_cache, LLM_CACHE_ENABLED
+from utils.content_retrieval import page_cache_stats
+from utils.search_web import search_stats, normalize_query
+from utils.text_budget import budget_stats
+from utils.dedupe import dedupe_stats
+from utils.relevance import relevance_stats
+from utils.rate_limiter import concurrency_stats, ADAPTIVE_CONCURRENCY
+from utils.pipeline import run_pipeline
+from utils.checkpoint import BatchCheckpoint
+from utils.metrics import metrics, format_run_summary
+from utils.batch_io import read_people, count_rows, make_record, open_record_writer
+from utils.cassette import Cassette
+
+# Hardcoded personalization factors
+PERSONALIZATION_FACTORS = [
+    {
+        "name": "personal_connection",
+        "description": "Check if target person has Columbia University affiliation",
+        "action": "If they do, mention shared connection to Columbia"
+    },
+    {
+        "name": "recent_promotion",
+        "description": "Check if target person was recently promoted",
+        "action": "If they were, congratulate them on their new role"
+    },
+    {
+        "name": "recent_talks",
+        "description": "Check if target person gave talks recently",
+        "action": "If they did, mention enjoying their insights"
+    }
+]
+
+# Hardcoded style preference
+STYLE = "Be concise, specific, and casual in 30 words or less. For example: 'Heard about your talk on the future of space exploration—loved your take on creating a more sustainable path for space travel.'"
+
+def make_shared(person, personalization_factors, style):
+    # Prepare input data
+    return {
+        "input": {
+            "first_name": person['first_name'],
+            "last_name": person['last_name'],
+            "keywords": person['keywords'],
+            "personalization_factors": personalization_factors,
+            "style": style
+        }
+    }
+
+def result_record(person, shared, factor_names):
+    # Prepare the output record from the shared store
+    urls = [result.get("link", "") for result in shared.get("search_results", []) if "link" in result]
+    record = make_record(
+        person, factor_names,
+        opening_message=shared.get("output", {}).get("opening_message", ""),
+        search_results=urls,
+        personalization=shared.get("personalization", {})
+    )
+    
+    # Display the result
+    print(f"Generated opener for {person['first_name']} {person['last_name']}: {record['opening_message']}")
+    return record
+
+def error_record(person, error, factor_names):
+    print(f"Error processing {person['first_name']} {person['last_name']}: {str(error)}")
+    # Failed records keep the same schema, with empty personalization fields
+    return make_record(person, factor_names, error=str(error))
+
+# Shared store fields each stage produces, restored from the checkpoint instead of re-running the stage
+STAGE_OUTPUTS = [
+    ("search", ["search_results"]),
+    ("research", ["web_contents", "personalization"]),
+    ("draft", ["output"])
+]
+
+def run_stage(stage, stage_flow, shared, checkpoint=None, key=None):
+    """
+    Runs one stage flow on the shared store, or restores its outputs saved by an earlier run.
+    """
+    fields = dict(STAGE_OUTPUTS)[stage]
+    saved = checkpoint.load_stage(key, stage) if checkpoint else None
+    if saved is not None:
+        shared.update(saved)
+        return
+    stage_flow.run(shared)
+    if checkpoint:
+        outputs = {field: shared[field] for field in fields if field in shared}
+        if "web_contents" in outputs:
+            # Keep the extracted text, not the raw HTML
+            outputs["web_contents"] = [
+                {"url": page["url"], "content": {k: v for k, v in page["content"].items() if k != "html"}}
+                for page in outputs["web_contents"]
+            ]
+        checkpoint.save_stage(key, stage, outputs)
+
+class CompanyResearch:
+    """
+    Company-level research shared by the rows of a batch: rows whose keywords (normalized
+    like search queries) appear in at least `min_rows` rows get the organization searched,
+    fetched and summarized once, the first time one of them needs it. Opt-in (--company-research):
+    it adds a search, fetches and a summary call per group, and only helps when the shared
+    keywords really name an organization.
+    
+    Args:
+        keyword_counts (Counter): Rows per normalized keywords in the input
+        min_rows (int): Rows that must share keywords for company research to run
+        flow_options (dict): Options for create_company_research_flow
+        checkpoint (BatchCheckpoint, optional): Saves the summaries with --save-stages
+    """
+    def __init__(self, keyword_counts, min_rows=3, flow_options=None, checkpoint=None):
+        self.keyword_counts = keyword_counts
+        self.min_rows = min_rows
+        self.flow_options = flow_options or {}
+        self.checkpoint = checkpoint
+        self.researched = {}  # Normalized keywords -> Future of {"context", "urls"}
+        self._lock = threading.Lock()
+    
+    def add_context(self, shared):
+        """
+        Adds company_context and company_urls to the person's input if their keywords are shared.
+        """
+        keywords = shared["input"]["keywords"]
+        key = normalize_query(keywords)
+        if self.keyword_counts[key] < self.min_rows:
+            return
+        # The first row to get here researches; rows processed at the same time wait for it
+        with self._lock:
+            future = self.researched.get(key)
+            leader = future is None
+            if leader:
+                future = self.researched[key] = Future()
+        if leader:
+            try:
+                future.set_result(self._research(key, keywords))
+            except BaseException as e:
+                future.set_exception(e)
+        company = future.result()
+        if company["context"]:
+            shared["input"]["company_context"] = company["context"]
+            shared["input"]["company_urls"] = company["urls"]
+    
+    def _research(self, key, keywords):
+        company = self.checkpoint.load_stage(f"company:{key}", "company") if self.checkpoint else None
+        if company is None:
+            print(f"\nResearching '{keywords}' once for {self.keyword_counts[key]} people")
+            shared = {"company": {"keywords": keywords}}
+            run_id = f"company {keywords}"
+            with metrics.run(run_id):
+                try:
+                    create_company_research_flow(**self.flow_options).run(shared)
+                    company = {"context": shared["company"]["context"], "urls": shared["company"]["urls"]}
+                except Exception as e:
+                    # The rows are still researched one by one, just without the shared context
+                    print(f"Error researching '{keywords}': {e}")
+                    company = {"context": "", "urls": []}
+            summary = metrics.finish_run(run_id)
+            print(f"Timing for '{keywords}': {format_run_summary(summary, [name for name in summary if name.endswith('.exec')])}")
+            if self.checkpoint and company["context"]:
+                self.checkpoint.save_stage(f"company:{key}", "company", company)
+        return company
+
+def print_timing(person, summary):
+    # Wall time of each node's exec, time spent waiting for the LLM rate limits, and LLM usage
+    names = [name for name in summary if name.endswith(".exec")] + ["llm_rate_limit_wait"]
+    print(f"Timing for {person['first_name']} {person['last_name']}: {format_run_summary(summary, names)}")
+
+def process_person(person, personalization_factors, style, index=1, total=1, flow_options=None, checkpoint=None,
+                   company_research=None):
+    """
+    Runs the personalization flow for one person and returns the output record.
+    Each call builds its own flows and shared store, so calls can run in parallel threads.
+    flow_options are passed to create_cold_outreach_stages.
+    With a checkpoint, the record is journaled when done, and rows (or stages) finished by
+    an earlier run are reused when resuming. With company_research, shared company context
+    is added to the person's input first.
+    """
+    factor_names = [factor["name"] for factor in personalization_factors]
+    key = BatchCheckpoint.row_key(person, personalization_factors, style)
+    finished = checkpoint.finished_row(key) if checkpoint else None
+    if finished is not None:
+        print(f"\nSkipping {index}/{total}: {person['first_name']} {person['last_name']} (finished in an earlier run)")
+        return finished
+    
+    print(f"\nProcessing {index}/{total}: {person['first_name']} {person['last_name']}")
+    shared = make_shared(person, personalization_factors, style)
+    if company_research:
+        company_research.add_context(shared)
+    
+    # Run the flow, one stage at a time
+    run_id = f"{index} {person['first_name']} {person['last_name']}"
+    with metrics.run(run_id):
+        try:
+            stage_flows = create_cold_outreach_stages(**(flow_options or {}))
+            for (stage, _), stage_flow in zip(STAGE_OUTPUTS, stage_flows):
+                run_stage(stage, stage_flow, shared, checkpoint, key)
+            record = result_record(person, shared, factor_names)
+        except Exception as e:
+            record = error_record(person, e, factor_names)
+    print_timing(person, metrics.finish_run(run_id))
+    if checkpoint:
+        checkpoint.record_row(key, record, ok=record["error"] is None)
+    return record
+
+def process_pipelined(people, personalization_factors, style, total=None, workers=1, queue_size=4, flow_options=None,
+                      checkpoint=None, company_research=None):
+    """
+    Runs the search, research and drafting stages for different people at the same time:
+    while one person's opener is drafted, the next people are already being searched and
+    researched. Each stage runs up to `workers` people at once, and at most `queue_size`
+    people wait between stages. Yields output records in input order.
+    """
+    factor_names = [factor["name"] for factor in personalization_factors]
+    stage_flows = create_cold_outreach_stages(**(flow_options or {}))
+    
+    def stage(name, stage_flow, first=False):
+        def run(job):
+            if first:
+                job["row"] = checkpoint.finished_row(job["key"]) if checkpoint else None
+                note = "" if job["row"] is None else " (finished in an earlier run)"
+                action = "Processing" if job["row"] is None else "Skipping"
+                print(f"\n{action} {job['index']}/{total}: {job['person']['first_name']} {job['person']['last_name']}{note}")
+                if job["row"] is None and company_research:
+                    company_research.add_context(job["shared"])
+            if job["row"] is None and job["error"] is None:
+                with metrics.run(job["run_id"]):
+                    try:
+                        run_stage(name, stage_flow, job["shared"], checkpoint, job["key"])
+                    except Exception as e:
+                        job["error"] = e  # Later stages skip this person
+            return job
+        return run
+    
+    jobs = (
+        {"index": index, "person": person, "shared": make_shared(person, personalization_factors, style),
+         "key": BatchCheckpoint.row_key(person, personalization_factors, style), "row": None, "error": None,
+         "run_id": f"{index} {person['first_name']} {person['last_name']}"}
+        for index, person in enumerate(people, 1)
+    )
+    stages = [(stage(name, stage_flow, first=i == 0), workers)
+              for i, ((name, _), stage_flow) in enumerate(zip(STAGE_OUTPUTS, stage_flows))]
+    for job in run_pipeline(jobs, stages, queue_size=queue_size):
+        if job["row"] is not None:
+            yield job["row"]
+            continue
+        if job["error"] is not None:
+            record = error_record(job["person"], job["error"], factor_names)
+        else:
+            record = result_record(job["person"], job["shared"], factor_names)
+        print_timing(job["person"], metrics.finish_run(job["run_id"]))
+        if checkpoint:
+            checkpoint.record_row(job["key"], record, ok=record["error"] is None)
+        yield record
+
+def add_flow_arguments(parser):
+    # Per-person flow options, shared with main_distributed.py
+    parser.add_argument('--fetch-workers', type=int, default=10, help='URLs fetched in parallel per person (default: 10)')
+    parser.add_argument('--fetch-deadline', type=float, default=30, help='Seconds allowed for fetching one person\'s pages (default: 30)')
+    parser.add_argument('--analyze-workers', type=int, default=5, help='Pages analyzed by the LLM in parallel per person (default: 5)')
+    parser.add_argument('--max-page-tokens', type=int, default=1500, help='Token budget for one page in an analysis prompt (default: 1500)')
+    parser.add_argument('--analysis-mode', choices=['auto', 'per_page', 'batched'], default='auto',
+                        help='Analyze pages one per LLM call, several per call, or batched when there are 3+ pages (default: auto)')
+    parser.add_argument('--no-dedupe', action='store_true', help='Analyze duplicate and near-duplicate pages separately')
+    parser.add_argument('--relevance-threshold', type=float, default=0.3,
+                        help='Minimum relevance score (0-1) for a page to be analyzed; negative disables the filter (default: 0.3)')
+    parser.add_argument('--max-pages', type=int, default=6, help='Most relevant pages analyzed per person (default: 6)')
+    parser.add_argument('--early-exit-sources', type=int, default=None,
+                        help='Stop analyzing pages once every factor has this many supporting pages (default: analyze all)')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Analyze pages as soon as they are fetched, and overlap the search, research and drafting of different people')
+    parser.add_argument('--queue-size', type=int, default=4,
+                        help='In pipeline mode, pages waiting for analysis per person and people waiting between stages (default: 4)')
+    parser.add_argument('--no-cache-analysis', action='store_true', help='Always re-run page analyses instead of using cached LLM responses')
+    parser.add_argument('--no-cache-draft', action='store_true', help='Always re-draft openers instead of using cached LLM responses')
+
+def flow_options_from_args(args):
+    # Options for create_cold_outreach_stages from the add_flow_arguments flags
+    return {
+        "fetch_workers": args.fetch_workers,
+        "fetch_deadline": args.fetch_deadline,
+        "analyze_workers": args.analyze_workers,
+        "cache_analysis": not args.no_cache_analysis,
+        "cache_draft": not args.no_cache_draft,
+        "max_page_tokens": args.max_page_tokens,
+        "analysis_mode": args.analysis_mode,
+        "dedupe": not args.no_dedupe,
+        "relevance_threshold": args.relevance_threshold if args.relevance_threshold >= 0 else None,
+        "max_pages": args.max_pages,
+        "early_exit_sources": args.early_exit_sources,
+        "pipeline": args.pipeline,
+        "queue_size": args.queue_size
+    }
 
 def main():
     """
@@ -12,132 +304,157 @@ def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Process multiple cold outreach targets from a CSV file.')
     parser.add_argument('--input', default='input.csv', help='Input CSV file (default: input.csv)')
-    parser.add_argument('--output', default='output.csv', help='Output CSV file (default: output.csv)')
+    parser.add_argument('--output', default='output.csv', help='Output file (default: output.csv)')
+    parser.add_argument('--format', choices=['csv', 'jsonl', 'parquet'], default=None,
+                        help='Output format (default: from the output file extension, else csv; parquet needs pyarrow)')
+    parser.add_argument('--workers', type=int, default=1, help='Number of people to process concurrently (default: 1)')
+    add_flow_arguments(parser)
+    parser.add_argument('--company-research', action='store_true',
+                        help='Research the organization once for rows sharing the same keywords, and give them its summary as context')
+    parser.add_argument('--company-min-rows', type=int, default=3,
+                        help='Rows that must share keywords for their organization to be researched once for all of them (default: 3)')
+    parser.add_argument('--journal', default=None,
+                        help='Checkpoint file recording finished rows (default: <output>.journal.sqlite)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Reuse rows finished by an earlier run from the journal and re-run only failed or missing rows')
+    parser.add_argument('--save-stages', action='store_true',
+                        help='Also journal search hits, page text and analyses, so resumed rows skip finished stages')
+    parser.add_argument('--metrics-jsonl', default=None,
+                        help='Append every timed span (node steps, searches, fetches, LLM calls) and per-person summary to this JSON lines file')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Serve Prometheus metrics at http://127.0.0.1:PORT/metrics while the batch runs')
+    cassette_group = parser.add_mutually_exclusive_group()
+    cassette_group.add_argument('--record', default=None, metavar='CASSETTE',
+                                help='Record every search, page fetch and LLM call of the run to this compressed file')
+    cassette_group.add_argument('--replay', default=None, metavar='CASSETTE',
+                                help='Re-run the batch from a recorded cassette, without network access or API calls')
     args = parser.parse_args()
     
+    if args.workers < 1:
+        print("Error: --workers must be at least 1.")
+        return
+    if args.queue_size < 1:
+        print("Error: --queue-size must be at least 1.")
+        return
+    
     # Check if input file exists
     if not os.path.exists(args.input):
         print(f"Error: Input file '{args.input}' not found.")
         return
     
-    # Hardcoded personalization factors
-    personalization_factors = [
-        {
-            "name": "personal_connection",
-            "description": "Check if target person has Columbia University affiliation",
-            "action": "If they do, mention shared connection to Columbia"
-        },
-        {
-            "name": "recent_promotion",
-            "description": "Check if target person was recently promoted",
-            "action": "If they were, congratulate them on their new role"
-        },
-        {
-            "name": "recent_talks",
-            "description": "Check if target person gave talks recently",
-            "action": "If they did, mention enjoying their insights"
-        }
-    ]
+    personalization_factors = PERSONALIZATION_FACTORS
     
     # Extract factor names for later use
     factor_names = [factor["name"] for factor in personalization_factors]
     print(factor_names)
     
-    # Hardcoded style preference
-    style = "Be concise, specific, and casual in 30 words or less. For example: 'Heard about your talk on the future of space exploration—loved your take on creating a more sustainable path for space travel.'"
+    style = STYLE
     
-    # Read input CSV
-    input_data = []
-    with open(args.input, 'r', newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            if 'first_name' in row and 'last_name' in row and 'keywords' in row:
-                input_data.append(row)
+    if args.replay and not os.path.exists(args.replay):
+        print(f"Error: Cassette '{args.replay}' not found.")
+        return
+    
+    if args.metrics_jsonl:
+        metrics.export_jsonl(args.metrics_jsonl)
+    if args.metrics_port is not None:
+        server = metrics.serve(args.metrics_port)
+        print(f"Serving metrics at http://127.0.0.1:{server.server_port}/metrics")
     
-    if not input_data:
+    # Rows are read lazily; only a count is taken up front, for progress messages
+    total = count_rows(args.input)
+    if total == 0:
         print(f"Error: No valid data found in '{args.input}'. CSV should have columns: first_name, last_name, keywords")
         return
+    try:
+        people = read_people(args.input)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
     
-    # Process each person
-    results = []
-    total = len(input_data)
-    for i, person in enumerate(input_data, 1):
-        print(f"\nProcessing {i}/{total}: {person['first_name']} {person['last_name']}")
-        
-        # Prepare input data
-        shared = {
-            "input": {
-                "first_name": person['first_name'],
-                "last_name": person['last_name'],
-                "keywords": person['keywords'],
-                "personalization_factors": personalization_factors,
-                "style": style
-            }
-        }
-        
-        # Run the flow
-        try:
-            cold_outreach_flow.run(shared)
-            
-            # Prepare result row
-            # Extract URLs as comma-separated string
-            urls = [result.get("link", "") for result in shared.get("search_results", []) if "link" in result]
-            url_string = ",".join(urls)
-            
-            # Extract personalization details
-            personalization_data = {}
-            for factor_name, details in shared.get("personalization", {}).items():
-                personalization_data[factor_name + "_actionable"] = str(details.get("actionable", False))
-                personalization_data[factor_name + "_details"] = details.get("details", "")
-            
-            result = {
-                'first_name': person['first_name'],
-                'last_name': person['last_name'],
-                'keywords': person['keywords'],
-                'opening_message': shared.get("output", {}).get("opening_message", ""),
-                'search_results': url_string,
-                **personalization_data  # Add all personalization fields
-            }
-            results.append(result)
-            
-            # Display the result
-            print(f"Generated opener: {result['opening_message']}")
-            
-        except Exception as e:
-            print(f"Error processing {person['first_name']} {person['last_name']}: {str(e)}")
-            # Add failed row with error message
-            results.append({
-                'first_name': person['first_name'],
-                'last_name': person['last_name'],
-                'keywords': person['keywords'],
-                'opening_message': f"ERROR: {str(e)}",
-                'search_results': "",
-                # Include empty personalization fields for consistency with successful rows
-                **{f"{factor}_actionable": "False" for factor in factor_names},
-                **{f"{factor}_details": "" for factor in factor_names}
-            })
-    
-    # Write results to output CSV
-    if results:
-        # Determine all field names by examining all the result rows
-        all_fields = set()
-        for result in results:
-            all_fields.update(result.keys())
-        
-        fieldnames = ['first_name', 'last_name', 'keywords', 'opening_message', 'search_results']
-        # Add personalization fields in a specific order
-        for factor in factor_names:
-            if f"{factor}_actionable" in all_fields:
-                fieldnames.append(f"{factor}_actionable")
-            if f"{factor}_details" in all_fields:
-                fieldnames.append(f"{factor}_details")
-        
-        with open(args.output, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(results)
-        
+    # Process each person, running up to --workers people concurrently.
+    # Rows come back in input order and are written as soon as they are ready, so a crash
+    # loses at most the rows in flight; --resume picks up from the journal.
+    flow_options = flow_options_from_args(args)
+    checkpoint = BatchCheckpoint(args.journal or f"{args.output}.journal.sqlite",
+                                 resume=args.resume, save_stages=args.save_stages)
+    
+    # Rows that share keywords (e.g. "Google CEO tech") share one company-level research run
+    company_research = None
+    if args.company_research:
+        keyword_counts = Counter(normalize_query(person["keywords"]) for person in read_people(args.input))
+        shared_groups = sum(1 for count in keyword_counts.values() if count >= args.company_min_rows)
+        if shared_groups:
+            print(f"{shared_groups} keyword groups are shared by {args.company_min_rows}+ rows; researching each organization once")
+            company_research = CompanyResearch(keyword_counts, min_rows=args.company_min_rows,
+                                               flow_options=flow_options, checkpoint=checkpoint)
+    
+    if args.pipeline:
+        results = process_pipelined(people, personalization_factors, style, total=total, workers=args.workers,
+                                    queue_size=args.queue_size, flow_options=flow_options, checkpoint=checkpoint,
+                                    company_research=company_research)
+    else:
+        results = run_pipeline(
+            enumerate(people, 1),
+            [(lambda indexed_person: process_person(
+                indexed_person[1], personalization_factors, style,
+                index=indexed_person[0], total=total, flow_options=flow_options, checkpoint=checkpoint,
+                company_research=company_research
+            ), args.workers)],
+            queue_size=args.workers
+        )
+    
+    # The schema is fixed by the factor list, so records are written as soon as they are ready.
+    # People are processed while the results are consumed, so the cassette covers this whole loop.
+    cassette = Cassette(args.record, "record") if args.record else Cassette(args.replay) if args.replay else None
+    written = failed = 0
+    try:
+        with cassette.patch(flow) if cassette else nullcontext(), \
+                open_record_writer(args.output, factor_names, fmt=args.format) as writer:
+            for record in results:
+                writer.write(record)
+                written += 1
+                failed += record["error"] is not None
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    
+    if written:
         print(f"\nProcessing complete. Results written to '{args.output}'")
+        if failed:
+            print(f"{failed}/{written} rows failed; re-run them with --resume")
+        if LLM_CACHE_ENABLED:
+            stats = get_llm_cache().stats()
+            print(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+        stats = page_cache_stats()
+        print(f"Page cache: {stats['hits']} hits, {stats['misses']} misses, {stats['revalidated']} revalidated, "
+              f"{stats['coalesced']} concurrent fetches shared")
+        stats = search_stats()
+        print(f"Search: {stats['api_requests']} API requests, {stats['requests_saved']} saved "
+              f"({stats['cache_hits']} cached, {stats['coalesced']} shared in flight)")
+        stats = budget_stats()
+        print(f"Analysis prompts: {stats['tokens_saved']} page tokens saved by trimming "
+              f"{stats['trimmed_pages']}/{stats['pages']} pages to the token budget")
+        stats = dedupe_stats()
+        print(f"De-duplication: {stats['duplicates']}/{stats['pages']} pages were duplicates, "
+              f"avoiding {stats['duplicates']} LLM analysis calls")
+        stats = relevance_stats()
+        print(f"Relevance filter: skipped {stats['skipped']}/{stats['pages']} pages, "
+              f"avoiding {stats['skipped']} LLM analysis calls")
+        if ADAPTIVE_CONCURRENCY:
+            stats = concurrency_stats()
+            cut_domains = {domain: domain_stats for domain, domain_stats in stats["domains"].items() if domain_stats["cuts"]}
+            print(f"Adaptive concurrency: LLM limit {stats['llm']['limit']:g} ({stats['llm']['cuts']} cuts), "
+                  f"search {stats['search']['limit']:g} ({stats['search']['cuts']} cuts), "
+                  f"{len(cut_domains)}/{len(stats['domains'])} domains throttled"
+                  + "".join(f"\n  {domain}: limit {domain_stats['limit']:g} ({domain_stats['cuts']} cuts)"
+                            for domain, domain_stats in sorted(cut_domains.items())))
+        if cassette:
+            stats = cassette.stats()
+            print(f"Cassette ({cassette.mode}): {stats['search']} searches, {stats['page']} pages, {stats['llm']} LLM calls"
+                  + (f", {stats['misses']} calls not in the cassette" if args.replay else ""))
+        print("\nLatency per step:")
+        for line in metrics.report():
+            print(f"  {line}")
     else:
         print("\nNo results to write.")
 
@@ -0,0 +1,186 @@
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from main_batch import PERSONALIZATION_FACTORS, STYLE, add_flow_arguments, flow_options_from_args, process_person
+from utils.batch_io import read_people, count_rows, make_record, open_record_writer
+from utils.checkpoint import BatchCheckpoint
+from utils.work_queue import open_work_queue
+
+def enqueue(work_queue, input_path):
+    """
+    Adds every input row to the queue. Keys include the row number, so re-enqueueing
+    the same file adds nothing and duplicate rows still get their own output row.
+    """
+    total = count_rows(input_path)
+    tasks = (
+        (f"{index}:{BatchCheckpoint.row_key(person, PERSONALIZATION_FACTORS, STYLE)}",
+         {"index": index, "total": total, "person": person})
+        for index, person in enumerate(read_people(input_path), 1)
+    )
+    added = work_queue.enqueue(tasks)
+    print(f"Queued {added} new rows ({total - added} already in the queue)")
+
+def keep_leased(work_queue, task_id, worker, stop):
+    # Heartbeats a few times per lease period until the row is done
+    while not stop.wait(work_queue.lease_seconds / 3):
+        if not work_queue.heartbeat(task_id, worker):
+            print(f"{worker} lost the lease on task {task_id}; another worker will redo it")
+            return
+
+def work(work_queue, worker, flow_options, poll_seconds=2):
+    """
+    Claims and processes rows until the queue has nothing queued or leased.
+    Failed rows go back to the queue for another attempt, possibly on another worker.
+    """
+    processed = 0
+    while True:
+        task = work_queue.claim(worker)
+        if task is None:
+            counts = work_queue.counts()
+            if counts["queued"] == 0 and counts["leased"] == 0:
+                return processed
+            time.sleep(poll_seconds)  # Leases held by other workers may still expire
+            continue
+
+        task_id, payload, attempt = task
+        stop = threading.Event()
+        threading.Thread(target=keep_leased, args=(work_queue, task_id, worker, stop), daemon=True).start()
+        try:
+            record = process_person(payload["person"], PERSONALIZATION_FACTORS, STYLE, index=payload["index"],
+                                    total=payload["total"], flow_options=flow_options)
+        finally:
+            stop.set()
+        if record["error"] is None:
+            work_queue.complete(task_id, worker, record)
+        else:
+            print(f"Attempt {attempt} failed for row {payload['index']}")
+            work_queue.fail(task_id, worker, record["error"], result=record)
+        processed += 1
+
+def collect(work_queue, output_path, fmt=None):
+    """
+    Writes the finished rows to the output file in input order.
+    """
+    factor_names = [factor["name"] for factor in PERSONALIZATION_FACTORS]
+    counts = work_queue.counts()
+    with open_record_writer(output_path, factor_names, fmt=fmt) as writer:
+        for payload, status, record, error in work_queue.results():
+            writer.write(record or make_record(payload["person"], factor_names, error=error))
+    print(f"Wrote {counts['done'] + counts['failed']} rows to '{output_path}' "
+          f"({counts['done']} done, {counts['failed']} failed)")
+    if counts["queued"] or counts["leased"]:
+        print(f"{counts['queued'] + counts['leased']} rows are not finished yet; run collect again later")
+
+def main():
+    """
+    Distributed batch processing: a queue of input rows shared by worker processes,
+    on one machine or several.
+
+        python main_distributed.py enqueue --input people.csv --queue batch.queue.sqlite
+        python main_distributed.py work --queue batch.queue.sqlite --workers 4   # on every worker host
+        python main_distributed.py collect --queue batch.queue.sqlite --output results.csv
+
+    or everything at once with local worker processes:
+
+        python main_distributed.py local --input people.csv --output results.csv --processes 4
+    """
+    parser = argparse.ArgumentParser(description='Process a batch of cold outreach targets with several worker processes.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_queue_arguments(command, default=None):
+        command.add_argument('--queue', default=default, required=default is None,
+                             help='Queue: a SQLite file, or redis://host:port/db#name for workers on several machines')
+        command.add_argument('--lease', type=float, default=60,
+                             help='Seconds a claimed row stays reserved without a heartbeat (default: 60)')
+        command.add_argument('--max-attempts', type=int, default=3, help='Claims per row before it is marked failed (default: 3)')
+
+    command = commands.add_parser('enqueue', help='Add the rows of a CSV file to the queue')
+    add_queue_arguments(command)
+    command.add_argument('--input', default='input.csv', help='Input CSV file (default: input.csv)')
+
+    command = commands.add_parser('work', help='Process rows from the queue until it is empty')
+    add_queue_arguments(command)
+    command.add_argument('--workers', type=int, default=1, help='People processed concurrently by this process (default: 1)')
+    command.add_argument('--worker-id', default=None, help='Name in the queue (default: <hostname>-<pid>)')
+    add_flow_arguments(command)
+
+    command = commands.add_parser('collect', help='Write the finished rows to an output file')
+    add_queue_arguments(command)
+    command.add_argument('--output', default='output.csv', help='Output file (default: output.csv)')
+    command.add_argument('--format', choices=['csv', 'jsonl', 'parquet'], default=None,
+                         help='Output format (default: from the output file extension, else csv)')
+
+    command = commands.add_parser('status', help='Show how many rows are queued, leased, done and failed')
+    add_queue_arguments(command)
+
+    command = commands.add_parser('local', help='Enqueue, run worker processes on this machine, then collect')
+    add_queue_arguments(command, default='')
+    command.add_argument('--input', default='input.csv', help='Input CSV file (default: input.csv)')
+    command.add_argument('--output', default='output.csv', help='Output file (default: output.csv)')
+    command.add_argument('--format', choices=['csv', 'jsonl', 'parquet'], default=None)
+    command.add_argument('--processes', type=int, default=2, help='Worker processes to start (default: 2)')
+    command.add_argument('--workers', type=int, default=1, help='People processed concurrently per process (default: 1)')
+    args, worker_args = parser.parse_known_args()
+    if args.command != 'local' and worker_args:
+        parser.error(f"unrecognized arguments: {' '.join(worker_args)}")
+
+    try:
+        work_queue = open_work_queue(args.queue or f"{args.output}.queue.sqlite",
+                                     lease_seconds=args.lease, max_attempts=args.max_attempts)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    if args.command in ('enqueue', 'local'):
+        if not os.path.exists(args.input):
+            print(f"Error: Input file '{args.input}' not found.")
+            return
+        try:
+            enqueue(work_queue, args.input)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+
+    if args.command == 'work':
+        worker = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        flow_options = flow_options_from_args(args)
+        counts = [0] * args.workers
+
+        def run(i):
+            counts[i] = work(work_queue, f"{worker}-{i}", flow_options)
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(args.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        print(f"\n{worker} processed {sum(counts)} rows; the queue is empty")
+
+    elif args.command == 'local':
+        # Extra flags (flow options) are passed on to the workers
+        queue_location = args.queue or f"{args.output}.queue.sqlite"
+        command = [sys.executable, os.path.abspath(__file__), 'work', '--queue', queue_location,
+                   '--lease', str(args.lease), '--max-attempts', str(args.max_attempts),
+                   '--workers', str(args.workers)] + worker_args
+        processes = [subprocess.Popen(command + ['--worker-id', f"local-{i}"]) for i in range(args.processes)]
+        print(f"Started {len(processes)} worker processes")
+        for process in processes:
+            process.wait()
+        collect(work_queue, args.output, args.format)
+
+    elif args.command == 'collect':
+        try:
+            collect(work_queue, args.output, args.format)
+        except ValueError as e:
+            print(f"Error: {e}")
+
+    elif args.command == 'status':
+        counts = work_queue.counts()
+        print(", ".join(f"{count} {status}" for status, count in counts.items()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+from flow import create_cold_outreach_flow
+from main_batch import PERSONALIZATION_FACTORS, STYLE
+from utils.admission import AdmissionLimiter, Overloaded
+from utils.metrics import metrics, run_in_context
+from utils.singleflight import AsyncSingleFlight
+
+# Flows running at once, requests allowed to wait for one (more are answered with 429),
+# and people per bulk request
+SERVER_MAX_CONCURRENT = int(os.getenv("SERVER_MAX_CONCURRENT", "8"))
+SERVER_MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "32"))
+SERVER_MAX_BULK = int(os.getenv("SERVER_MAX_BULK", "100"))
+
+# Spans reported in each response's timing, besides the node steps
+TIMED_SPANS = ("search_web", "get_html_content", "call_llm", "llm_rate_limit_wait", "llm_concurrency_wait")
+
+limiter = AdmissionLimiter(max_concurrent=SERVER_MAX_CONCURRENT, max_queue=SERVER_MAX_QUEUE)
+flights = AsyncSingleFlight()
+# The flow's nodes block (HTTP and LLM clients, thread pools), so each flow runs on its own thread
+executor = ThreadPoolExecutor(max_workers=SERVER_MAX_CONCURRENT, thread_name_prefix="flow")
+
+def parse_person(data, defaults=None):
+    """
+    Validates one request body (or bulk entry); factors and style default to `defaults`,
+    then to main_batch.py's. Raises ValueError with a message for the client.
+    """
+    defaults = defaults or {}
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    for field in ("first_name", "last_name"):
+        if not isinstance(data.get(field), str) or not data[field].strip():
+            raise ValueError(f"'{field}' is required")
+    factors = data.get("personalization_factors", defaults.get("personalization_factors", PERSONALIZATION_FACTORS))
+    if not isinstance(factors, list) or not factors or not all(
+            isinstance(factor, dict) and all(isinstance(factor.get(k), str) for k in ("name", "description", "action"))
+            for factor in factors):
+        raise ValueError("'personalization_factors' must be a list of {name, description, action} objects")
+    style = data.get("style", defaults.get("style", STYLE))
+    if not isinstance(style, str):
+        raise ValueError("'style' must be a string")
+    return {
+        "first_name": data["first_name"].strip(),
+        "last_name": data["last_name"].strip(),
+        "keywords": str(data.get("keywords", "")).strip(),
+        "personalization_factors": factors,
+        "style": style
+    }
+
+def opener_key(person):
+    # Identical inputs give identical openers, so identical in-flight requests share one run
+    return json.dumps(person, sort_keys=True)
+
+def run_flow(shared, run_id):
+    with metrics.run(run_id):
+        create_cold_outreach_flow().run(shared)
+
+async def execute(person, admitted_at):
+    started = time.perf_counter()
+    shared = {"input": person}
+    run_id = f"api {uuid.uuid4().hex[:12]}"
+    try:
+        await asyncio.get_running_loop().run_in_executor(executor, run_in_context(run_flow), shared, run_id)
+    finally:
+        summary = metrics.finish_run(run_id)
+    return {
+        "opening_message": shared.get("output", {}).get("opening_message", ""),
+        "personalization": shared.get("personalization", {}),
+        "search_results": [result["link"] for result in shared.get("search_results", []) if "link" in result],
+        "timing": {
+            "queue_seconds": round(started - admitted_at, 3),
+            "run_seconds": round(time.perf_counter() - started, 3),
+            "steps": {name: round(stats["seconds"], 3) for name, stats in summary.items()
+                      if name.endswith(".exec") or name in TIMED_SPANS},
+            "llm_calls": int(summary.get("call_llm", {}).get("count", 0))
+        }
+    }
+
+def start(person, key, admitted_at):
+    # Joins the run in flight for this key, or starts one (already admitted by the caller)
+    return flights.do(key, lambda: limiter.run(lambda: execute(person, admitted_at)))
+
+async def respond(key, coalesced, pending, received):
+    result = await pending
+    timing = {**result["timing"], "total_seconds": round(time.perf_counter() - received, 3), "coalesced": coalesced}
+    return {**result, "timing": timing}
+
+def server_timing(timing):
+    # Server-Timing header, shown per request in browser devtools and many HTTP clients
+    return ", ".join(f"{name};dur={timing[f'{name}_seconds'] * 1000:.0f}" for name in ("queue", "run", "total"))
+
+def overloaded_response(e):
+    return JSONResponse({"error": f"Server is at capacity ({e}); retry later"}, status_code=429,
+                        headers={"Retry-After": "1"})
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        raise ValueError("Body must be JSON")
+
+async def create_opener(request):
+    """
+    POST /openers with {first_name, last_name, keywords, personalization_factors?, style?}
+    """
+    received = time.perf_counter()
+    try:
+        person = parse_person(await read_json(request))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    key = opener_key(person)
+    coalesced = key in flights
+    if not coalesced:
+        try:
+            limiter.admit()
+        except Overloaded as e:
+            return overloaded_response(e)
+    try:
+        result = await respond(key, coalesced, start(person, key, received), received)
+    except Exception as e:
+        return JSONResponse({"error": f"Failed to generate opening message: {e}"}, status_code=500)
+    return JSONResponse(result, headers={"Server-Timing": server_timing(result["timing"])})
+
+async def create_openers_bulk(request):
+    """
+    POST /openers/bulk with {people: [...], personalization_factors?, style?}: the shared
+    factors and style apply to people without their own. The batch is admitted as a whole
+    or rejected with 429; results come back in input order.
+    """
+    received = time.perf_counter()
+    try:
+        body = await read_json(request)
+        if not isinstance(body, dict) or not isinstance(body.get("people"), list) or not body["people"]:
+            raise ValueError("'people' must be a non-empty list")
+        if len(body["people"]) > SERVER_MAX_BULK:
+            return JSONResponse({"error": f"At most {SERVER_MAX_BULK} people per request"}, status_code=413)
+        people = [parse_person(data, defaults=body) for data in body["people"]]
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    keys = [opener_key(person) for person in people]
+    new_keys = {key for key in keys if key not in flights}
+    try:
+        limiter.admit(len(new_keys))
+    except Overloaded as e:
+        return overloaded_response(e)
+    pending = [(key, key not in new_keys or keys.index(key) != i, start(person, key, received))
+               for i, (person, key) in enumerate(zip(people, keys))]
+    results = await asyncio.gather(*(respond(key, coalesced, future, received) for key, coalesced, future in pending),
+                                   return_exceptions=True)
+    return JSONResponse({
+        "results": [
+            {"error": f"Failed to generate opening message: {result}"} if isinstance(result, Exception) else result
+            for result in results
+        ],
+        "timing": {"total_seconds": round(time.perf_counter() - received, 3)}
+    })
+
+async def health(request):
+    return JSONResponse({"status": "ok", **limiter.stats(), "coalesced": flights.coalesced})
+
+async def prometheus(request):
+    stats = limiter.stats()
+    lines = [f"outreach_server_{name} {value}" for name, value in stats.items()]
+    lines.append(f"outreach_server_coalesced {flights.coalesced}")
+    return PlainTextResponse(metrics.prometheus_text() + "\n".join(lines) + "\n")
+
+app = Starlette(routes=[
+    Route("/openers", create_opener, methods=["POST"]),
+    Route("/openers/bulk", create_openers_bulk, methods=["POST"]),
+    Route("/health", health),
+    Route("/metrics", prometheus)
+])
+
+def main():
+    """
+    HTTP API for the Cold Outreach Opener Generator, e.g. for calls from a CRM.
+    """
+    parser = argparse.ArgumentParser(description='Serve the Cold Outreach Opener Generator over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on (default: 8000)')
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
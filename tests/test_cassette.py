@@ -0,0 +1,86 @@
+"""
+A recorded cassette replays a run without calling search, fetch or the LLM, and
+produces the same output; replayed errors and unrecorded calls surface as errors.
+"""
+import csv
+import sys
+import types
+import pytest
+import flow
+import main_batch
+from utils.cassette import Cassette, CassetteMissError
+from utils.fake_llm import FakeLLM
+
+def search_web(query, num_results=10, **kwargs):
+    first_name, last_name = query.split()[:2]
+    return [{"link": f"https://example.com/{first_name}-{last_name}/{i}", "title": f"{first_name} {last_name} {i}",
+             "snippet": f"{first_name} {last_name} gave a keynote."} for i in range(3)]
+
+def get_html_content(url, **kwargs):
+    name = url.split("/")[3].replace("-", " ")
+    html = (f"<html><head><title>{name}</title></head><body><nav>Home</nav>"
+            f"<p>{name} gave a keynote on engines &amp; looms at {url}.</p></body></html>")
+    return {"html": html, "text": f"{name} gave a keynote", "title": name, "final_url": url}
+
+def offline(*args, **kwargs):
+    raise AssertionError("replay made a live call")
+
+def run_batch(monkeypatch, tmp_path, output, *flags):
+    monkeypatch.setattr(sys, "argv", ["main_batch.py", "--input", str(tmp_path / "people.csv"),
+                                      "--output", str(tmp_path / output), *flags])
+    main_batch.main()
+    with open(tmp_path / output, newline="") as f:
+        return list(csv.DictReader(f))
+
+def test_batch_replay_matches_recording(monkeypatch, tmp_path):
+    with open(tmp_path / "people.csv", "w", newline="") as f:
+        csv.writer(f).writerows([["first_name", "last_name", "keywords"], ["Ada", "Lovelace", "math"],
+                                 ["Grace", "Hopper", "navy"]])
+    cassette = str(tmp_path / "run.cassette.jsonl.gz")
+    monkeypatch.setattr(flow, "search_web", search_web)
+    monkeypatch.setattr(flow, "get_html_content", get_html_content)
+    monkeypatch.setattr(flow, "call_llm", FakeLLM(latency=0, actionable_rate=0.5, seed=3))
+    recorded = run_batch(monkeypatch, tmp_path, "recorded.csv", "--record", cassette)
+
+    for name in ("search_web", "get_html_content", "call_llm"):
+        monkeypatch.setattr(flow, name, offline)
+    replayed = run_batch(monkeypatch, tmp_path, "replayed.csv", "--replay", cassette)
+    assert replayed == recorded
+    assert not any(row["opening_message"].startswith("ERROR:") for row in replayed)
+    assert flow.call_llm is offline  # The cassette puts the originals back
+
+def test_round_trip_errors_and_misses(tmp_path):
+    path = str(tmp_path / "calls.cassette.jsonl.gz")
+    attempts = []
+    def flaky_llm(prompt, max_tokens=1024, model=None, **kwargs):
+        attempts.append(prompt)
+        if prompt == "always fails":
+            raise TimeoutError("upstream timed out")
+        return f"answer to {prompt}"
+    module = types.SimpleNamespace(search_web=search_web, get_html_content=get_html_content, call_llm=flaky_llm)
+
+    with Cassette(path, "record").patch(module) as cassette:
+        hits = module.search_web("Ada  Lovelace math")
+        page = module.get_html_content(hits[0]["link"])
+        assert module.call_llm("hello", max_tokens=10) == "answer to hello"
+        with pytest.raises(TimeoutError):
+            module.call_llm("always fails")
+    assert cassette.stats() == {"search": 1, "page": 1, "llm": 2, "misses": 0}
+    # Recorded pages are re-extracted from their HTML (title included, nav dropped), not kept as fetched
+    assert page["text"] == "Ada Lovelace Ada Lovelace gave a keynote on engines & looms at https://example.com/Ada-Lovelace/0."
+
+    module.search_web = module.get_html_content = module.call_llm = offline
+    with Cassette(path).patch(module) as cassette:
+        assert module.search_web("ada lovelace  MATH") == hits  # Queries match after normalization
+        assert module.get_html_content(hits[0]["link"]) == page  # Re-extracted from the recorded HTML
+        assert module.call_llm("hello", max_tokens=10) == "answer to hello"
+        with pytest.raises(RuntimeError, match="upstream timed out"):
+            module.call_llm("always fails")
+        with pytest.raises(CassetteMissError):
+            module.call_llm("hello", max_tokens=20)  # Same prompt, different parameters
+        assert cassette.stats()["misses"] == 1
+    assert len(attempts) == 2
+
+def test_unknown_mode(tmp_path):
+    with pytest.raises(ValueError):
+        Cassette(str(tmp_path / "x.gz"), mode="rewind")
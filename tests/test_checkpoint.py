@@ -0,0 +1,106 @@
+"""
+An interrupted or partly failed batch resumes from its journal: finished rows are
+reused, failed rows re-run, and with --save-stages finished stages are skipped.
+"""
+import csv
+import sys
+import pytest
+import flow
+import main_batch
+from utils.checkpoint import BatchCheckpoint
+from utils.fake_llm import FakeLLM
+
+PEOPLE = [("Ada", "Lovelace", "math"), ("Grace", "Hopper", "navy"), ("Alan", "Turing", "codes")]
+
+class StandIns:
+    """
+    Local search, fetch and LLM stand-ins that count calls; searches for `failing` raise.
+    """
+    def __init__(self):
+        self.failing = None
+        self.searches = []
+        self.llm = FakeLLM(latency=0, actionable_rate=1.0, seed=1)
+
+    def search_web(self, query, num_results=10, **kwargs):
+        if self.failing and self.failing in query:
+            raise RuntimeError("search is down")
+        self.searches.append(query)
+        return [{"link": f"https://example.com/{query.replace(' ', '-')}/{i}", "title": query, "snippet": query}
+                for i in range(3)]
+
+    def get_html_content(self, url, **kwargs):
+        name = " ".join(url.split("/")[3].split("-")[:2])
+        return {"html": "", "text": f"{name} gave a talk at {url}. " * 20, "title": name}
+
+@pytest.fixture
+def stand_ins(monkeypatch, tmp_path):
+    stand_ins = StandIns()
+    monkeypatch.setattr(flow, "search_web", stand_ins.search_web)
+    monkeypatch.setattr(flow, "get_html_content", stand_ins.get_html_content)
+    monkeypatch.setattr(flow, "call_llm", stand_ins.llm)
+    monkeypatch.setattr(flow, "backoff_delay", lambda retry, base=1.0, cap=60.0: 0)  # Retry failures right away
+    with open(tmp_path / "people.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["first_name", "last_name", "keywords"])
+        writer.writerows(PEOPLE)
+    return stand_ins
+
+def run_batch(monkeypatch, tmp_path, *flags):
+    monkeypatch.setattr(sys, "argv", ["main_batch.py", "--input", str(tmp_path / "people.csv"),
+                                      "--output", str(tmp_path / "out.csv"), *flags])
+    main_batch.main()
+    with open(tmp_path / "out.csv", newline="") as f:
+        return list(csv.DictReader(f))
+
+def test_resume_reruns_only_failed_rows(monkeypatch, tmp_path, stand_ins):
+    stand_ins.failing = "Grace"
+    rows = run_batch(monkeypatch, tmp_path)
+    assert [row["first_name"] for row in rows] == ["Ada", "Grace", "Alan"]
+    assert rows[1]["opening_message"].startswith("ERROR:") and rows[0]["search_results"]
+
+    stand_ins.failing = None
+    stand_ins.searches.clear()
+    calls = stand_ins.llm.calls
+    resumed = run_batch(monkeypatch, tmp_path, "--resume")
+    assert [query.split()[0] for query in stand_ins.searches] == ["Grace"]
+    assert resumed[0] == rows[0] and resumed[2] == rows[2]
+    assert resumed[1]["search_results"] and not resumed[1]["opening_message"].startswith("ERROR:")
+    assert stand_ins.llm.calls > calls
+
+def test_without_resume_every_row_runs_again(monkeypatch, tmp_path, stand_ins):
+    run_batch(monkeypatch, tmp_path)
+    stand_ins.searches.clear()
+    run_batch(monkeypatch, tmp_path)
+    assert len(stand_ins.searches) == len(PEOPLE)
+
+def test_saved_stages_skip_finished_work(tmp_path):
+    path = str(tmp_path / "journal.sqlite")
+    person = {"first_name": "Ada", "last_name": "Lovelace", "keywords": "math"}
+    key = BatchCheckpoint.row_key(person, [], "casual")
+    first_run = BatchCheckpoint(path, save_stages=True)
+    first_run.save_stage(key, "search", {"search_results": [{"link": "https://example.com"}]})
+    first_run.record_row(key, {"opening_message": ""}, ok=False)
+
+    resumed = BatchCheckpoint(path, resume=True, save_stages=True)
+    assert resumed.finished_row(key) is None  # Failed rows run again...
+    assert resumed.load_stage(key, "search") == {"search_results": [{"link": "https://example.com"}]}  # ...from their last stage
+    assert resumed.load_stage(key, "draft") is None
+    assert BatchCheckpoint(path, resume=True).load_stage(key, "search") is None  # Only with save_stages
+
+    first_run.record_row(key, {"opening_message": "Hi Ada"}, ok=True)
+    assert resumed.finished_row(key) == {"opening_message": "Hi Ada"}
+    assert BatchCheckpoint(path).finished_row(key) is None  # Only with resume
+    # Different factors or style make a different row
+    assert BatchCheckpoint.row_key(person, [], "formal") != key
+
+def test_resume_with_saved_stages_skips_search(monkeypatch, tmp_path, stand_ins):
+    # Drafting fails for everyone in the first run; the search stage is journaled anyway
+    with monkeypatch.context() as patch:
+        patch.setattr(flow.DraftOpeningNode, "exec", lambda self, prep_data: 1 / 0)
+        failed = run_batch(patch, tmp_path, "--save-stages")
+    assert all(row["opening_message"].startswith("ERROR:") for row in failed)
+
+    stand_ins.searches.clear()
+    rows = run_batch(monkeypatch, tmp_path, "--save-stages", "--resume")
+    assert stand_ins.searches == []
+    assert not any(row["opening_message"].startswith("ERROR:") for row in rows)
@@ -0,0 +1,55 @@
+"""
+FakeLLM answers the flow's analysis prompts in the shape the flow parses, in both
+analysis modes, and its simulated failures exercise retries.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import flow
+from utils.fake_llm import FakeLLM
+
+FACTORS = [
+    {"name": "recent_talks", "description": "Gave a talk recently", "action": "Mention it"},
+    {"name": "recent_promotion", "description": "Was recently promoted", "action": "Congratulate"}
+]
+
+def analyze(monkeypatch, fake, mode, pages=6, **options):
+    monkeypatch.setattr(flow, "call_llm", fake)
+    monkeypatch.setattr(flow, "backoff_delay", lambda retry, base=1.0, cap=60.0: 0)
+    shared = {
+        "input": {"first_name": "Ada", "last_name": "Lovelace", "personalization_factors": FACTORS},
+        "web_contents": [
+            {"url": f"https://example.com/{i}", "content": {"title": f"Page {i}", "text": f"Ada Lovelace spoke {i}"}}
+            for i in range(pages)
+        ]
+    }
+    node = flow.AnalyzeResultsBatchNode(max_workers=4, analysis_mode=mode, use_cache=False, **options)
+    node.run(shared)
+    return shared["personalization"]
+
+@pytest.mark.parametrize("mode, calls", [("per_page", 6), ("batched", 2)])
+def test_answers_parse_in_both_modes(monkeypatch, mode, calls):
+    fake = FakeLLM(latency=0, actionable_rate=1.0, seed=1)
+    personalization = analyze(monkeypatch, fake, mode)
+    assert fake.calls == calls
+    assert set(personalization) == {"recent_talks", "recent_promotion"}
+    assert "found evidence for recent_talks" in personalization["recent_talks"]["details"]
+
+def test_nothing_actionable(monkeypatch):
+    assert analyze(monkeypatch, FakeLLM(latency=0, actionable_rate=0.0, seed=1), "per_page") == {}
+
+def test_failures_are_retried(monkeypatch):
+    fake = FakeLLM(latency=0, failure_rate=0.3, actionable_rate=1.0, seed=2)
+    personalization = analyze(monkeypatch, fake, "per_page", max_retries=5)
+    assert fake.failures > 0
+    assert fake.calls == 6 + fake.failures  # Every failure cost exactly one extra call
+    assert "recent_talks" in personalization
+
+def test_seed_makes_runs_reproducible():
+    prompt = "1. recent_talks: Gave a talk\n```yaml"
+    assert FakeLLM(seed=5, latency=0)(prompt) == FakeLLM(seed=5, latency=0)(prompt)
+
+def test_tracks_concurrency():
+    fake = FakeLLM(latency=0.05)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(fake, ["hello"] * 4))
+    assert fake.calls == 4 and fake.max_in_flight > 1 and fake.in_flight == 0
@@ -0,0 +1,49 @@
+"""
+Every installed extraction backend must match the html.parser fallback on the
+HTML fixtures, decode entities and leave out scripts, comments and page chrome.
+"""
+import glob
+import os
+import pytest
+from bench.bench_extract import similarity
+from bench.html_fixtures import BOILERPLATE_PHRASES, LEAD_TEXT, PAGES, write_fixtures
+from utils.html_extract import EXTRACTORS, extract, extract_html_parser
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "bench", "fixtures", "html")
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+FIXTURES = {os.path.basename(path): _read(path) for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html")))}
+
+def test_fixtures_match_generator(tmp_path):
+    write_fixtures(str(tmp_path))
+    assert sorted(FIXTURES) == sorted(PAGES)
+    for name, html in FIXTURES.items():
+        assert _read(tmp_path / name) == html, f"{name} is stale; run python -m bench.html_fixtures"
+
+@pytest.mark.parametrize("backend", list(EXTRACTORS))
+@pytest.mark.parametrize("name", list(FIXTURES))
+def test_backend_matches_fallback(backend, name):
+    html = FIXTURES[name]
+    title, text = extract(html, backend=backend)
+    base_title, base_text = extract_html_parser(html)
+    assert title == base_title
+    assert similarity(text, base_text) >= 0.98
+
+@pytest.mark.parametrize("backend", list(EXTRACTORS))
+@pytest.mark.parametrize("name", list(FIXTURES))
+def test_backend_drops_boilerplate_and_decodes_entities(backend, name):
+    title, text = extract(FIXTURES[name], backend=backend)
+    assert "&amp;" not in title and "&#" not in title
+    assert not [phrase for phrase in BOILERPLATE_PHRASES if phrase in text]
+    assert LEAD_TEXT in text and "born 1815 in Zürich" in text
+    assert "&amp;" not in text and "&nbsp;" not in text and "\xa0" not in text
+
+@pytest.mark.parametrize("backend", list(EXTRACTORS))
+def test_backend_handles_edge_documents(backend):
+    xhtml = '<?xml version="1.0" encoding="utf-8"?>\n<html xmlns="http://www.w3.org/1999/xhtml"><head><title>X</title></head><body><p>Hi</p></body></html>'
+    assert extract(xhtml, backend=backend) == ("X", "X Hi")  # The title is part of the page text
+    assert extract("<!-- only a comment -->", backend=backend) == ("", "")
+    assert extract("", backend=backend) == ("", "")
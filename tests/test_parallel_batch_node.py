@@ -0,0 +1,75 @@
+"""
+ParallelBatchNode keeps item order, enforces its deadline, retries failing items
+on their own and lets on_result stop a windowed batch early.
+"""
+import threading
+import time
+from flow import ParallelBatchNode
+
+class SleepNode(ParallelBatchNode):
+    """
+    Sleeps `item` seconds and returns it; negative items fail until their last retry.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.started = []
+        self.attempts = {}
+        self._lock = threading.Lock()
+
+    def exec(self, item):
+        with self._lock:
+            self.started.append(item)
+            self.attempts[item] = self.attempts.get(item, 0) + 1
+            attempt = self.attempts[item]
+        if item < 0 and attempt < self.max_retries:
+            raise RuntimeError("transient failure")
+        time.sleep(abs(item))
+        return item
+
+    def exec_fallback(self, item, exc):
+        return ("fallback", item, type(exc).__name__)
+
+def test_results_keep_item_order():
+    items = [0.08, 0.01, 0.05, 0.0, 0.03]
+    assert SleepNode(max_workers=5)._exec(items) == items
+
+def test_runs_items_in_parallel():
+    start = time.monotonic()
+    SleepNode(max_workers=4)._exec([0.1] * 4)
+    assert time.monotonic() - start < 0.3
+
+def test_deadline_falls_back_for_unfinished_items():
+    node = SleepNode(max_workers=3, deadline=0.1)
+    start = time.monotonic()
+    results = node._exec([0.0, 0.5, 0.01])
+    assert time.monotonic() - start < 0.3  # Doesn't wait for the straggler
+    assert results[0] == 0.0 and results[2] == 0.01
+    assert results[1] == ("fallback", 0.5, "TimeoutError")
+
+def test_failing_item_is_retried_then_succeeds():
+    node = SleepNode(max_workers=2, max_retries=3)
+    assert node._exec([-0.01, 0.01]) == [-0.01, 0.01]
+    assert node.attempts[-0.01] == 3
+
+def test_exhausted_retries_use_fallback():
+    class AlwaysFails(SleepNode):
+        def exec(self, item):
+            raise ValueError("bad item")
+    assert AlwaysFails(max_retries=2)._exec([1]) == [("fallback", 1, "ValueError")]
+
+def test_on_result_sees_every_result():
+    seen = []
+    node = SleepNode(max_workers=3)
+    node._exec([0.03, 0.0, 0.01], on_result=lambda item, result: seen.append(result))
+    assert sorted(seen) == [0.0, 0.01, 0.03]
+
+def test_on_result_stops_windowed_batch_early():
+    node = SleepNode(max_workers=4)
+    seen = []
+    def enough(item, result):
+        seen.append(result)
+        return len(seen) == 2
+    results = node._exec([0.01] * 10, on_result=enough, window=2)
+    assert results == [0.01, 0.01]
+    # With a window of 2, at most one more item than the two that finished was started
+    assert len(node.started) <= 3
@@ -0,0 +1,102 @@
+"""
+RateLimiter keeps requests and tokens within the window, for threads and asyncio
+alike, and page analysis through FakeLLM is paced by it.
+"""
+import asyncio
+import threading
+import time
+import flow
+from utils.fake_llm import FakeLLM
+from utils.rate_limiter import RateLimiter
+
+WINDOW = 0.3
+
+def _max_in_window(timestamps, window):
+    timestamps = sorted(timestamps)
+    return max(sum(1 for other in timestamps if start <= other < start + window) for start in timestamps)
+
+def test_requests_wait_for_the_window():
+    limiter = RateLimiter(requests_per_minute=3, window=WINDOW)
+    start = time.monotonic()
+    waits = [limiter.acquire() for _ in range(4)]
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert time.monotonic() - start >= WINDOW * 0.95
+    assert waits[3] > 0
+
+def test_token_budget():
+    limiter = RateLimiter(tokens_per_minute=100, window=WINDOW)
+    assert limiter.acquire(60) == 0.0
+    assert limiter.acquire(60) > 0  # 120 tokens don't fit one window
+    # A request larger than the whole budget still goes through on an empty window
+    time.sleep(WINDOW)
+    assert limiter.acquire(500) == 0.0
+
+def test_threads_share_one_budget():
+    limiter = RateLimiter(requests_per_minute=4, window=WINDOW)
+    sent, lock = [], threading.Lock()
+    def send():
+        for _ in range(3):
+            limiter.acquire()
+            with lock:
+                sent.append(time.monotonic())
+    threads = [threading.Thread(target=send) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(sent) == 12
+    assert _max_in_window(sent, WINDOW * 0.95) <= 4
+
+def test_async_and_thread_callers_share_one_budget():
+    limiter = RateLimiter(requests_per_minute=2, window=WINDOW)
+    limiter.acquire()
+    limiter.acquire()
+    async def main():
+        ticks = 0
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+        ticker = asyncio.create_task(tick())
+        waited = await limiter.aacquire()
+        ticker.cancel()
+        return waited, ticks
+    waited, ticks = asyncio.run(main())
+    assert waited > 0
+    assert ticks > 5  # The event loop kept running while the request waited
+
+def _analysis_shared(pages):
+    return {
+        "input": {
+            "first_name": "Ada", "last_name": "Lovelace",
+            "personalization_factors": [{"name": "recent_talks", "description": "Gave a talk", "action": "Mention it"}]
+        },
+        "web_contents": [
+            {"url": f"https://example.com/{i}", "content": {"title": f"Page {i}", "text": f"Ada Lovelace spoke {i}"}}
+            for i in range(pages)
+        ]
+    }
+
+def test_fake_llm_charges_the_rate_limiter(monkeypatch):
+    fake = FakeLLM(latency=0.01, actionable_rate=1.0, seed=1)
+    monkeypatch.setattr(flow, "call_llm", fake)
+    limiter = RateLimiter(requests_per_minute=3, window=WINDOW)
+    node = flow.AnalyzeResultsBatchNode(max_workers=6, analysis_mode="per_page", use_cache=False, rate_limiter=limiter)
+    shared = _analysis_shared(6)
+    start = time.monotonic()
+    node.run(shared)
+    # 6 calls at 3 per window: the second half waits for the next window
+    assert fake.calls == 6
+    assert time.monotonic() - start >= WINDOW * 0.95
+    assert "recent_talks" in shared["personalization"]
+
+def test_unlimited_analysis_runs_in_parallel(monkeypatch):
+    fake = FakeLLM(latency=0.1, seed=1)
+    monkeypatch.setattr(flow, "call_llm", fake)
+    node = flow.AnalyzeResultsBatchNode(max_workers=6, analysis_mode="per_page", use_cache=False,
+                                        rate_limiter=RateLimiter())
+    start = time.monotonic()
+    node.run(_analysis_shared(6))
+    assert time.monotonic() - start < 0.4
+    assert fake.max_in_flight > 1
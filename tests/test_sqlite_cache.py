@@ -0,0 +1,71 @@
+"""
+SQLiteCache expires entries after their TTL and evicts least recently used entries
+once the stored values exceed max_bytes.
+"""
+import threading
+import time
+import pytest
+from utils.sqlite_cache import SQLiteCache
+
+@pytest.fixture
+def cache(tmp_path):
+    return SQLiteCache(str(tmp_path / "cache.sqlite"), ttl=None, max_bytes=1000)
+
+def test_round_trip_and_stats(cache):
+    key = cache.make_key("model", 512, "prompt")
+    assert cache.get(key) is None
+    cache.set(key, {"answer": 42, "text": "héllo"})
+    assert cache.get(key) == {"answer": 42, "text": "héllo"}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+def test_make_key_is_content_addressed():
+    assert SQLiteCache.make_key("m", 1, "p") == SQLiteCache.make_key("m", 1, "p")
+    assert SQLiteCache.make_key("m", 1, "p") != SQLiteCache.make_key("m", 2, "p")
+
+def test_ttl_expiry(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite"), ttl=0.2)
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+    time.sleep(0.25)
+    assert cache.get("key") is None
+    assert cache.get_entry("key")[0] == "value"  # Still stored, for revalidation
+    assert cache.get("key", ttl=10) == "value"  # A per-call TTL overrides the default
+    cache.touch("key")
+    assert cache.get("key") == "value"
+
+def test_lru_eviction_keeps_recently_used(cache):
+    # Ten 102-byte values (with JSON quotes) against a 1,000 byte bound
+    for i in range(10):
+        cache.set(f"key{i}", "x" * 100)
+        time.sleep(0.002)  # Distinct access times
+    cache.get("key0")  # Recently used again
+    time.sleep(0.002)
+    cache.set("key10", "x" * 100)
+    assert cache.evict() == 2
+    assert cache.get("key0") == "x" * 100
+    assert cache.get("key1") is None and cache.get("key2") is None
+    assert cache.get("key10") == "x" * 100
+    assert cache.stats()["bytes"] <= 1000
+
+def test_writes_trigger_eviction(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite"), max_bytes=500)
+    for i in range(SQLiteCache.EVICT_EVERY):
+        cache.set(f"key{i}", "x" * 100)
+    assert cache.stats()["bytes"] <= 500
+
+def test_delete(cache):
+    cache.set("key", [1, 2])
+    cache.delete("key")
+    assert cache.get("key") is None
+
+def test_threads_share_one_file(cache):
+    def write(n):
+        for i in range(20):
+            cache.set(f"{n}-{i}", i)
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(cache.get(f"{n}-19") == 19 for n in range(4))
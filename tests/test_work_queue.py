@@ -0,0 +1,97 @@
+"""
+SQLiteWorkQueue hands each task to one worker at a time, re-leases tasks whose
+worker stopped heartbeating, and gives up after max_attempts claims.
+"""
+import threading
+import time
+import pytest
+from utils.work_queue import SQLiteWorkQueue, open_work_queue
+
+LEASE = 0.2
+
+@pytest.fixture
+def work_queue(tmp_path):
+    return SQLiteWorkQueue(str(tmp_path / "queue.sqlite"), lease_seconds=LEASE, max_attempts=2)
+
+def test_enqueue_skips_known_keys(work_queue):
+    assert work_queue.enqueue([("a", {"n": 1}), ("b", {"n": 2}), ("a", {"n": 1})]) == 2
+    assert work_queue.enqueue([("b", {"n": 2})]) == 0
+    assert work_queue.counts() == {"queued": 2, "leased": 0, "done": 0, "failed": 0}
+
+def test_claims_in_enqueue_order_and_completes(work_queue):
+    work_queue.enqueue([("a", {"n": 1}), ("b", {"n": 2})])
+    first = work_queue.claim("w1")
+    second = work_queue.claim("w2")
+    assert [first[1], second[1]] == [{"n": 1}, {"n": 2}]
+    assert first[2] == 1  # First attempt
+    assert work_queue.claim("w3") is None  # Both leased
+    assert work_queue.complete(first[0], "w1", {"out": 10})
+    assert not work_queue.complete(second[0], "w1", {"out": 20})  # Not w1's lease
+    assert work_queue.complete(second[0], "w2", {"out": 20})
+    assert [(payload, status, result) for payload, status, result, _ in work_queue.results()] == [
+        ({"n": 1}, "done", {"out": 10}), ({"n": 2}, "done", {"out": 20})]
+
+def test_expired_lease_is_claimed_again(work_queue):
+    work_queue.enqueue([("a", {"n": 1})])
+    task_id, _, _ = work_queue.claim("dead-worker")
+    time.sleep(LEASE * 1.5)
+    reclaimed = work_queue.claim("w2")
+    assert reclaimed[0] == task_id and reclaimed[2] == 2
+    # The original worker lost the task: its heartbeat and result are refused
+    assert not work_queue.heartbeat(task_id, "dead-worker")
+    assert not work_queue.complete(task_id, "dead-worker", {"stale": True})
+    assert work_queue.complete(task_id, "w2", {"ok": True})
+
+def test_heartbeat_keeps_the_lease(work_queue):
+    work_queue.enqueue([("a", {"n": 1})])
+    task_id, _, _ = work_queue.claim("w1")
+    for _ in range(3):
+        time.sleep(LEASE / 2)
+        assert work_queue.heartbeat(task_id, "w1")
+    assert work_queue.claim("w2") is None  # Held past several lease lengths
+    assert work_queue.complete(task_id, "w1", {})
+
+def test_lease_expiry_uses_up_attempts(work_queue):
+    work_queue.enqueue([("a", {"n": 1})])
+    work_queue.claim("w1")
+    time.sleep(LEASE * 1.5)
+    work_queue.claim("w2")
+    time.sleep(LEASE * 1.5)
+    assert work_queue.claim("w3") is None  # Two claims were the last attempts
+    assert work_queue.counts()["failed"] == 1
+    [(_, status, _, error)] = work_queue.results()
+    assert status == "failed" and "Lease expired" in error
+
+def test_fail_requeues_until_max_attempts(work_queue):
+    work_queue.enqueue([("a", {"n": 1})])
+    task_id, _, _ = work_queue.claim("w1")
+    assert work_queue.fail(task_id, "w1", "timeout")
+    assert work_queue.counts()["queued"] == 1
+    task_id, _, attempt = work_queue.claim("w1")
+    assert attempt == 2
+    assert work_queue.fail(task_id, "w1", "timeout again", result={"opening_message": "ERROR: timeout again"})
+    assert work_queue.claim("w1") is None
+    assert list(work_queue.results()) == [({"n": 1}, "failed", {"opening_message": "ERROR: timeout again"}, "timeout again")]
+
+def test_concurrent_workers_claim_each_task_once(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+    SQLiteWorkQueue(path).enqueue([(str(i), {"n": i}) for i in range(40)])
+    claimed, lock = [], threading.Lock()
+    def work(worker):
+        work_queue = SQLiteWorkQueue(path)  # Each worker has its own connection, as separate processes would
+        while (task := work_queue.claim(worker)) is not None:
+            with lock:
+                claimed.append(task[1]["n"])
+            work_queue.complete(task[0], worker, {"n": task[1]["n"]})
+    threads = [threading.Thread(target=work, args=(f"w{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == list(range(40))
+    assert SQLiteWorkQueue(path).counts()["done"] == 40
+
+def test_open_work_queue_picks_sqlite_for_paths(tmp_path):
+    work_queue = open_work_queue(str(tmp_path / "q.sqlite"), lease_seconds=5, max_attempts=4)
+    assert isinstance(work_queue, SQLiteWorkQueue)
+    assert (work_queue.lease_seconds, work_queue.max_attempts) == (5, 4)
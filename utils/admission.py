@@ -0,0 +1,75 @@
+"""
+Admission Control Utility for Cold Outreach Opener Generator
+"""
+import asyncio
+
+class Overloaded(Exception):
+    """
+    Raised by admit() when the queue is full; servers answer it with 429 Too Many Requests.
+    """
+
+class AdmissionLimiter:
+    """
+    Global concurrency limit with a bounded waiting queue, for one asyncio event loop.
+
+    At most `max_concurrent` admitted jobs run at once and at most `max_queue` more wait
+    for a slot; anything beyond that is rejected right away instead of queueing up
+    latency for everyone (load shedding).
+
+    Usage:
+        limiter.admit()                  # Raises Overloaded, or reserves a place
+        result = await limiter.run(fn)   # Waits for a slot, then awaits fn()
+    """
+    def __init__(self, max_concurrent=8, max_queue=32):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.admitted = 0  # Running or waiting
+        self.running = 0
+        self.rejected = 0
+        self._slots = asyncio.Semaphore(max_concurrent)
+
+    @property
+    def waiting(self):
+        return self.admitted - self.running
+
+    def admit(self, count=1):
+        """
+        Reserves places for `count` jobs (all or none), or raises Overloaded.
+        Each admitted job must then go through run() exactly once.
+        """
+        if self.admitted + count > self.max_concurrent + self.max_queue:
+            self.rejected += count
+            raise Overloaded(f"{self.waiting} requests already waiting")
+        self.admitted += count
+
+    async def run(self, fn):
+        try:
+            async with self._slots:
+                self.running += 1
+                try:
+                    return await fn()
+                finally:
+                    self.running -= 1
+        finally:
+            self.admitted -= 1
+
+    def stats(self):
+        return {"running": self.running, "waiting": self.waiting, "rejected": self.rejected,
+                "max_concurrent": self.max_concurrent, "max_queue": self.max_queue}
+
+if __name__ == "__main__":
+    # Test: 2 slots and 3 queue places; of 8 simultaneous requests, 3 are shed
+    async def main():
+        limiter = AdmissionLimiter(max_concurrent=2, max_queue=3)
+
+        async def request():
+            try:
+                limiter.admit()
+            except Overloaded:
+                return "429"
+            return await limiter.run(lambda: asyncio.sleep(0.1, result="200"))
+
+        results = await asyncio.gather(*(request() for _ in range(8)))
+        print(f"{results.count('200')} served, {results.count('429')} shed; {limiter.stats()}")
+
+    asyncio.run(main())
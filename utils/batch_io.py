@@ -0,0 +1,187 @@
+"""
+Batch Input/Output Utility for Cold Outreach Opener Generator
+"""
+import csv
+import json
+from contextlib import contextmanager
+
+REQUIRED_COLUMNS = ("first_name", "last_name", "keywords")
+
+def read_people(path):
+    """
+    Returns an iterator over the input rows, read lazily so the input file is never
+    held in memory. Raises ValueError right away if a required column is missing.
+    """
+    with open(path, "r", newline="", encoding="utf-8") as csvfile:
+        header = csv.DictReader(csvfile).fieldnames or []
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ValueError(f"'{path}' is missing the columns: {', '.join(missing)}")
+    return _read_rows(path)
+
+def _read_rows(path):
+    with open(path, "r", newline="", encoding="utf-8") as csvfile:
+        for row in csv.DictReader(csvfile):
+            yield row
+
+def count_rows(path):
+    # One cheap pass over the file, for progress messages
+    with open(path, "r", newline="", encoding="utf-8") as csvfile:
+        return sum(1 for _ in csv.DictReader(csvfile))
+
+def make_record(person, factor_names, opening_message="", search_results=(), personalization=None, error=None):
+    """
+    One output record. Every factor is present, so all records share one schema.
+    """
+    personalization = personalization or {}
+    return {
+        "first_name": person["first_name"],
+        "last_name": person["last_name"],
+        "keywords": person["keywords"],
+        "opening_message": opening_message,
+        "search_results": list(search_results),
+        "personalization": {
+            name: {
+                "actionable": bool(personalization.get(name, {}).get("actionable", False)),
+                "details": personalization.get(name, {}).get("details", "")
+            }
+            for name in factor_names
+        },
+        "error": error
+    }
+
+class CSVRecordWriter:
+    """
+    Flat CSV: URLs comma-separated, <factor>_actionable / <factor>_details columns,
+    and failures as "ERROR: ..." in opening_message.
+    """
+    def __init__(self, file, factor_names):
+        self.file = file
+        self.fieldnames = ["first_name", "last_name", "keywords", "opening_message", "search_results"]
+        for name in factor_names:
+            self.fieldnames += [f"{name}_actionable", f"{name}_details"]
+        self.writer = csv.DictWriter(file, fieldnames=self.fieldnames)
+        self.writer.writeheader()
+
+    def write(self, record):
+        row = {
+            "first_name": record["first_name"],
+            "last_name": record["last_name"],
+            "keywords": record["keywords"],
+            "opening_message": f"ERROR: {record['error']}" if record["error"] else record["opening_message"],
+            "search_results": ",".join(record["search_results"])
+        }
+        for name, factor in record["personalization"].items():
+            row[f"{name}_actionable"] = str(factor["actionable"])
+            row[f"{name}_details"] = factor["details"]
+        self.writer.writerow(row)
+        self.file.flush()
+
+    def close(self):
+        pass
+
+class JSONLRecordWriter:
+    """
+    One JSON object per line, with the nested personalization dict.
+    """
+    def __init__(self, file, factor_names):
+        self.file = file
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self):
+        pass
+
+class ParquetRecordWriter:
+    """
+    Parquet file with a schema fixed from the factor list, written in row groups of
+    `row_group_size` records. Needs the optional pyarrow package.
+    """
+    def __init__(self, path, factor_names, row_group_size=1000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:  # Optional dependency not installed
+            raise ValueError("Parquet output needs pyarrow: pip install pyarrow")
+        self.pa = pa
+        factor_type = pa.struct([("actionable", pa.bool_()), ("details", pa.string())])
+        self.schema = pa.schema([
+            ("first_name", pa.string()),
+            ("last_name", pa.string()),
+            ("keywords", pa.string()),
+            ("opening_message", pa.string()),
+            ("search_results", pa.list_(pa.string())),
+            ("personalization", pa.struct([(name, factor_type) for name in factor_names])),
+            ("error", pa.string())
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.row_group_size = row_group_size
+        self.buffer = []
+
+    def write(self, record):
+        self.buffer.append(record)
+        if len(self.buffer) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.writer.write_table(self.pa.Table.from_pylist(self.buffer, schema=self.schema))
+            self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+FORMATS = ("csv", "jsonl", "parquet")
+
+def output_format(path, fmt=None):
+    # Explicit format, else from the file extension, else CSV
+    if fmt:
+        return fmt
+    for candidate in FORMATS:
+        if path.lower().endswith(f".{candidate}"):
+            return candidate
+    return "csv"
+
+@contextmanager
+def open_record_writer(path, factor_names, fmt=None):
+    """
+    Yields a writer with write(record) for `path`, closing it afterwards.
+
+    Args:
+        path (str): Output file
+        factor_names (list): Personalization factors, which fix the schema up front
+        fmt (str, optional): "csv", "jsonl" or "parquet" (default: from the file extension)
+    """
+    fmt = output_format(path, fmt)
+    if fmt == "parquet":
+        writer = ParquetRecordWriter(path, factor_names)
+        try:
+            yield writer
+        finally:
+            writer.close()
+        return
+
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        yield (CSVRecordWriter if fmt == "csv" else JSONLRecordWriter)(file, factor_names)
+
+if __name__ == "__main__":
+    # Test: the same record in every available format
+    import os
+    import tempfile
+    person = {"first_name": "Ada", "last_name": "Lovelace", "keywords": "math"}
+    record = make_record(person, ["recent_talks", "recent_promotion"], opening_message="Hi Ada",
+                         search_results=["https://example.com"],
+                         personalization={"recent_talks": {"actionable": True, "details": "Keynote"}})
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in FORMATS:
+            path = os.path.join(tmp, f"out.{fmt}")
+            try:
+                with open_record_writer(path, ["recent_talks", "recent_promotion"]) as writer:
+                    writer.write(record)
+                print(f"{fmt}: {os.path.getsize(path)} bytes")
+            except ValueError as e:
+                print(f"{fmt}: {e}")
+        print(open(os.path.join(tmp, "out.jsonl"), encoding="utf-8").read().strip())
@@ -1,19 +1,135 @@
-from anthropic import AnthropicVertex
+from anthropic import AnthropicVertex, AsyncAnthropicVertex
+from utils.sqlite_cache import SQLiteCache
+from utils.metrics import metrics
+from utils.rate_limiter import llm_concurrency, llm_rate_limiter, estimate_tokens
+import asyncio
 import os
+import threading
+import weakref
 
-def call_llm(prompt: str) -> str:
-    client = AnthropicVertex(
-        region=os.getenv("ANTHROPIC_REGION", "us-east5"),
-        project_id=os.getenv("ANTHROPIC_PROJECT_ID", "your-project-id")
-    )
-    response = client.messages.create(
-        max_tokens=1024,
-        messages=[{"role": "user", "content": prompt}],
-        model="claude-3-7-sonnet@20250219"
-    )
-    return response.content[0].text
+DEFAULT_MODEL = os.getenv("ANTHROPIC_MODEL", "claude-3-7-sonnet@20250219")
+
+# Response cache settings; LLM_CACHE=0 turns the cache off for every caller
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm.sqlite")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL_DAYS", "30")) * 86400
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_MB", "500")) * 1024 * 1024
+
+# One client per process: the SDK keeps a pool of keep-alive connections inside each client,
+# so reusing it skips client construction, auth setup and the TLS handshake on every call
+_client = None
+_client_lock = threading.Lock()
+# Async clients are bound to the event loop they were first used on
+_async_clients = weakref.WeakKeyDictionary()
+_llm_cache = None
+
+def _client_options():
+    options = {
+        "region": os.getenv("ANTHROPIC_REGION", "us-east5"),
+        "project_id": os.getenv("ANTHROPIC_PROJECT_ID", "your-project-id")
+    }
+    # Optional static token, e.g. for a local stub server; otherwise Google default credentials are used
+    if os.getenv("ANTHROPIC_ACCESS_TOKEN"):
+        options["access_token"] = os.getenv("ANTHROPIC_ACCESS_TOKEN")
+    return options
+
+def get_client() -> AnthropicVertex:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = AnthropicVertex(**_client_options())
+    return _client
+
+def get_async_client() -> AsyncAnthropicVertex:
+    loop = asyncio.get_running_loop()
+    if loop not in _async_clients:
+        _async_clients[loop] = AsyncAnthropicVertex(**_client_options())
+    return _async_clients[loop]
+
+def get_llm_cache() -> SQLiteCache:
+    global _llm_cache
+    if _llm_cache is None:
+        with _client_lock:
+            if _llm_cache is None:
+                _llm_cache = SQLiteCache(LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_bytes=LLM_CACHE_MAX_BYTES)
+    return _llm_cache
+
+def _cache_key(prompt, max_tokens, model):
+    # Content-addressed: identical model, parameters and prompt give the same key
+    return SQLiteCache.make_key(model or DEFAULT_MODEL, max_tokens, prompt)
+
+def forget_cached_llm_response(prompt: str, max_tokens: int = 1024, model: str = None):
+    """
+    Drops a cached response, e.g. one the caller could not parse, so a retry calls the LLM again.
+    """
+    if LLM_CACHE_ENABLED:
+        get_llm_cache().delete(_cache_key(prompt, max_tokens, model))
+
+def call_llm(prompt: str, max_tokens: int = 1024, model: str = None, use_cache: bool = False,
+             rate_limiter=None) -> str:
+    """
+    Calls the LLM, or returns the cached response. `rate_limiter` (a RateLimiter) is
+    charged for the prompt and max_tokens only when the API is actually called.
+    """
+    with metrics.span("call_llm", model=model or DEFAULT_MODEL):
+        use_cache = use_cache and LLM_CACHE_ENABLED
+        if use_cache:
+            key = _cache_key(prompt, max_tokens, model)
+            cached = get_llm_cache().get(key)
+            if cached is not None:
+                metrics.annotate(cache_hits=1)
+                return cached
+        if rate_limiter is not None:
+            metrics.record("llm_rate_limit_wait", rate_limiter.acquire(estimate_tokens(prompt) + max_tokens))
+        with llm_concurrency.slot():
+            response = get_client().messages.create(
+                max_tokens=max_tokens,
+                messages=[{"role": "user", "content": prompt}],
+                model=model or DEFAULT_MODEL
+            )
+        _record_usage(response)
+        text = response.content[0].text
+        if use_cache:
+            get_llm_cache().set(key, text)
+        return text
+
+def _record_usage(response):
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        metrics.annotate(input_tokens=usage.input_tokens, output_tokens=usage.output_tokens)
+
+async def acall_llm(prompt: str, max_tokens: int = 1024, model: str = None, use_cache: bool = False,
+                    rate_limiter=None) -> str:
+    """
+    Async variant of call_llm; waits for `rate_limiter` and the LLM concurrency limit
+    without blocking the event loop.
+    """
+    with metrics.span("call_llm", model=model or DEFAULT_MODEL):
+        use_cache = use_cache and LLM_CACHE_ENABLED
+        if use_cache:
+            key = _cache_key(prompt, max_tokens, model)
+            cached = await asyncio.to_thread(get_llm_cache().get, key)
+            if cached is not None:
+                metrics.annotate(cache_hits=1)
+                return cached
+        if rate_limiter is not None:
+            metrics.record("llm_rate_limit_wait", await rate_limiter.aacquire(estimate_tokens(prompt) + max_tokens))
+        async with llm_concurrency.aslot():
+            response = await get_async_client().messages.create(
+                max_tokens=max_tokens,
+                messages=[{"role": "user", "content": prompt}],
+                model=model or DEFAULT_MODEL
+            )
+        _record_usage(response)
+        text = response.content[0].text
+        if use_cache:
+            await asyncio.to_thread(get_llm_cache().set, key, text)
+        return text
 
 if __name__ == "__main__":
     test_prompt = "Hello, how are you?"
     response = call_llm(test_prompt)
     print(f"Test successful. Response: {response}")
+    response = asyncio.run(acall_llm(test_prompt, max_tokens=64, rate_limiter=llm_rate_limiter))
+    print(f"Async test successful. Response: {response}")
@@ -0,0 +1,183 @@
+"""
+Record/Replay Cassette Utility for Cold Outreach Opener Generator
+"""
+import copy
+import gzip
+import hashlib
+import json
+import threading
+from contextlib import contextmanager
+from utils.html_extract import extract
+from utils.search_web import normalize_query
+
+# The flow's external calls, by the names flow.py imports them under
+PATCHED_FUNCTIONS = ("search_web", "get_html_content", "call_llm")
+
+class CassetteMissError(LookupError):
+    """
+    Raised in replay mode for a call the cassette has no recording of.
+    """
+
+class Cassette:
+    """
+    Records every external call of a run (search queries, page fetches and LLM prompts,
+    with their responses) to a gzip-compressed JSON lines file, and replays them
+    without network access or API calls.
+
+    - One response per call: the first successful one (or the error, if every attempt failed)
+    - Fetched pages are stored as raw HTML and re-extracted on replay, so parsing is still
+      exercised; pages served from the page cache have no HTML and are stored as text
+    - Replayed errors are raised again as RuntimeError, so retries and fallbacks behave the same
+
+    Replay is deterministic as long as the flow makes the same calls as the recording.
+    A changed prompt, or a page that timing-dependent modes (early exit, pipeline) analyzed
+    in one run but not the other, raises CassetteMissError.
+
+    Args:
+        path (str): Cassette file (e.g. run.cassette.jsonl.gz)
+        mode (str): "record" (overwrites `path`) or "replay"
+    """
+    def __init__(self, path, mode="replay"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._file = None
+        if mode == "record":
+            self._file = gzip.open(path, "wt", encoding="utf-8")
+            return
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                key = (entry["kind"], entry["key"])
+                if key not in self._entries or "error" in self._entries[key]:
+                    self._entries[key] = entry
+
+    @staticmethod
+    def llm_key(prompt, max_tokens=1024, model=None):
+        # Prompts can be long; the key only needs to tell them apart
+        return hashlib.sha256(json.dumps([prompt, max_tokens, model]).encode("utf-8")).hexdigest()
+
+    def _record(self, kind, key, entry):
+        with self._lock:
+            recorded = self._entries.get((kind, key))
+            if recorded is not None and ("error" not in recorded or "error" in entry):
+                return  # Keep the first response
+            self._entries[(kind, key)] = entry
+            self._file.write(json.dumps({"kind": kind, "key": key, **entry}, ensure_ascii=False) + "\n")
+
+    def _replay(self, kind, key):
+        entry = self._entries.get((kind, key))
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            raise CassetteMissError(f"No recorded {kind} call for {key[:80]}")
+        if "error" in entry:
+            raise RuntimeError(f"{entry['error']} (replayed)")
+        return copy.deepcopy(entry["response"])
+
+    def _call(self, kind, key, fn):
+        if self.mode == "replay":
+            return self._replay(kind, key)
+        try:
+            response = fn()
+        except Exception as e:
+            self._record(kind, key, {"error": f"{type(e).__name__}: {e}"})
+            raise
+        self._record(kind, key, {"response": copy.deepcopy(response)})
+        return response
+
+    def wrap_search(self, search_web):
+        def recorded_search_web(query, num_results=10, **kwargs):
+            key = json.dumps([normalize_query(query), num_results])
+            return self._call("search", key, lambda: search_web(query, num_results=num_results, **kwargs))
+        return recorded_search_web
+
+    def wrap_page(self, get_html_content):
+        def fetch(url, kwargs):
+            page = get_html_content(url, **kwargs)
+            if page.get("html"):
+                return {"html": page["html"], "final_url": page.get("final_url")}
+            return page
+
+        def recorded_get_html_content(url, **kwargs):
+            page = self._call("page", url, lambda: fetch(url, kwargs))
+            if "html" in page and "text" not in page:
+                # Recorded and replayed pages are re-extracted, as the fetcher would
+                title, text = extract(page["html"])
+                page = {"html": page["html"], "text": text, "title": title, "final_url": page["final_url"]}
+            return page
+        return recorded_get_html_content
+
+    def wrap_llm(self, call_llm):
+        def recorded_call_llm(prompt, max_tokens=1024, model=None, **kwargs):
+            key = self.llm_key(prompt, max_tokens, model)
+            return self._call("llm", key, lambda: call_llm(prompt, max_tokens=max_tokens, model=model, **kwargs))
+        return recorded_call_llm
+
+    @contextmanager
+    def patch(self, module):
+        """
+        Swaps search_web, get_html_content and call_llm in `module` (normally flow) for
+        recording or replaying versions for the duration of the block, then closes the cassette.
+        """
+        originals = {name: getattr(module, name) for name in PATCHED_FUNCTIONS}
+        module.search_web = self.wrap_search(originals["search_web"])
+        module.get_html_content = self.wrap_page(originals["get_html_content"])
+        module.call_llm = self.wrap_llm(originals["call_llm"])
+        try:
+            yield self
+        finally:
+            for name, fn in originals.items():
+                setattr(module, name, fn)
+            self.close()
+
+    def stats(self):
+        with self._lock:
+            counts = {"search": 0, "page": 0, "llm": 0}
+            for kind, _ in self._entries:
+                counts[kind] += 1
+            return {**counts, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+if __name__ == "__main__":
+    # Test: record calls to stand-in functions, then replay them without calling anything
+    import os
+    import tempfile
+    import types
+    from utils.fake_llm import FakeLLM
+
+    html = "<html><head><title>Ada Lovelace</title></head><body><p>Ada gave a keynote on engines.</p></body></html>"
+    stand_ins = types.SimpleNamespace(
+        search_web=lambda query, num_results=10, **kwargs: [{"link": "https://example.com/ada", "title": query}],
+        get_html_content=lambda url, **kwargs: {"html": html, "text": "Ada gave a keynote on engines.",
+                                                "title": "Ada Lovelace", "final_url": url},
+        call_llm=FakeLLM(seed=1)
+    )
+
+    def run(module):
+        hits = module.search_web("Ada Lovelace")
+        page = module.get_html_content(hits[0]["link"])
+        return hits, page["text"], module.call_llm(f"Summarize: {page['text']}", max_tokens=100)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "run.cassette.jsonl.gz")
+        with Cassette(path, "record").patch(stand_ins) as cassette:
+            recorded = run(stand_ins)
+        print(f"Recorded {cassette.stats()} in {os.path.getsize(path)} bytes")
+
+        stand_ins.call_llm = stand_ins.search_web = stand_ins.get_html_content = None  # Nothing live to call
+        with Cassette(path, "replay").patch(stand_ins) as cassette:
+            print(f"Replay matches: {run(stand_ins) == recorded}")
+            try:
+                stand_ins.call_llm("A prompt that was never recorded")
+            except CassetteMissError as e:
+                print(f"Miss: {e}")
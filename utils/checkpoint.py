@@ -0,0 +1,71 @@
+"""
+Batch Checkpoint Utility for Cold Outreach Opener Generator
+"""
+from utils.sqlite_cache import SQLiteCache
+
+class BatchCheckpoint:
+    """
+    Journal of a batch run, so an interrupted run can be resumed.
+
+    Every finished row is recorded under a stable hash of its inputs (person, factors
+    and style), with whether it succeeded. With save_stages, the outputs of each
+    finished stage (search hits, page text, analyses) are recorded too.
+
+    With resume=True, finished_row() returns successful rows from earlier runs and
+    load_stage() returns saved stage outputs; otherwise the journal is only written.
+
+    Args:
+        path (str): SQLite file holding the journal
+        resume (bool): Read back earlier results
+        save_stages (bool): Persist intermediate stage outputs
+    """
+    def __init__(self, path, resume=False, save_stages=False):
+        self.store = SQLiteCache(path, ttl=None, max_bytes=float("inf"))  # Never evict journal entries
+        self.resume = resume
+        self.save_stages = save_stages
+
+    @staticmethod
+    def row_key(person, personalization_factors, style):
+        return SQLiteCache.make_key(
+            person["first_name"], person["last_name"], person["keywords"], personalization_factors, style
+        )
+
+    def finished_row(self, key):
+        """
+        Returns the output row of an earlier successful run of this row, or None.
+        """
+        if not self.resume:
+            return None
+        entry = self.store.get_entry(f"row:{key}")
+        if entry is None or not entry[0]["ok"]:
+            return None
+        return entry[0]["row"]
+
+    def record_row(self, key, row, ok):
+        self.store.set(f"row:{key}", {"ok": ok, "row": row})
+
+    def load_stage(self, key, stage):
+        if not (self.resume and self.save_stages):
+            return None
+        entry = self.store.get_entry(f"stage:{key}:{stage}")
+        return entry[0] if entry else None
+
+    def save_stage(self, key, stage, outputs):
+        if self.save_stages:
+            self.store.set(f"stage:{key}:{stage}", outputs)
+
+if __name__ == "__main__":
+    # Test: a failed row is not returned on resume, a successful one is
+    import os
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "journal.sqlite")
+        person = {"first_name": "Ada", "last_name": "Lovelace", "keywords": "math"}
+        key = BatchCheckpoint.row_key(person, [], "casual")
+        first_run = BatchCheckpoint(path, save_stages=True)
+        first_run.save_stage(key, "search", {"search_results": [{"link": "https://example.com"}]})
+        first_run.record_row(key, {"opening_message": "ERROR: timeout"}, ok=False)
+        resumed = BatchCheckpoint(path, resume=True, save_stages=True)
+        print(f"Failed row on resume: {resumed.finished_row(key)}, saved search: {resumed.load_stage(key, 'search')}")
+        first_run.record_row(key, {"opening_message": "Hi Ada"}, ok=True)
+        print(f"Finished row on resume: {resumed.finished_row(key)}")
@@ -1,53 +1,200 @@
 """
 HTML Content Retrieval Utility for Cold Outreach Opener Generator
 """
+import codecs
+import logging
+import os
+import threading
+from urllib.parse import urlparse
 import requests
-from bs4 import BeautifulSoup
+from utils.html_extract import extract
+from utils.singleflight import SingleFlight
+from utils.sqlite_cache import SQLiteCache
+from utils.metrics import metrics
+from utils.rate_limiter import domain_concurrency
 
-def get_html_content(url, timeout=10):
+logger = logging.getLogger(__name__)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Download limits: pages are streamed and cut off after MAX_PAGE_BYTES
+MAX_PAGE_BYTES = int(os.getenv("MAX_PAGE_BYTES", str(2 * 1024 * 1024)))
+CHUNK_SIZE = 16 * 1024
+ALLOWED_CONTENT_TYPES = {"text/html", "application/xhtml+xml", "text/plain"}
+BINARY_SIGNATURES = (b"%PDF", b"PK\x03\x04", b"\x89PNG", b"GIF8", b"\xff\xd8\xff")
+
+# Page cache settings; PAGE_CACHE=0 always downloads
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE", "1") != "0"
+PAGE_CACHE_PATH = os.getenv("PAGE_CACHE_PATH", ".cache/pages.sqlite")
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_MB", "1000")) * 1024 * 1024
+DEFAULT_FRESHNESS = float(os.getenv("PAGE_CACHE_TTL_HOURS", "24")) * 3600
+
+# Seconds a cached page is used without revalidation, by domain (subdomains included)
+DOMAIN_FRESHNESS = {
+    "wikipedia.org": 7 * 86400,
+    "linkedin.com": 86400,
+    "x.com": 3600,
+    "twitter.com": 3600,
+}
+
+_page_cache = None
+_page_cache_lock = threading.Lock()
+_page_flights = SingleFlight()
+_revalidated = 0
+
+def get_page_cache():
+    global _page_cache
+    if _page_cache is None:
+        with _page_cache_lock:
+            if _page_cache is None:
+                _page_cache = SQLiteCache(PAGE_CACHE_PATH, max_bytes=PAGE_CACHE_MAX_BYTES)
+    return _page_cache
+
+def freshness_for(url):
+    """
+    Returns how long (seconds) a cached copy of `url` is considered fresh.
+    """
+    host = urlparse(url).netloc.lower().split(":")[0]
+    for domain, seconds in DOMAIN_FRESHNESS.items():
+        if host == domain or host.endswith("." + domain):
+            return seconds
+    return DEFAULT_FRESHNESS
+
+def page_cache_stats():
+    """
+    Returns cache hits/misses, conditional revalidations (304s) and coalesced concurrent fetches.
+    """
+    if not PAGE_CACHE_ENABLED:
+        return {"hits": 0, "misses": 0, "revalidated": 0, "coalesced": _page_flights.coalesced}
+    stats = get_page_cache().stats()
+    stats["revalidated"] = _revalidated
+    stats["coalesced"] = _page_flights.coalesced
+    return stats
+
+def _read_text(response, max_bytes):
+    """
+    Streams the body and decodes it chunk by chunk, stopping after `max_bytes`,
+    so memory per download stays bounded whatever the page size.
+    """
+    content_type = response.headers.get("Content-Type", "")
+    mime_type = content_type.split(";")[0].strip().lower()
+    if mime_type and mime_type not in ALLOWED_CONTENT_TYPES:
+        raise ValueError(f"Skipping non-HTML content ({mime_type})")
+
+    # Use the declared charset; pages without one are almost always UTF-8
+    encoding = "utf-8"
+    if "charset=" in content_type.lower():
+        encoding = content_type.lower().split("charset=")[1].split(";")[0].strip().strip('"\'')
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    parts = []
+    received = 0
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        if received == 0 and (chunk.startswith(BINARY_SIGNATURES) or b"\x00" in chunk[:1024]):
+            raise ValueError("Skipping binary content")
+        chunk = chunk[:max_bytes - received]
+        received += len(chunk)
+        metrics.add(bytes=len(chunk))
+        parts.append(decoder.decode(chunk))
+        if received >= max_bytes:
+            break
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
+
+def _fetch(url, timeout, cached=None, max_bytes=MAX_PAGE_BYTES):
+    """
+    Downloads and parses `url`. With a `cached` entry, sends a conditional request
+    and returns (cached page, response) on 304 Not Modified.
+    """
+    headers = dict(HEADERS)
+    if cached:
+        if cached.get("etag"):
+            headers['If-None-Match'] = cached["etag"]
+        if cached.get("last_modified"):
+            headers['If-Modified-Since'] = cached["last_modified"]
+    # Stream the body so non-HTML responses are dropped before downloading them
+    with domain_concurrency.get(urlparse(url).netloc).slot():
+        with requests.get(url, headers=headers, timeout=timeout, stream=True) as response:
+            if cached and response.status_code == 304:
+                return cached, response
+            response.raise_for_status()  # Raise exception for 4XX/5XX status codes
+            html_content = _read_text(response, max_bytes)
+
+    title, text = extract(html_content)
+    return {
+        "html": html_content,
+        "text": text,
+        "title": title,
+        "final_url": response.url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified")
+    }, response
+
+def _get_cached_or_fetch(url, timeout, max_bytes):
+    global _revalidated
+    cache = get_page_cache()
+    page = cache.get(url, ttl=freshness_for(url))
+    if page is not None:
+        metrics.annotate(cache_hits=1)
+        return {"html": "", "text": page["text"], "title": page["title"], "final_url": page.get("final_url")}
+
+    # Stale or missing: revalidate what we have, or download from scratch
+    entry = cache.get_entry(url)
+    page, response = _fetch(url, timeout, cached=entry[0] if entry else None, max_bytes=max_bytes)
+    if response.status_code == 304:
+        cache.touch(url)
+        metrics.annotate(revalidated=True)
+        with _page_cache_lock:
+            _revalidated += 1
+        return {"html": "", "text": page["text"], "title": page["title"], "final_url": page.get("final_url")}
+
+    # Store only the extracted text and title, not the raw HTML
+    cache.set(url, {
+        "text": page["text"],
+        "title": page["title"],
+        "final_url": page["final_url"],
+        "etag": page["etag"],
+        "last_modified": page["last_modified"]
+    })
+    return {"html": page["html"], "text": page["text"], "title": page["title"], "final_url": page["final_url"]}
+
+def get_html_content(url, timeout=10, use_cache=PAGE_CACHE_ENABLED, max_bytes=MAX_PAGE_BYTES):
     """
     Retrieves HTML content from a URL.
-    
+
+    Pages are cached on disk as extracted text/title and revalidated with
+    ETag/Last-Modified once older than their domain's freshness window.
+    Concurrent requests for the same URL share one download.
+    Downloads are streamed: non-HTML content types and binary bodies are
+    rejected up front, and only the first `max_bytes` of a page are read.
+
     Args:
         url (str): URL to retrieve content from
         timeout (int, optional): Request timeout in seconds. Defaults to 10.
-        
+        use_cache (bool, optional): Use the local page cache. Defaults to PAGE_CACHE_ENABLED.
+        max_bytes (int, optional): Maximum body bytes to read. Defaults to MAX_PAGE_BYTES (2 MB).
+
     Returns:
-        dict: Dictionary containing HTML content and extracted text
+        dict: Dictionary containing HTML content, extracted text, title and the URL
+              after redirects ("html" is empty when the page was served from the cache).
+              A page that couldn't be retrieved has empty "html", "text" and "title",
+              and the reason in "error".
     """
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=timeout)
-        response.raise_for_status()  # Raise exception for 4XX/5XX status codes
-        
-        html_content = response.text
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.extract()
-            
-        # Extract text content
-        text = soup.get_text(separator=' ', strip=True)
-        
-        # Clean up text (remove excessive newlines)
-        lines = (line.strip() for line in text.splitlines())
-        text = ' '.join(line for line in lines if line)
-        
-        return {
-            "html": html_content,
-            "text": text,
-            "title": soup.title.string if soup.title else ""
-        }
-    except Exception as e:
-        print(f"Error retrieving content from {url}: {e}")
-        return {
-            "html": "",
-            "text": f"Error retrieving content: {str(e)}",
-            "title": ""
-        }
+    with metrics.span("get_html_content"):
+        try:
+            if use_cache:
+                return _page_flights.do(url, lambda: _get_cached_or_fetch(url, timeout, max_bytes))
+            page, _ = _page_flights.do(url, lambda: _fetch(url, timeout, max_bytes=max_bytes))
+            return {"html": page["html"], "text": page["text"], "title": page["title"], "final_url": page["final_url"]}
+        except Exception as e:
+            logger.warning(f"Error retrieving content from {url}: {e}")
+            metrics.annotate(error=type(e).__name__)
+            return {"html": "", "text": "", "title": "", "error": str(e)}
 
 if __name__ == "__main__":
     # Test the function
@@ -56,4 +203,7 @@ if __name__ == "__main__":
     print(f"Title: {content['title']}")
     print(f"Text length: {len(content['text'])}")
     print("First 200 characters of text:")
-    print(content['text'][:200] + "...") 
\ No newline at end of file
+    print(content['text'][:200] + "...")
+    content = get_html_content(test_url)
+    print(f"Second fetch served from cache: {content['html'] == ''}")
+    print(page_cache_stats())
@@ -0,0 +1,129 @@
+"""
+Page De-duplication Utility for Cold Outreach Opener Generator
+"""
+import hashlib
+import re
+import threading
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+# Query parameters that only track the visit and never change the page
+TRACKING_PARAMS = {"fbclid", "gclid", "msclkid", "mc_cid", "mc_eid", "ref", "ref_src", "igshid", "si", "spm"}
+
+_lock = threading.Lock()
+_totals = {"pages": 0, "duplicates": 0}
+
+def canonicalize_url(url):
+    """
+    Normalizes a URL so trivially different links to the same page compare equal:
+    https scheme, lowercase host without "www." / "m.", no fragment, no tracking
+    parameters, sorted query, no trailing slash.
+    """
+    parts = urlparse(url.strip())
+    host = parts.netloc.lower()
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    if host.endswith(":80") or host.endswith(":443"):
+        host = host.rsplit(":", 1)[0]
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunparse(("https", host, path, "", urlencode(query), ""))
+
+def simhash(text, shingle_size=3, max_words=2000):
+    """
+    64-bit SimHash over word shingles; near-identical texts get hashes a few bits apart.
+    Only the first `max_words` words are fingerprinted, which bounds the (pure Python,
+    GIL-holding) cost on long pages; copies of a page already agree in their first part.
+    """
+    # About 12 characters per word is plenty, so the regex doesn't scan the whole page either
+    words = re.findall(r"\w+", text[:max_words * 12].lower())[:max_words]
+    shingles = [" ".join(words[i:i + shingle_size]) for i in range(max(1, len(words) - shingle_size + 1))]
+    # Bit i of the result is set when most shingle hashes have it set. Counting per bit over
+    # one string of 64-character binary rows keeps the loop over shingles out of Python.
+    rows = "".join(
+        format(int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big"), "064b")
+        for shingle in shingles
+    ).encode("ascii")
+    return sum(1 << (63 - column) for column in range(64) if rows[column::64].count(b"1") * 2 > len(shingles))
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+class PageDeduplicator:
+    """
+    Incremental de-duplication: check() pages one at a time, e.g. as they are fetched.
+    Pages are duplicates if their canonical URLs match, one redirected to the other
+    (content["final_url"]), or their text SimHashes are within `max_distance` bits.
+    """
+    def __init__(self, max_distance=3):
+        self.max_distance = max_distance
+        self.seen_urls = {}  # canonical URL -> kept url
+        self.fingerprints = []  # (simhash, kept url)
+
+    def check(self, page):
+        """
+        Returns the url of the earlier page this one duplicates, or None (and remembers the page).
+        """
+        urls = {canonicalize_url(page["url"])}
+        if page["content"].get("final_url"):
+            urls.add(canonicalize_url(page["content"]["final_url"]))
+        match = next((self.seen_urls[url] for url in urls if url in self.seen_urls), None)
+
+        fingerprint = simhash(f'{page["content"].get("title") or ""} {page["content"]["text"]}')
+        if match is None:
+            match = next((url for other, url in self.fingerprints
+                          if hamming_distance(fingerprint, other) <= self.max_distance), None)
+
+        with _lock:
+            _totals["pages"] += 1
+            _totals["duplicates"] += match is not None
+        if match is None:
+            for url in urls:
+                self.seen_urls[url] = page["url"]
+            self.fingerprints.append((fingerprint, page["url"]))
+        return match
+
+def dedupe_pages(pages, max_distance=3):
+    """
+    Keeps one representative (the first, i.e. best ranked) page per cluster of duplicates.
+
+    Args:
+        pages (list): {"url", "content"} dicts, as stored in shared["web_contents"]
+
+    Returns:
+        tuple: (kept pages, list of (duplicate url, kept url))
+    """
+    deduplicator = PageDeduplicator(max_distance)
+    kept, duplicates = [], []
+    for page in pages:
+        match = deduplicator.check(page)
+        if match is None:
+            kept.append(page)
+        else:
+            duplicates.append((page["url"], match))
+    return kept, duplicates
+
+def dedupe_stats():
+    """
+    Returns pages seen and duplicates dropped (= LLM analysis calls avoided) in this process.
+    """
+    with _lock:
+        return dict(_totals)
+
+if __name__ == "__main__":
+    # Test: a tracking-parameter variant, a redirect and a syndicated copy are dropped
+    article = "Ada Lovelace gave the keynote at the annual conference on computing and shared her notes. " * 20
+    pages = [
+        {"url": "https://www.example.com/news/ada/", "content": {"title": "Ada keynote", "text": article}},
+        {"url": "http://example.com/news/ada?utm_source=x", "content": {"title": "Ada keynote", "text": "other"}},
+        {"url": "https://short.link/abc", "content": {"title": "Ada keynote", "text": "x", "final_url": "https://example.com/news/ada"}},
+        {"url": "https://mirror.org/ada", "content": {"title": "Ada keynote", "text": article + " Reposted."}},
+        {"url": "https://other.org/bio", "content": {"title": "Biography", "text": "Born in London in 1815. " * 30}},
+    ]
+    kept, duplicates = dedupe_pages(pages)
+    print(f"Kept: {[page['url'] for page in kept]}")
+    for duplicate, original in duplicates:
+        print(f"  {duplicate} duplicates {original}")
@@ -0,0 +1,116 @@
+"""
+Local stand-in for call_llm, for exercising the flow without Vertex
+"""
+import random
+import re
+import threading
+import time
+from utils.metrics import metrics
+from utils.rate_limiter import estimate_tokens
+
+class FakeLLM:
+    """
+    Callable with the same interface as call_llm, including charging `rate_limiter`
+    (the fake has no cache, so every call is charged, like a cache miss).
+    Answers analysis prompts (single or multi-page) with YAML covering every factor
+    in the prompt, and any other prompt with a short opening message.
+
+    Args:
+        latency (float): Seconds each call takes
+        failure_rate (float): Probability that a call raises, to exercise retries
+        actionable_rate (float): Probability that a factor is reported actionable
+        seed (int, optional): Random seed for reproducible runs
+        token_latency (float): Extra seconds per output token, as when streaming from a real model
+    """
+    def __init__(self, latency=0.05, failure_rate=0.0, actionable_rate=0.5, seed=None, token_latency=0.0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.failure_rate = failure_rate
+        self.actionable_rate = actionable_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt, max_tokens=1024, rate_limiter=None, **kwargs):
+        if rate_limiter is not None:
+            metrics.record("llm_rate_limit_wait", rate_limiter.acquire(estimate_tokens(prompt) + max_tokens))
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = self.random.random() < self.failure_rate
+            roll = self.random.random
+        try:
+            time.sleep(self.latency)
+            if fail:
+                with self._lock:
+                    self.failures += 1
+                raise RuntimeError("FakeLLM: simulated 429 Too Many Requests")
+            if "```yaml" in prompt:
+                response = self._analysis_response(prompt, roll)
+            else:
+                response = "Loved your recent talk on scaling teams, it really stuck with me."
+            time.sleep(self.token_latency * estimate_tokens(response))
+            return response
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _factor_lines(self, names, roll, indent):
+        lines = []
+        for name in names:
+            actionable = roll() < self.actionable_rate
+            lines += [
+                f'{indent}- name: "{name}"',
+                f'{indent}  action: "mention it"',
+                f"{indent}  actionable: {str(actionable).lower()}",
+                f'{indent}  details: "{"found evidence for " + name if actionable else ""}"'
+            ]
+        return lines
+
+    def _analysis_response(self, prompt, roll):
+        names = re.findall(r"^\d+\. (\w+):", prompt, flags=re.MULTILINE)
+        urls = re.findall(r"^Page \d+ - (\S+)$", prompt, flags=re.MULTILINE)
+        if urls:
+            lines = ["```yaml", "pages:"]
+            for url in urls:
+                lines += [f'  - url: "{url}"', "    factors:"] + self._factor_lines(names, roll, "      ")
+        else:
+            lines = ["```yaml", "factors:"] + self._factor_lines(names, roll, "  ")
+        lines.append("```")
+        return "\n".join(lines)
+
+if __name__ == "__main__":
+    # Drive AnalyzeResultsBatchNode with the fake LLM under a budget of 8 requests per second:
+    # 10 per-page calls plus retries need at least one extra window
+    import flow
+    from utils.rate_limiter import RateLimiter
+
+    fake_llm = FakeLLM(latency=0.2, failure_rate=0.2, seed=1)
+    flow.call_llm = fake_llm
+    limiter = RateLimiter(requests_per_minute=8, window=1.0)
+    node = flow.AnalyzeResultsBatchNode(max_retries=3, wait=0.1, max_workers=10, analysis_mode="per_page",
+                                        use_cache=False, rate_limiter=limiter)
+    shared = {
+        "input": {
+            "first_name": "Ada",
+            "last_name": "Lovelace",
+            "personalization_factors": [
+                {"name": "recent_talks", "description": "Gave a talk recently", "action": "Mention it"},
+                {"name": "recent_promotion", "description": "Was recently promoted", "action": "Congratulate"}
+            ]
+        },
+        "web_contents": [
+            {"url": f"https://example.com/{i}", "content": {"title": f"Page {i}", "text": "Ada Lovelace spoke..."}}
+            for i in range(10)
+        ]
+    }
+    start = time.monotonic()
+    node.run(shared)
+    print(f"Analyzed 10 pages in {time.monotonic() - start:.2f}s "
+          f"({fake_llm.calls} calls, {fake_llm.failures} failures, max {fake_llm.max_in_flight} in flight, "
+          f"{len(limiter._sent)} calls in the last rate window)")
+    print(shared["personalization"])
@@ -0,0 +1,107 @@
+"""
+HTML-to-Text Extraction Utility for Cold Outreach Opener Generator
+"""
+import os
+import re
+from bs4 import BeautifulSoup
+
+# lxml refuses str input that declares an encoding, as XHTML pages often do
+XML_DECLARATION = re.compile(r"^\s*<\?xml[^>]*\?>")
+
+# Elements whose text is never useful for personalization: code, styling and page chrome
+BOILERPLATE_TAGS = ["script", "style", "noscript", "template", "svg", "nav", "footer", "aside"]
+
+def _clean(text):
+    # Collapse all runs of whitespace (including newlines) into single spaces
+    return " ".join(text.split())
+
+def extract_html_parser(html):
+    """
+    Pure-Python fallback using BeautifulSoup's html.parser. Always available.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    title = soup.title.string if soup.title and soup.title.string else ""
+
+    # Remove script, style and boilerplate elements
+    for element in soup(BOILERPLATE_TAGS):
+        element.extract()
+
+    return _clean(title), _clean(soup.get_text(separator=' ', strip=True))
+
+def extract_lxml(html):
+    import lxml.html
+    from lxml import etree
+    html = XML_DECLARATION.sub("", html, count=1)
+    if not html.strip():
+        return "", ""
+    doc = lxml.html.document_fromstring(html)
+    title = doc.findtext(".//title") or ""
+    for element in doc.xpath("|".join(f"//{tag}" for tag in BOILERPLATE_TAGS) + "|//comment()"):
+        element.drop_tree()
+    # itertext keeps text nodes separate, so adjacent blocks don't run together
+    text = " ".join(doc.itertext(tag=etree.Element))
+    return _clean(title), _clean(text)
+
+def extract_selectolax(html):
+    from selectolax.lexbor import LexborHTMLParser
+    tree = LexborHTMLParser(html)
+    title_node = tree.css_first("title")
+    title = title_node.text() if title_node else ""
+    tree.strip_tags(BOILERPLATE_TAGS)
+    text = tree.root.text(separator=" ") if tree.root else ""
+    return _clean(title), _clean(text)
+
+def _available(module):
+    try:
+        __import__(module)
+        return True
+    except ImportError:  # Optional dependency not installed
+        return False
+
+# Backends in order of preference; html.parser is the always-available fallback
+EXTRACTORS = {}
+if _available("selectolax.lexbor"):
+    EXTRACTORS["selectolax"] = extract_selectolax
+if _available("lxml"):
+    EXTRACTORS["lxml"] = extract_lxml
+EXTRACTORS["html.parser"] = extract_html_parser
+
+def get_extractor(name=None):
+    """
+    Returns the extractor named `name` (or HTML_EXTRACTOR), else the fastest installed one.
+    """
+    name = name or os.getenv("HTML_EXTRACTOR")
+    if name:
+        if name not in EXTRACTORS:
+            raise ValueError(f"HTML extractor '{name}' is not available; installed: {list(EXTRACTORS)}")
+        return EXTRACTORS[name]
+    return next(iter(EXTRACTORS.values()))
+
+def extract(html, backend=None):
+    """
+    Extracts the page title and readable text from HTML.
+
+    Args:
+        html (str): Page HTML
+        backend (str, optional): "selectolax", "lxml" or "html.parser"
+
+    Returns:
+        tuple: (title, text)
+    """
+    extractor = get_extractor(backend)
+    try:
+        return extractor(html)
+    except Exception:
+        # The optional backends reject some pages (e.g. comment-only documents); html.parser copes
+        if extractor is extract_html_parser:
+            raise
+        return extract_html_parser(html)
+
+if __name__ == "__main__":
+    # Test every installed backend on a small page
+    sample = """<html><head><title>Ada Lovelace</title><style>p {}</style></head>
+<body><nav>Home | About</nav><h1>Ada Lovelace</h1><p>Wrote the first
+program.</p><!-- note --><p>Born 1815.</p><footer>Copyright</footer></body></html>"""
+    xhtml = '<?xml version="1.0" encoding="utf-8"?>\n<html xmlns="http://www.w3.org/1999/xhtml"><head><title>X</title></head><body><p>Hi</p></body></html>'
+    for name in EXTRACTORS:
+        print(f"{name}: {extract(sample, backend=name)} {extract(xhtml, backend=name)} {extract('<!-- only -->', backend=name)}")
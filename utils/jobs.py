@@ -0,0 +1,161 @@
+"""
+Background Job Utility for Cold Outreach Opener Generator
+"""
+import contextvars
+import copy
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from utils.metrics import metrics, format_run_summary
+
+_current_job = contextvars.ContextVar("current_job", default=None)
+
+class Job:
+    """
+    One background run. status is "queued", "running", "done" or "failed";
+    `logs` holds the job's latest log lines and `log_version` counts every line added,
+    so a viewer can skip re-rendering when nothing changed.
+    """
+    def __init__(self, key, max_log_lines=200):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.cached = False
+        self.summary = ""
+        self.logs = deque(maxlen=max_log_lines)
+        self.log_version = 0
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+class JobLogHandler(logging.Handler):
+    """
+    Sends log records to the job they were logged from, including from the flow's
+    worker threads (they run in the job's context via run_in_context).
+    """
+    def emit(self, record):
+        job = _current_job.get()
+        if job is not None:
+            job.logs.append(self.format(record))
+            job.log_version += 1
+
+class JobRunner:
+    """
+    Runs jobs on a thread pool so callers (e.g. a Streamlit script run) can return
+    right away and poll for progress.
+
+    - Successful results are kept in an LRU cache of `cache_size` entries by job key:
+      submitting a cached key returns an already finished job
+    - Submitting a key whose job is still queued or running returns that job
+    - At most `max_jobs` jobs are remembered; the oldest finished ones are forgotten first
+
+    Args:
+        max_workers (int): Jobs run at the same time
+        cache_size (int): Results kept for repeat submissions
+        max_jobs (int): Jobs kept for get()
+    """
+    def __init__(self, max_workers=4, cache_size=128, max_jobs=1000):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.cache_size = cache_size
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._jobs = OrderedDict()
+        self._active = {}
+        handler = JobLogHandler()
+        handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+        logging.getLogger().addHandler(handler)
+
+    def submit(self, key, fn):
+        """
+        Starts fn() in the background unless its result is cached or already being computed.
+        fn's return value becomes job.result. Returns the Job.
+        """
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                job = Job(key)
+                job.status, job.cached = "done", True
+                job.result = copy.deepcopy(self._cache[key])
+                job.started = job.finished = time.time()
+                self._remember(job)
+                return job
+            if key in self._active:
+                return self._active[key]
+            job = Job(key)
+            self._active[key] = job
+            self._remember(job)
+        # A fresh context per job, so nothing carries over between jobs on the same pool thread
+        self.executor.submit(contextvars.Context().run, self._run, job, fn)
+        return job
+
+    def _remember(self, job):
+        self._jobs[job.id] = job
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if self._jobs[job_id].done:
+                del self._jobs[job_id]
+
+    def _run(self, job, fn):
+        _current_job.set(job)
+        job.status, job.started = "running", time.time()
+        try:
+            with metrics.run(job.id):
+                result = fn()
+            job.result = result
+            with self._lock:
+                self._cache[job.key] = copy.deepcopy(result)
+                self._cache.move_to_end(job.key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            job.status = "done"
+        except Exception as e:
+            logging.getLogger("jobs").exception(f"Job {job.id} failed")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.summary = format_run_summary(metrics.finish_run(job.id), names=["search_web", "get_html_content", "call_llm"])
+            job.finished = time.time()
+            with self._lock:
+                self._active.pop(job.key, None)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+if __name__ == "__main__":
+    # Test: a repeat submission while running shares the job, and after it finishes comes from the cache
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("test")
+    runner = JobRunner(max_workers=2, cache_size=2)
+
+    def slow_job(name):
+        def run():
+            for step in ("search", "research", "draft"):
+                logger.info(f"{name}: {step}")
+                time.sleep(0.1)
+            return {"opening_message": f"Hi {name}"}
+        return run
+
+    first = runner.submit(("Ada", "Lovelace"), slow_job("Ada"))
+    print(f"Shared while running: {runner.submit(('Ada', 'Lovelace'), slow_job('Ada')) is first}")
+    while not first.done:
+        time.sleep(0.05)
+    print(f"{first.status} in {first.elapsed():.2f}s, logs: {list(first.logs)}")
+    repeat = runner.submit(("Ada", "Lovelace"), slow_job("Ada"))
+    print(f"Repeat: {repeat.status}, cached={repeat.cached}, {repeat.result}, found by id: {runner.get(repeat.id) is repeat}")
@@ -0,0 +1,275 @@
+"""
+Latency, Token and Cost Metrics Utility for Cold Outreach Opener Generator
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Numeric span fields summed per name and per run
+COUNTED_FIELDS = ("bytes", "input_tokens", "output_tokens", "retries", "cache_hits")
+
+# Optional USD prices per million LLM tokens, for cost estimates in summaries
+LLM_INPUT_COST_PER_MTOK = float(os.getenv("LLM_INPUT_COST_PER_MTOK", "0"))
+LLM_OUTPUT_COST_PER_MTOK = float(os.getenv("LLM_OUTPUT_COST_PER_MTOK", "0"))
+
+_current_run = contextvars.ContextVar("metrics_run", default=None)
+_current_span = contextvars.ContextVar("metrics_span", default=None)
+
+def percentile(values, q):
+    # Nearest-rank percentile of an unsorted list
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+def run_in_context(fn):
+    """
+    Wraps `fn` to run in a copy of the caller's context, so spans recorded on another
+    thread (thread pools, pipeline threads) are attributed to the caller's run.
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+class Metrics:
+    """
+    Records timed spans (node prep/exec/post, search, page fetches, LLM calls) with
+    fields such as bytes, input/output tokens and retries.
+
+    - Totals and the latest `max_samples` latencies per name, for p50/p95/p99
+    - Per-run totals (one run = one person), returned and exported by finish_run()
+    - Every span and run summary is appended to a JSON lines file if export_jsonl() was called
+    - Gauges: current values set by set_gauge(), such as adaptive concurrency limits
+
+    Thread-safe; use the process-wide `metrics` instance.
+    """
+    def __init__(self, max_samples=10000):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=self.max_samples))
+        self._totals = defaultdict(lambda: defaultdict(float))
+        self._runs = defaultdict(lambda: defaultdict(lambda: defaultdict(float)))
+        self._gauges = {}
+        self._jsonl = None
+
+    def export_jsonl(self, path):
+        with self._lock:
+            if self._jsonl:
+                self._jsonl.close()
+            self._jsonl = open(path, "a", encoding="utf-8")
+
+    def _write(self, event):
+        if self._jsonl:
+            self._jsonl.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self._jsonl.flush()
+
+    @contextmanager
+    def span(self, name, **fields):
+        """
+        Times the block and records it under `name`. Yields the span's field dict;
+        utilities called inside can add to it with annotate() / add().
+        """
+        event = dict(fields)
+        token = _current_span.set(event)
+        start = time.perf_counter()
+        try:
+            yield event
+        except Exception as e:
+            event["error"] = type(e).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            self.record(name, time.perf_counter() - start, **event)
+
+    def annotate(self, **fields):
+        """
+        Sets fields on the innermost open span, if any.
+        """
+        event = _current_span.get()
+        if event is not None:
+            with self._lock:
+                event.update(fields)
+
+    def add(self, **fields):
+        """
+        Adds to numeric fields on the innermost open span, if any.
+        """
+        event = _current_span.get()
+        if event is not None:
+            with self._lock:
+                for field, amount in fields.items():
+                    event[field] = event.get(field, 0) + amount
+
+    def record(self, name, seconds, **fields):
+        run = _current_run.get()
+        with self._lock:
+            self._samples[name].append(seconds)
+            for totals in ([self._totals[name], self._runs[run][name]] if run is not None else [self._totals[name]]):
+                totals["count"] += 1
+                totals["seconds"] += seconds
+                totals["errors"] += "error" in fields
+                for field in COUNTED_FIELDS:
+                    totals[field] += fields.get(field) or 0
+            self._write({"type": "span", "ts": time.time(), "run": run, "name": name,
+                         "seconds": round(seconds, 6), **fields})
+
+    @contextmanager
+    def run(self, run_id):
+        """
+        Attributes spans recorded in the block (and in threads started with
+        run_in_context) to `run_id`, until finish_run(run_id).
+        """
+        token = _current_run.set(run_id)
+        try:
+            yield
+        finally:
+            _current_run.reset(token)
+
+    def finish_run(self, run_id):
+        """
+        Returns and exports the totals per span name for `run_id`, and forgets them.
+        """
+        with self._lock:
+            totals = self._runs.pop(run_id, {})
+        summary = {name: dict(values) for name, values in totals.items()}
+        with self._lock:
+            self._write({"type": "run_summary", "ts": time.time(), "run": run_id,
+                         "cost_usd": round(estimate_cost(summary), 6), "spans": summary})
+        return summary
+
+    def set_gauge(self, name, value, **labels):
+        """
+        Sets the current value of gauge `name` for the given labels.
+        """
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def gauges(self):
+        """
+        Returns {name: [(labels, value), ...]} with the current value of every gauge.
+        """
+        with self._lock:
+            items = sorted(self._gauges.items())
+        gauges = defaultdict(list)
+        for (name, labels), value in items:
+            gauges[name].append((dict(labels), value))
+        return dict(gauges)
+
+    def summary(self):
+        """
+        Returns totals and p50/p95/p99 latencies per span name for this process.
+        """
+        with self._lock:
+            names = {name: (list(self._samples[name]), dict(self._totals[name])) for name in self._totals}
+        return {
+            name: {**totals, "p50": percentile(samples, 50), "p95": percentile(samples, 95), "p99": percentile(samples, 99)}
+            for name, (samples, totals) in sorted(names.items())
+        }
+
+    def prometheus_text(self):
+        """
+        Renders summary() in the Prometheus text exposition format.
+        """
+        summary = self.summary()
+        lines = ["# TYPE outreach_span_seconds summary"]
+        for name, stats in summary.items():
+            label = f'name="{name}"'
+            for q in (50, 95, 99):
+                lines.append(f'outreach_span_seconds{{{label},quantile="0.{q}"}} {stats[f"p{q}"]:.6f}')
+            lines.append(f"outreach_span_seconds_sum{{{label}}} {stats['seconds']:.6f}")
+            lines.append(f"outreach_span_seconds_count{{{label}}} {int(stats['count'])}")
+        for field in ("errors",) + COUNTED_FIELDS:
+            lines.append(f"# TYPE outreach_{field}_total counter")
+            lines += [f'outreach_{field}_total{{name="{name}"}} {int(stats[field])}'
+                      for name, stats in summary.items() if stats[field]]
+        for name, values in self.gauges().items():
+            lines.append(f"# TYPE outreach_{name} gauge")
+            for labels, value in values:
+                label = ",".join(f'{key}="{label_value}"' for key, label_value in labels.items())
+                lines.append(f"outreach_{name}{{{label}}} {value:g}" if label else f"outreach_{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """
+        Serves prometheus_text() at http://host:port/metrics from a background thread.
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # Keep scrapes out of the batch output
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def report(self):
+        """
+        Returns a latency table (one line per span name) for printing.
+        """
+        lines = [f"{'span':<32} {'count':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>6} {'retries':>7}"]
+        for name, stats in self.summary().items():
+            lines.append(f"{name:<32} {int(stats['count']):>6} {stats['p50']:>7.3f}s {stats['p95']:>7.3f}s "
+                         f"{stats['p99']:>7.3f}s {int(stats['errors']):>6} {int(stats['retries']):>7}")
+        return lines
+
+def estimate_cost(summary):
+    # USD for the LLM tokens in a summary, from LLM_INPUT/OUTPUT_COST_PER_MTOK (0 if unset)
+    input_tokens = sum(stats.get("input_tokens", 0) for stats in summary.values())
+    output_tokens = sum(stats.get("output_tokens", 0) for stats in summary.values())
+    return (input_tokens * LLM_INPUT_COST_PER_MTOK + output_tokens * LLM_OUTPUT_COST_PER_MTOK) / 1_000_000
+
+def format_run_summary(summary, names=None):
+    """
+    One line: seconds per span name (default: all), LLM calls, tokens and estimated cost.
+    """
+    parts = [f"{name} {summary[name]['seconds']:.2f}s" for name in (names or sorted(summary)) if name in summary]
+    llm = summary.get("call_llm", {})
+    line = (f"{', '.join(parts)}; {int(llm.get('count', 0))} LLM calls "
+            f"({int(llm.get('cache_hits', 0))} cached), "
+            f"{int(llm.get('input_tokens', 0))} in / {int(llm.get('output_tokens', 0))} out tokens")
+    cost = estimate_cost(summary)
+    return line + (f", ~${cost:.4f}" if cost else "")
+
+metrics = Metrics()
+
+if __name__ == "__main__":
+    # Test: spans in a run, including one recorded on another thread
+    import random
+    import urllib.request
+
+    def fake_llm_call():
+        with metrics.span("call_llm"):
+            time.sleep(random.uniform(0.01, 0.03))
+            metrics.annotate(input_tokens=900, output_tokens=120)
+
+    with metrics.run("Ada Lovelace"):
+        with metrics.span("SearchPersonNode.exec"):
+            time.sleep(0.02)
+        threads = [threading.Thread(target=run_in_context(fake_llm_call)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    print(format_run_summary(metrics.finish_run("Ada Lovelace")))
+    print("\n".join(metrics.report()))
+
+    server = metrics.serve(0)
+    with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+        print(response.read().decode("utf-8").splitlines()[1])
+    server.shutdown()
@@ -0,0 +1,117 @@
+"""
+Staged Pipeline Utility for Cold Outreach Opener Generator
+"""
+import queue
+import threading
+
+_DONE = object()
+
+def run_pipeline(items, stages, queue_size=4):
+    """
+    Runs each item through a chain of stages, each stage with its own worker threads,
+    so different items can be in different stages at the same time (e.g. searching for
+    person N+1 while drafting for person N).
+
+    Stages are connected by queues of at most `queue_size` items, and at most
+    `queue_size` items per stage (plus one per worker) are in the pipeline at once: when a
+    later stage falls behind, earlier stages wait instead of piling up results in memory.
+
+    Args:
+        items (iterable): Inputs, consumed lazily
+        stages (list): (function, workers) pairs; each function takes the previous stage's output
+        queue_size (int): Capacity of each queue between stages
+
+    Yields:
+        The last stage's output for each item, in input order.
+        An exception raised by a stage function (or by `items`) is re-raised when its item is yielded.
+    """
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    # Bounds items in flight, including finished items waiting for an earlier one to finish
+    capacity = threading.Semaphore(queue_size * len(stages) + sum(workers for _, workers in stages))
+    stop = threading.Event()
+
+    def feed():
+        index = 0
+        try:
+            for item in items:
+                capacity.acquire()
+                if stop.is_set():
+                    break
+                queues[0].put((index, item, None))
+                index += 1
+        except Exception as e:
+            # A failing input iterator surfaces as an error in the item it failed to produce
+            queues[0].put((index, None, e))
+        for _ in range(stages[0][1]):
+            queues[0].put(_DONE)
+
+    def work(stage, inbox, outbox, remaining, lock):
+        fn, _ = stages[stage]
+        while True:
+            entry = inbox.get()
+            if entry is _DONE:
+                break
+            index, value, error = entry
+            if error is None:
+                try:
+                    value = fn(value)
+                except Exception as e:
+                    error = e
+            outbox.put((index, value, error))
+        # The last worker of a stage to finish closes the next stage
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            following = stages[stage + 1][1] if stage + 1 < len(stages) else 1
+            for _ in range(following):
+                outbox.put(_DONE)
+
+    threads = [threading.Thread(target=feed, daemon=True)]
+    for stage, (_, workers) in enumerate(stages):
+        remaining, lock = [workers], threading.Lock()
+        threads += [
+            threading.Thread(target=work, args=(stage, queues[stage], queues[stage + 1], remaining, lock), daemon=True)
+            for _ in range(workers)
+        ]
+    for thread in threads:
+        thread.start()
+
+    # Reorder the results so items come out in input order
+    pending, next_index = {}, 0
+    try:
+        while True:
+            entry = queues[-1].get()
+            if entry is _DONE:
+                break
+            index, value, error = entry
+            pending[index] = (value, error)
+            while next_index in pending:
+                value, error = pending.pop(next_index)
+                next_index += 1
+                capacity.release()
+                if error is not None:
+                    raise error
+                yield value
+    finally:
+        # If the caller stops early, let the feeder exit; items already in flight are dropped
+        stop.set()
+        capacity.release()
+
+if __name__ == "__main__":
+    # Test: three stages with uneven latency keep input order and overlap
+    import random
+    import time
+
+    def stage(name, latency):
+        def run(value):
+            time.sleep(random.uniform(0, latency))
+            return value + [name]
+        return run
+
+    start = time.monotonic()
+    results = list(run_pipeline(([i] for i in range(20)), [(stage("search", 0.05), 2),
+                                                          (stage("research", 0.2), 4),
+                                                          (stage("draft", 0.05), 2)]))
+    print(f"Ordered: {[r[0] for r in results] == list(range(20))}, {time.monotonic() - start:.2f}s "
+          f"(sequential would take ~{20 * 0.15:.1f}s)")
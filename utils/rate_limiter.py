@@ -0,0 +1,360 @@
+"""
+Rate Limiting Utility for Cold Outreach Opener Generator
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from utils.metrics import metrics
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate (about 4 characters per token for English text).
+    """
+    return len(text) // 4 + 1
+
+def backoff_delay(retry, base=1.0, cap=60.0):
+    """
+    Jittered exponential backoff: about base * 2**retry seconds, randomized by ±50%, capped at `cap`.
+    """
+    return min(cap, base * (2 ** retry)) * random.uniform(0.5, 1.5)
+
+class RateLimiter:
+    """
+    Blocks callers until a request fits within requests-per-minute and
+    tokens-per-minute budgets, measured over a sliding 60 second window.
+    Thread-safe: share one instance between all threads calling the same API.
+    A budget of None means unlimited.
+    """
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, window=60.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window = window
+        self._sent = deque()  # (timestamp, tokens) of requests in the current window
+        self._tokens_in_window = 0
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        while self._sent and now - self._sent[0][0] >= self.window:
+            _, tokens = self._sent.popleft()
+            self._tokens_in_window -= tokens
+
+    def _fits(self, tokens):
+        if self.requests_per_minute and len(self._sent) >= self.requests_per_minute:
+            return False
+        if self.tokens_per_minute and self._sent and self._tokens_in_window + tokens > self.tokens_per_minute:
+            # A single request larger than the whole budget is let through on an empty window
+            return False
+        return True
+
+    def acquire(self, tokens=0):
+        """
+        Waits until a request of `tokens` tokens is allowed, then records it.
+        Returns the number of seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._expire(now)
+                if self._fits(tokens):
+                    self._sent.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    return waited
+                # Sleep until the oldest request leaves the window
+                delay = self.window - (now - self._sent[0][0])
+            time.sleep(delay)
+            waited += delay
+
+    async def aacquire(self, tokens=0):
+        """
+        acquire() for asyncio code, sharing the same budgets with threads.
+        Sleeps without blocking the event loop; a cancelled wait records nothing.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._expire(now)
+                if self._fits(tokens):
+                    self._sent.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    return waited
+                delay = self.window - (now - self._sent[0][0])
+            await asyncio.sleep(delay)
+            waited += delay
+
+def is_overload_error(error):
+    """
+    True for errors that mean the endpoint is overloaded: 429 Too Many Requests,
+    5xx responses and timeouts. Other failures (404, bad input) say nothing about load.
+    """
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return is_overload_status(status)
+    return isinstance(error, TimeoutError) or "Timeout" in type(error).__name__
+
+def is_overload_status(status):
+    return status == 429 or status >= 500
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit for one endpoint that adapts to how the endpoint responds (AIMD):
+
+    - Each healthy call (no overload, latency within `latency_tolerance` times the
+      recent baseline) adds 1/limit, so the limit grows by about one per round of calls,
+      but only while callers actually use most of it
+    - A 429, 5xx or timeout multiplies the limit by `decrease`. Calls that started
+      before the last cut don't cut again, so one burst of errors halves the limit once
+    - Slow but successful calls leave the limit as it is
+
+    With adaptive=False the limit stays at `initial`; with enabled=False nothing is limited.
+    The current limit is published as the `concurrency_limit` gauge. Thread-safe;
+    share one instance between all threads calling the same endpoint.
+
+    Usage:
+        with limiter.slot() as outcome:       # Waits while `limit` calls are in flight
+            response = requests.get(url)      # Exceptions are classified automatically
+            outcome["overloaded"] = response.status_code == 429
+    """
+    def __init__(self, name, initial=4, min_limit=1, max_limit=64, decrease=0.5, latency_tolerance=2.0,
+                 enabled=True, adaptive=True, **labels):
+        self.name = name
+        self.labels = {"limiter": name, **labels}
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.enabled = enabled
+        self.adaptive = adaptive
+        self.in_flight = 0
+        self.cuts = 0
+        self._latencies = deque(maxlen=100)  # Latencies of recent healthy calls
+        self._last_cut = 0.0
+        self._cond = threading.Condition()
+        self._publish()
+
+    def _publish(self):
+        if self.enabled:
+            metrics.set_gauge("concurrency_limit", round(self.limit, 2), **self.labels)
+
+    def _baseline(self):
+        # 10th percentile of recent latencies: robust to a single unusually fast call
+        return sorted(self._latencies)[len(self._latencies) // 10]
+
+    def acquire(self):
+        """
+        Waits until fewer than `limit` calls are in flight, then takes a slot.
+        Returns the number of seconds spent waiting.
+        """
+        start = time.monotonic()
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+        return time.monotonic() - start
+
+    def try_acquire(self):
+        """
+        Takes a slot if fewer than `limit` calls are in flight; returns whether it did.
+        """
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def release(self, started, latency, overloaded=False):
+        """
+        Frees the slot taken at `started` (time.monotonic()) and adjusts the limit.
+        """
+        with self._cond:
+            utilized = self.in_flight >= self.limit / 2
+            self.in_flight -= 1
+            if self.adaptive:
+                self._adjust(started, latency, overloaded, utilized)
+            self._cond.notify_all()
+            self._publish()
+
+    def _adjust(self, started, latency, overloaded, utilized):
+        if overloaded:
+            if started >= self._last_cut:
+                self.limit = max(self.min_limit, self.limit * self.decrease)
+                self._last_cut = time.monotonic()
+                self.cuts += 1
+        else:
+            self._latencies.append(latency)
+            if utilized and latency <= self._baseline() * self.latency_tolerance:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    @contextmanager
+    def slot(self):
+        """
+        Holds a slot for one call. Yields a dict; set its "overloaded" key for
+        overload signals that are not exceptions, such as a returned 429 response.
+        """
+        outcome = {"overloaded": False}
+        if not self.enabled:
+            yield outcome
+            return
+        waited = self.acquire()
+        if waited > 0.001:
+            metrics.record(f"{self.name}_concurrency_wait", waited)
+        started = time.monotonic()
+        try:
+            yield outcome
+        except Exception as e:
+            outcome["overloaded"] = is_overload_error(e)
+            raise
+        finally:
+            self.release(started, time.monotonic() - started, overloaded=outcome["overloaded"])
+
+    @asynccontextmanager
+    async def aslot(self, poll=0.02):
+        """
+        slot() for asyncio code, sharing the same limit with threads. Waits by polling
+        every `poll` seconds, so the event loop isn't blocked and a cancelled wait holds nothing.
+        """
+        outcome = {"overloaded": False}
+        if not self.enabled:
+            yield outcome
+            return
+        start = time.monotonic()
+        while not self.try_acquire():
+            await asyncio.sleep(poll)
+        waited = time.monotonic() - start
+        if waited > 0.001:
+            metrics.record(f"{self.name}_concurrency_wait", waited)
+        started = time.monotonic()
+        try:
+            yield outcome
+        except Exception as e:
+            outcome["overloaded"] = is_overload_error(e)
+            raise
+        finally:
+            self.release(started, time.monotonic() - started, overloaded=outcome["overloaded"])
+
+    def stats(self):
+        return {"limit": round(self.limit, 2), "in_flight": self.in_flight, "cuts": self.cuts}
+
+class AdaptiveLimiterGroup:
+    """
+    One AdaptiveLimiter per key, e.g. per domain, created on first use with `options`.
+    """
+    def __init__(self, name, **options):
+        self.name = name
+        self.options = options
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = self._limiters[key] = AdaptiveLimiter(self.name, key=key, **self.options)
+            return limiter
+
+    def stats(self):
+        with self._lock:
+            return {key: limiter.stats() for key, limiter in self._limiters.items()}
+
+# Process-wide limiter for LLM calls, configured from the environment
+llm_rate_limiter = RateLimiter(
+    requests_per_minute=int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0")) or None,
+    tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", "0")) or None
+)
+
+# Process-wide adaptive concurrency limits for the LLM API, the search API and each
+# fetched domain; ADAPTIVE_CONCURRENCY=0 turns them off, except that each domain then
+# keeps a fixed limit of 4 parallel fetches
+ADAPTIVE_CONCURRENCY = os.getenv("ADAPTIVE_CONCURRENCY", "1") != "0"
+# LLM latency depends on response length, so it gets more room before latency stops growth
+llm_concurrency = AdaptiveLimiter("llm", initial=16, max_limit=int(os.getenv("LLM_MAX_CONCURRENCY", "64")),
+                                  latency_tolerance=3.0, enabled=ADAPTIVE_CONCURRENCY)
+search_concurrency = AdaptiveLimiter("search", initial=4, max_limit=int(os.getenv("SEARCH_MAX_CONCURRENCY", "16")),
+                                     enabled=ADAPTIVE_CONCURRENCY)
+domain_concurrency = AdaptiveLimiterGroup("domain", initial=4, max_limit=int(os.getenv("DOMAIN_MAX_CONCURRENCY", "16")),
+                                          adaptive=ADAPTIVE_CONCURRENCY)
+
+def concurrency_stats():
+    """
+    Returns the current adaptive limits and how often each was cut, per endpoint and domain.
+    """
+    return {"llm": llm_concurrency.stats(), "search": search_concurrency.stats(),
+            "domains": domain_concurrency.stats()}
+
+if __name__ == "__main__":
+    # Test the limiter: 6 requests with a budget of 3 per 2 second window
+    limiter = RateLimiter(requests_per_minute=3, window=2.0)
+    start = time.monotonic()
+    for i in range(6):
+        limiter.acquire()
+        print(f"Request {i+1} sent at {time.monotonic() - start:.2f}s")
+    print(f"Backoff delays: {[round(backoff_delay(r), 2) for r in range(5)]}")
+
+    # Test the adaptive limiter against an endpoint that answers 429 above 6 concurrent calls
+    class TooManyRequests(Exception):
+        status_code = 429
+
+    adaptive = AdaptiveLimiter("test", initial=2, max_limit=32)
+    active = [0]
+    rejected = []
+    active_lock = threading.Lock()
+
+    def endpoint():
+        with active_lock:
+            active[0] += 1
+            overloaded = active[0] > 6
+        try:
+            time.sleep(0.01)
+            if overloaded:
+                raise TooManyRequests()
+        finally:
+            with active_lock:
+                active[0] -= 1
+
+    def caller(calls):
+        for _ in range(calls):
+            try:
+                with adaptive.slot():
+                    endpoint()
+            except TooManyRequests:
+                rejected.append(1)
+
+    threads = [threading.Thread(target=caller, args=(100,)) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"{len(rejected)} of 1600 calls got 429 with 16 callers; {adaptive.stats()}")
+    print(is_overload_error(TimeoutError()), is_overload_error(ValueError("404")))
+
+    # Async callers share the limit: 20 coroutines against a limit of 4
+    async def async_callers():
+        shared_limit = AdaptiveLimiter("async_test", initial=4, max_limit=4)
+        peak = [0]
+
+        async def call():
+            async with shared_limit.aslot():
+                peak[0] = max(peak[0], shared_limit.in_flight)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(call() for _ in range(20)))
+        print(f"Async peak in flight: {peak[0]}; {shared_limit.stats()}")
+
+    asyncio.run(async_callers())
+
+    # Async callers share the same budget: the 4th request waits for the window without blocking the loop
+    limiter = RateLimiter(requests_per_minute=3, window=2.0)
+    start = time.monotonic()
+    async def send_async(count):
+        for i in range(count):
+            await limiter.aacquire()
+            print(f"Async request {i+1} sent at {time.monotonic() - start:.2f}s")
+    asyncio.run(send_async(4))
@@ -0,0 +1,106 @@
+"""
+Page Relevance Scoring Utility for Cold Outreach Opener Generator
+"""
+import re
+import threading
+
+_lock = threading.Lock()
+_totals = {"pages": 0, "skipped": 0}
+
+def _count(pattern, text):
+    return len(re.findall(pattern, text, flags=re.IGNORECASE))
+
+def name_pattern(first_name, last_name):
+    """
+    Regex for a mention of the person by name, tolerating the usual variants:
+    nickname or full first name sharing the first three letters ("Tim"/"Timothy"),
+    an initial ("T. Cook"), and a middle initial ("Tim D. Cook").
+    """
+    first = first_name.strip()
+    given = rf"{re.escape(first[:3])}\w*|{re.escape(first[:1])}\." if first else r"\w+"
+    return rf"\b(?:{given})\s+(?:\w\.?\s+)?{re.escape(last_name.strip())}\b"
+
+def relevance_score(first_name, last_name, text, title="", snippet="", keywords=""):
+    """
+    Cheap estimate (0 to 1) of how much a page is about the target person.
+
+    - 0.6 from name mentions in the page text: full-name mentions (see `name_pattern`) count 2,
+      surname-only mentions count 1, per 1,000 words; 5 or more points per 1,000 words scores the maximum
+    - 0.3 if the full name appears in the search result title or snippet (0.15 for the surname)
+    - 0.1 for the share of keywords found in the title or snippet
+
+    A page that never mentions the full name (in its text, title or snippet) scores 0,
+    so homonyms ("cook a steak", "musk deer") don't pass on surname hits alone.
+    """
+    full_name = name_pattern(first_name, last_name)
+    surname = rf"\b{re.escape(last_name)}\b"
+    full_hits = _count(full_name, text)
+    surname_hits = _count(surname, text) - full_hits
+    header = f"{title} {snippet}"
+    if full_hits == 0 and not _count(full_name, header):
+        return 0.0
+
+    words = max(1, len(text.split()))
+    density = (2 * full_hits + surname_hits) / max(1.0, words / 1000)
+    score = 0.6 * min(1.0, density / 5)
+
+    if _count(full_name, header):
+        score += 0.3
+    elif _count(surname, header):
+        score += 0.15
+
+    keyword_list = [word for word in re.findall(r"\w+", keywords.lower())]
+    if keyword_list:
+        header_words = set(re.findall(r"\w+", header.lower()))
+        score += 0.1 * sum(word in header_words for word in keyword_list) / len(keyword_list)
+    return round(score, 4)
+
+def filter_relevant(pages, first_name, last_name, keywords="", search_results=(), threshold=0.3, max_pages=6):
+    """
+    Scores pages, drops those below `threshold`, and returns at most `max_pages`,
+    most relevant first. Each kept page gets a "relevance" key.
+
+    Args:
+        pages (list): {"url", "content"} dicts, as stored in shared["web_contents"]
+        search_results (list): Search result items, for their title and snippet
+
+    Returns:
+        tuple: (kept pages, list of (skipped url, score))
+    """
+    by_link = {item.get("link"): item for item in search_results}
+    scored = []
+    for page in pages:
+        result = by_link.get(page["url"], {})
+        score = relevance_score(
+            first_name, last_name, page["content"]["text"],
+            title=result.get("title") or page["content"].get("title") or "",
+            snippet=result.get("snippet", ""), keywords=keywords
+        )
+        scored.append(({**page, "relevance": score}, score))
+
+    # Stable sort keeps the search ranking among equally relevant pages
+    scored.sort(key=lambda pair: -pair[1])
+    kept = [page for page, score in scored if score >= threshold][:max_pages]
+    kept_urls = {page["url"] for page in kept}
+    skipped = [(page["url"], score) for page, score in scored if page["url"] not in kept_urls]
+
+    with _lock:
+        _totals["pages"] += len(pages)
+        _totals["skipped"] += len(skipped)
+    return kept, skipped
+
+def relevance_stats():
+    """
+    Returns pages scored and pages skipped (= LLM analysis calls avoided) in this process.
+    """
+    with _lock:
+        return dict(_totals)
+
+if __name__ == "__main__":
+    # Test: a biography scores high, a product page that never names the person scores 0
+    bio = "Tim Cook is the CEO of Apple. Cook joined Apple in 1998 and became CEO in 2011. " * 5
+    product = "The new iPhone features a faster chip, a better camera and longer battery life. " * 20
+    print(f"Biography: {relevance_score('Tim', 'Cook', bio, title='Tim Cook - Wikipedia', keywords='Apple CEO')}")
+    print(f"Product page: {relevance_score('Tim', 'Cook', product, title='iPhone 16', keywords='Apple CEO')}")
+    variant = "Timothy D. Cook was named CEO of Apple in 2011. " * 5
+    print(f"Name variant: {relevance_score('Tim', 'Cook', variant, title='Apple leadership', keywords='Apple CEO')}")
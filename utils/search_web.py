@@ -2,18 +2,80 @@
 Web Search Utility for Cold Outreach Opener Generator
 """
 import os
+import re
+import threading
 import requests
 import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from utils.singleflight import SingleFlight
+from utils.sqlite_cache import SQLiteCache
+from utils.metrics import metrics
+from utils.rate_limiter import search_concurrency, is_overload_status
 
-def search_web(query, num_results=10):
+# Search cache settings; SEARCH_CACHE=0 always calls the API
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE", "1") != "0"
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", ".cache/search.sqlite")
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL_HOURS", "72")) * 3600
+
+_search_cache = None
+_local = threading.local()
+_lock = threading.Lock()
+_search_flights = SingleFlight()
+_api_requests = 0
+
+def get_search_cache():
+    global _search_cache
+    if _search_cache is None:
+        with _lock:
+            if _search_cache is None:
+                _search_cache = SQLiteCache(SEARCH_CACHE_PATH, ttl=SEARCH_CACHE_TTL)
+    return _search_cache
+
+def _session():
+    # One keep-alive session per thread, retrying rate limits and server errors with backoff
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        retry = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=["GET"], raise_on_status=False)
+        session.mount("https://", HTTPAdapter(max_retries=retry))
+        _local.session = session
+    return session
+
+def normalize_query(query):
     """
-    Executes a Google Custom Search and returns results.
-    :param api_key: Your Google API key
-    :param cse_id: Your custom search engine ID
-    :param query: The search query string
-    :param num_results: Number of search results to return (1-10)
-    :return: A list of results (each result is a dict with relevant fields)
+    Normalizes a query for caching: case, extra whitespace, trailing punctuation and the
+    order or repetition of terms don't matter ("Tim Cook CEO Apple" == "tim cook apple ceo").
+    Operators and symbols do: "-Apple", "C++" and quoted phrases are kept as they are,
+    so "Tim Cook -Apple" and "Tim Cook Apple" get separate cache entries.
+    """
+    terms = set()
+    for term in re.findall(r'"[^"]*"|\S+', query.lower()):
+        if len(term) > 1 and term.startswith('"') and term.endswith('"'):
+            phrase = " ".join(term[1:-1].split())
+            if phrase:
+                terms.add(f'"{phrase}"')
+            continue
+        term = term.lstrip('"([{').rstrip('",.;:!?)]}')
+        if term:
+            terms.add(term)
+    return " ".join(sorted(terms))
+
+def search_stats():
+    """
+    Returns API requests made and requests saved by the cache and by sharing in-flight queries.
     """
+    hits = get_search_cache().hits if SEARCH_CACHE_ENABLED else 0
+    return {
+        "api_requests": _api_requests,
+        "cache_hits": hits,
+        "coalesced": _search_flights.coalesced,
+        "requests_saved": hits + _search_flights.coalesced
+    }
+
+def _google_search(query, num_results):
+    global _api_requests
     # Replace these with your actual API key and Search Engine ID.
     API_KEY = "google-api-key"
     SEARCH_ENGINE_ID = "google-search-engine-id"
@@ -25,21 +87,57 @@ def search_web(query, num_results=10):
         'q': query,
         'num': num_results
     }
-    
-    response = requests.get(url, params=params)
+
+    with _lock:
+        _api_requests += 1
+    with search_concurrency.slot() as outcome:
+        response = _session().get(url, params=params, timeout=30)
+        outcome["overloaded"] = is_overload_status(response.status_code)
+    metrics.add(bytes=len(response.content))
     if response.status_code == 200:
         data = response.json()
         # Results are typically in data['items'] if the request is successful
-        return data.get('items', [])
+        return data.get('items', []), True
     else:
         print(f"Error: {response.status_code}, {response.text}")
-        return []
+        metrics.annotate(error=f"HTTP {response.status_code}")
+        return [], False
+
+def _cached_search(query, num_results, key):
+    cache = get_search_cache()
+    results = cache.get(key)
+    if results is not None:
+        metrics.annotate(cache_hits=1)
+        return results
+    results, ok = _google_search(query, num_results)
+    if ok:  # Don't cache failed requests
+        cache.set(key, results)
+    return results
+
+def search_web(query, num_results=10, use_cache=SEARCH_CACHE_ENABLED):
+    """
+    Executes a Google Custom Search and returns results.
+    Results are cached per normalized query, and concurrent identical queries share one request.
+    :param query: The search query string
+    :param num_results: Number of search results to return (1-10)
+    :param use_cache: Use the local search cache (default: SEARCH_CACHE_ENABLED)
+    :return: A list of results (each result is a dict with relevant fields)
+    """
+    key = json.dumps([normalize_query(query), num_results])
+    with metrics.span("search_web"):
+        if use_cache:
+            return _search_flights.do(key, lambda: _cached_search(query, num_results, key))
+        return _search_flights.do(key, lambda: _google_search(query, num_results)[0])
 
 if __name__ == "__main__":
     results = search_web("Elon Musk")
-    
+
     for idx, item in enumerate(results, start=1):
         title = item.get("title")
         snippet = item.get("snippet")
         link = item.get("link")
         print(f"{idx}. {title}\n{snippet}\nLink: {link}\n")
+
+    search_web("musk  ELON")
+    print(search_stats())
+    print(normalize_query("Tim Cook -Apple"), "|", normalize_query("Jane Doe C++ developer"))
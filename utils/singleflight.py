@@ -0,0 +1,103 @@
+"""
+In-flight Request De-duplication Utility for Cold Outreach Opener Generator
+"""
+import asyncio
+import threading
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution:
+    the first caller runs the function, the others wait and share its result (or exception).
+    """
+    def __init__(self):
+        self.coalesced = 0  # Calls that reused another caller's in-flight result
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines on one event loop: concurrent awaits of the same key
+    share one task. The task is shielded, so a caller that is cancelled (e.g. a client
+    that disconnects) doesn't cancel the work the other callers are waiting for.
+    """
+    def __init__(self):
+        self.coalesced = 0
+        self._tasks = {}
+
+    def __contains__(self, key):
+        return key in self._tasks
+
+    def do(self, key, fn):
+        """
+        Returns an awaitable for the result of fn() (a coroutine function). The call is
+        registered right away, so `key in flights` is true as soon as do() returns.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        else:
+            self.coalesced += 1
+        return asyncio.shield(task)
+
+if __name__ == "__main__":
+    # Test: 5 threads asking for the same key run the function once
+    import time
+    flights = SingleFlight()
+    runs = []
+
+    def slow_fetch():
+        runs.append(1)
+        time.sleep(0.2)
+        return "page"
+
+    threads = [threading.Thread(target=flights.do, args=("https://example.com", slow_fetch)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"Function ran {len(runs)} time(s), {flights.coalesced} calls coalesced")
+
+    async def slow_draft():
+        runs.append(1)
+        await asyncio.sleep(0.2)
+        return "opener"
+
+    async def main():
+        async_flights = AsyncSingleFlight()
+        results = await asyncio.gather(*(async_flights.do("Ada Lovelace", slow_draft) for _ in range(5)))
+        print(f"Async: {len(set(results))} distinct result(s), {async_flights.coalesced} calls coalesced")
+
+    asyncio.run(main())
@@ -0,0 +1,154 @@
+"""
+Persistent Key-Value Cache Utility for Cold Outreach Opener Generator
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+class SQLiteCache:
+    """
+    On-disk cache of JSON-serializable values, stored in one SQLite file.
+
+    - Entries older than `ttl` seconds are treated as missing (ttl=None: never expire)
+    - When the stored values exceed `max_bytes`, least recently used entries are evicted
+    - Hit/miss counters are kept per process, see stats()
+
+    Safe to share between threads (one connection per thread) and between
+    processes (WAL journal plus a busy timeout).
+    """
+    EVICT_EVERY = 50  # Check the size bound every N writes
+
+    def __init__(self, path, ttl=None, max_bytes=500 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+
+    @staticmethod
+    def make_key(*parts):
+        """
+        Content-addressed key: SHA-256 of the JSON encoding of `parts`.
+        """
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_entry(self, key):
+        """
+        Returns (value, created_at) even if the entry is past its TTL, or None.
+        Doesn't touch the hit/miss counters.
+        """
+        row = self._conn().execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def get(self, key, ttl=None):
+        """
+        Returns the cached value, or None if missing or older than `ttl` (default: self.ttl).
+        """
+        ttl = self.ttl if ttl is None else ttl
+        entry = self.get_entry(key)
+        if entry is None or (ttl is not None and time.time() - entry[1] > ttl):
+            self._count(hit=False)
+            return None
+        self._count(hit=True)
+        with self._conn() as conn:
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return entry[0]
+
+    def set(self, key, value):
+        encoded = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, encoded, len(encoded.encode("utf-8")), now, now)
+            )
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def touch(self, key):
+        """
+        Marks an entry as fresh again (e.g. after a successful revalidation).
+        """
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("UPDATE entries SET created_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+
+    def delete(self, key):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def evict(self):
+        """
+        Drops least recently used entries until the total size is within max_bytes.
+        """
+        conn = self._conn()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        with conn:
+            for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                removed += 1
+        return removed
+
+    def stats(self):
+        entries, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+if __name__ == "__main__":
+    # Test the cache in a temporary file
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SQLiteCache(os.path.join(tmp, "test.sqlite"), ttl=1, max_bytes=200)
+        key = cache.make_key("model", 512, "prompt")
+        print(f"Miss: {cache.get(key)}")
+        cache.set(key, {"answer": 42})
+        print(f"Hit: {cache.get(key)}")
+        time.sleep(1.1)
+        print(f"Expired: {cache.get(key)}")
+        for i in range(20):
+            cache.set(f"key{i}", "x" * 20)
+        print(f"Evicted {cache.evict()} entries")
+        print(cache.stats())
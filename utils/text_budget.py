@@ -0,0 +1,123 @@
+"""
+Prompt Token Budget Utility for Cold Outreach Opener Generator
+"""
+import math
+import re
+import threading
+from collections import Counter
+from utils.rate_limiter import estimate_tokens
+
+STOP_WORDS = set("""a an and are as at be by check did do does for from gave has have if in is it its of on or
+recently the their they this to was were what with""".split())
+
+_lock = threading.Lock()
+_totals = {"pages": 0, "trimmed_pages": 0, "tokens_before": 0, "tokens_after": 0}
+
+def tokenize(text):
+    return [word for word in re.findall(r"\w+", text.lower()) if word not in STOP_WORDS]
+
+def split_chunks(text, chunk_tokens=200):
+    """
+    Splits text into consecutive chunks of about `chunk_tokens` tokens, on word boundaries.
+    Runs without spaces longer than a chunk (CJK text, minified code) are split by characters.
+    """
+    limit = chunk_tokens * 4  # ~4 characters per token, as in estimate_tokens
+    words = [word[i:i + limit] for word in text.split() for i in range(0, len(word), limit)]
+    chunks, current, size = [], [], 0
+    for word in words:
+        current.append(word)
+        size += len(word) + 1
+        if size >= limit:
+            chunks.append(" ".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+def bm25_scores(chunks, query_terms, k1=1.5, b=0.75):
+    """
+    Scores each chunk against the query with BM25, treating chunks as the document collection.
+    Repeated query terms count multiple times, so they can be used as weights.
+    """
+    docs = [Counter(tokenize(chunk)) for chunk in chunks]
+    if not docs:
+        return []
+    avg_len = sum(sum(doc.values()) for doc in docs) / len(docs) or 1
+    query = Counter(query_terms)
+    idf = {}
+    for term in query:
+        df = sum(1 for doc in docs if term in doc)
+        idf[term] = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+    scores = []
+    for doc in docs:
+        doc_len = sum(doc.values())
+        score = 0.0
+        for term, weight in query.items():
+            tf = doc.get(term, 0)
+            if tf:
+                score += weight * idf[term] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * doc_len / avg_len))
+        scores.append(score)
+    return scores
+
+def fit_text_to_budget(text, query, max_tokens=1500, chunk_tokens=200, name_terms=()):
+    """
+    Returns `text` unchanged if it fits in `max_tokens`. Otherwise keeps the chunks most
+    relevant to `query` (BM25; `name_terms` count three times) that fit the budget,
+    in their original order, joined with " ... ".
+
+    Returns:
+        tuple: (text, tokens_before, tokens_after)
+    """
+    tokens_before = estimate_tokens(text)
+    if tokens_before <= max_tokens:
+        _record(tokens_before, tokens_before)
+        return text, tokens_before, tokens_before
+
+    chunks = split_chunks(text, chunk_tokens)
+    query_terms = tokenize(query) + [term for name in name_terms for term in tokenize(name)] * 3
+    scores = bm25_scores(chunks, query_terms)
+    # Best chunks first; ties keep the earlier chunk
+    ranked = sorted(range(len(chunks)), key=lambda i: (-scores[i], i))
+
+    selected, used = [], 0
+    for i in ranked:
+        cost = estimate_tokens(chunks[i])
+        if used + cost > max_tokens:
+            continue
+        selected.append(i)
+        used += cost
+    result = " ... ".join(chunks[i] for i in sorted(selected))
+    if not result:
+        # No chunk fits (e.g. a budget smaller than one chunk): keep the start of the page
+        result = text[:max_tokens * 4]
+    tokens_after = estimate_tokens(result)
+    _record(tokens_before, tokens_after)
+    return result, tokens_before, tokens_after
+
+def _record(tokens_before, tokens_after):
+    with _lock:
+        _totals["pages"] += 1
+        _totals["trimmed_pages"] += tokens_after < tokens_before
+        _totals["tokens_before"] += tokens_before
+        _totals["tokens_after"] += tokens_after
+
+def budget_stats():
+    """
+    Returns page and token totals for this process, including tokens saved by trimming.
+    """
+    with _lock:
+        stats = dict(_totals)
+    stats["tokens_saved"] = stats["tokens_before"] - stats["tokens_after"]
+    return stats
+
+if __name__ == "__main__":
+    # Test: a long page where only one part mentions the person
+    filler = "The company reported quarterly results and announced new products. " * 400
+    text = filler + "Ada Lovelace gave a keynote talk at the annual conference last week. " + filler
+    trimmed, before, after = fit_text_to_budget(text, "gave talks recently", max_tokens=300,
+                                                name_terms=["Ada", "Lovelace"])
+    print(f"{before} -> {after} tokens, keeps the talk: {'keynote talk' in trimmed}")
+    # Text without spaces is split by characters instead of being dropped
+    trimmed, before, after = fit_text_to_budget("阿达·洛芙莱斯在年会上发表了主题演讲。" * 800, "talks", max_tokens=300)
+    print(f"{before} -> {after} tokens without spaces")
+    print(budget_stats())
@@ -0,0 +1,286 @@
+"""
+Distributed Work Queue Utility for Cold Outreach Opener Generator
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+class SQLiteWorkQueue:
+    """
+    Durable task queue in one SQLite file, shared by worker processes on one machine
+    (or on several, through a shared filesystem that supports SQLite locking).
+
+    - Tasks are claimed with a lease of `lease_seconds`; a worker extends it with heartbeat()
+    - A task whose lease expires (its worker died or hung) is handed out again, up to
+      `max_attempts` claims in total
+    - Results are stored with the task, so the queue is also the shared sink for outputs
+
+    Task states: "queued", "leased", "done", "failed".
+
+    Args:
+        path (str): SQLite file
+        lease_seconds (float): How long a claim lasts without a heartbeat
+        max_attempts (int): Claims per task before it is marked failed
+    """
+    def __init__(self, path, lease_seconds=60, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY,
+            key TEXT UNIQUE NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            worker TEXT,
+            lease_until REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            updated_at REAL NOT NULL
+        )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_until)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode, so claim() can take the write lock up front with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, tasks):
+        """
+        Adds (key, payload) pairs; keys already in the queue are skipped, so enqueueing
+        the same input twice is harmless. Returns the number of tasks added.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            added = 0
+            for key, payload in tasks:
+                cursor = conn.execute("INSERT OR IGNORE INTO tasks (key, payload, updated_at) VALUES (?, ?, ?)",
+                                      (key, json.dumps(payload, ensure_ascii=False), now))
+                added += cursor.rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def claim(self, worker):
+        """
+        Leases the oldest queued task (or one whose lease expired) to `worker`.
+        Returns (task_id, payload, attempt), or None if nothing is claimable right now.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Expired leases that used up their attempts won't be retried
+            conn.execute("""UPDATE tasks SET status = 'failed', error = 'Lease expired after the last attempt',
+                            worker = NULL, updated_at = ? WHERE status = 'leased' AND lease_until < ? AND attempts >= ?""",
+                         (now, now, self.max_attempts))
+            row = conn.execute("""SELECT id, payload, attempts FROM tasks
+                                  WHERE status = 'queued' OR (status = 'leased' AND lease_until < ?)
+                                  ORDER BY id LIMIT 1""", (now,)).fetchone()
+            if row is not None:
+                conn.execute("""UPDATE tasks SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1,
+                                updated_at = ? WHERE id = ?""", (worker, now + self.lease_seconds, now, row[0]))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), row[2] + 1
+
+    def heartbeat(self, task_id, worker):
+        """
+        Extends the lease. Returns False if the task is no longer leased to `worker`.
+        """
+        cursor = self._conn().execute(
+            "UPDATE tasks SET lease_until = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            (time.time() + self.lease_seconds, time.time(), task_id, worker))
+        return cursor.rowcount == 1
+
+    def complete(self, task_id, worker, result):
+        """
+        Stores the result. Returns False (and stores nothing) if the lease was lost.
+        """
+        cursor = self._conn().execute(
+            "UPDATE tasks SET status = 'done', result = ?, worker = NULL, updated_at = ? "
+            "WHERE id = ? AND worker = ? AND status = 'leased'",
+            (json.dumps(result, ensure_ascii=False), time.time(), task_id, worker))
+        return cursor.rowcount == 1
+
+    def fail(self, task_id, worker, error, result=None):
+        """
+        Puts the task back in the queue, or marks it failed (keeping `result`, e.g. an
+        error record) once it has used up its attempts. Returns False if the lease was lost.
+        """
+        cursor = self._conn().execute(
+            "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "error = ?, result = ?, worker = NULL, lease_until = NULL, updated_at = ? "
+            "WHERE id = ? AND worker = ? AND status = 'leased'",
+            (self.max_attempts, str(error), json.dumps(result, ensure_ascii=False) if result is not None else None,
+             time.time(), task_id, worker))
+        return cursor.rowcount == 1
+
+    def counts(self):
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        return {"queued": 0, "leased": 0, "done": 0, "failed": 0, **dict(rows)}
+
+    def results(self):
+        """
+        Yields (payload, status, result, error) for finished tasks, in enqueue order.
+        """
+        for payload, status, result, error in self._conn().execute(
+                "SELECT payload, status, result, error FROM tasks WHERE status IN ('done', 'failed') ORDER BY id"):
+            yield json.loads(payload), status, json.loads(result) if result else None, error
+
+class RedisWorkQueue:
+    """
+    The same queue on a Redis-compatible server, for workers on several machines.
+    Needs the optional redis package. Tasks live under keys prefixed with `name`.
+
+    Args:
+        url (str): Server URL, e.g. redis://host:6379/0
+        name (str): Key prefix, one per batch
+        lease_seconds (float): How long a claim lasts without a heartbeat
+        max_attempts (int): Claims per task before it is marked failed
+    """
+    # Moves expired leases back to the queue (or to failed), then pops and leases one task, atomically
+    CLAIM_SCRIPT = """
+    local now, lease, max_attempts, worker = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), ARGV[4]
+    for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now)) do
+        redis.call('ZREM', KEYS[2], id)
+        if tonumber(redis.call('HGET', KEYS[3] .. id, 'attempts')) >= max_attempts then
+            redis.call('HSET', KEYS[3] .. id, 'status', 'failed', 'error', 'Lease expired after the last attempt')
+        else
+            redis.call('HSET', KEYS[3] .. id, 'status', 'queued')
+            redis.call('LPUSH', KEYS[1], id)
+        end
+    end
+    local id = redis.call('RPOP', KEYS[1])
+    if not id then return nil end
+    local attempts = redis.call('HINCRBY', KEYS[3] .. id, 'attempts', 1)
+    redis.call('HSET', KEYS[3] .. id, 'status', 'leased', 'worker', worker)
+    redis.call('ZADD', KEYS[2], now + lease, id)
+    return {id, redis.call('HGET', KEYS[3] .. id, 'payload'), attempts}
+    """
+
+    def __init__(self, url, name="outreach", lease_seconds=60, max_attempts=3):
+        try:
+            import redis
+        except ImportError:  # Optional dependency not installed
+            raise ValueError("The Redis work queue needs the redis package: pip install redis")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._claim = self.client.register_script(self.CLAIM_SCRIPT)
+        self._queue, self._leases, self._task = f"{name}:queue", f"{name}:leases", f"{name}:task:"
+        self._keys, self._ids = f"{name}:keys", f"{name}:ids"
+
+    def enqueue(self, tasks):
+        added = 0
+        for key, payload in tasks:
+            if not self.client.hsetnx(self._keys, key, ""):
+                continue
+            task_id = self.client.incr(f"{self.name}:next_id")
+            self.client.hset(self._keys, key, task_id)
+            self.client.hset(f"{self._task}{task_id}", mapping={
+                "payload": json.dumps(payload, ensure_ascii=False), "status": "queued", "attempts": 0})
+            self.client.rpush(self._ids, task_id)
+            self.client.lpush(self._queue, task_id)
+            added += 1
+        return added
+
+    def claim(self, worker):
+        claimed = self._claim(keys=[self._queue, self._leases, self._task],
+                              args=[time.time(), self.lease_seconds, self.max_attempts, worker])
+        if not claimed:
+            return None
+        task_id, payload, attempt = claimed
+        return int(task_id), json.loads(payload), int(attempt)
+
+    def _owned(self, task_id, worker):
+        status, owner = self.client.hmget(f"{self._task}{task_id}", "status", "worker")
+        return status == "leased" and owner == worker
+
+    def heartbeat(self, task_id, worker):
+        if not self._owned(task_id, worker):
+            return False
+        self.client.zadd(self._leases, {task_id: time.time() + self.lease_seconds}, xx=True)
+        return True
+
+    def complete(self, task_id, worker, result):
+        if not self._owned(task_id, worker):
+            return False
+        self.client.zrem(self._leases, task_id)
+        self.client.hset(f"{self._task}{task_id}", mapping={
+            "status": "done", "result": json.dumps(result, ensure_ascii=False), "worker": ""})
+        return True
+
+    def fail(self, task_id, worker, error, result=None):
+        if not self._owned(task_id, worker):
+            return False
+        self.client.zrem(self._leases, task_id)
+        task = f"{self._task}{task_id}"
+        retry = int(self.client.hget(task, "attempts")) < self.max_attempts
+        fields = {"status": "queued" if retry else "failed", "error": str(error), "worker": ""}
+        if result is not None:
+            fields["result"] = json.dumps(result, ensure_ascii=False)
+        self.client.hset(task, mapping=fields)
+        if retry:
+            self.client.lpush(self._queue, task_id)
+        return True
+
+    def counts(self):
+        counts = {"queued": 0, "leased": 0, "done": 0, "failed": 0}
+        for task_id in self.client.lrange(self._ids, 0, -1):
+            counts[self.client.hget(f"{self._task}{task_id}", "status")] += 1
+        return counts
+
+    def results(self):
+        for task_id in self.client.lrange(self._ids, 0, -1):
+            task = self.client.hgetall(f"{self._task}{task_id}")
+            if task["status"] in ("done", "failed"):
+                yield (json.loads(task["payload"]), task["status"],
+                       json.loads(task["result"]) if task.get("result") else None, task.get("error"))
+
+def open_work_queue(location, lease_seconds=60, max_attempts=3):
+    """
+    SQLite queue for a file path, Redis queue for a redis:// or rediss:// URL
+    (the URL fragment, e.g. redis://host:6379/0#batch1, names the queue).
+    """
+    if location.startswith(("redis://", "rediss://")):
+        url, _, name = location.partition("#")
+        return RedisWorkQueue(url, name or "outreach", lease_seconds=lease_seconds, max_attempts=max_attempts)
+    return SQLiteWorkQueue(location, lease_seconds=lease_seconds, max_attempts=max_attempts)
+
+if __name__ == "__main__":
+    # Test: a worker that dies holding a lease has its task handed to another worker
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        work_queue = SQLiteWorkQueue(os.path.join(tmp, "queue.sqlite"), lease_seconds=0.2, max_attempts=2)
+        print(f"Added {work_queue.enqueue([('a', {'n': 1}), ('b', {'n': 2}), ('a', {'n': 1})])} tasks")
+        lost = work_queue.claim("worker-1")  # Never heartbeats or completes
+        task_id, payload, attempt = work_queue.claim("worker-2")
+        print(f"worker-2 heartbeat: {work_queue.heartbeat(task_id, 'worker-2')}, "
+              f"complete: {work_queue.complete(task_id, 'worker-2', {'n': payload['n'] * 10})}")
+        time.sleep(0.3)
+        task_id, payload, attempt = work_queue.claim("worker-2")
+        print(f"Re-claimed task {task_id} (attempt {attempt}); worker-1 can still complete it: "
+              f"{work_queue.complete(lost[0], 'worker-1', {})}")
+        work_queue.complete(task_id, "worker-2", {"n": payload["n"] * 10})
+        print(work_queue.counts(), [result for _, _, result, _ in work_queue.results()])